@@ -0,0 +1,145 @@
+import re
+
+from evennia import default_cmds
+from evennia.utils.evmore import EvMore
+from world.wod20th.census import CENSUS, CensusError
+from world.wod20th.utils.formatting import header, footer
+
+WHERE = re.compile(r"\s+where\s+", re.I)
+BY = re.compile(r"\s+by\s+", re.I)
+CONDITION = re.compile(r"^(?P<field>.+?)\s*(?P<op>>=|<=|!=|=|>|<)\s*(?P<value>.+)$")
+BAR_WIDTH = 40
+
+
+class CmdCensus(default_cmds.MuxCommand):
+    """
+    Population statistics across every character sheet.
+
+    Usage:
+      +census <stat> [by <group>] [where <condition>, <condition>...]
+      +census/count [by <group>] [where <condition>, ...]
+      +census/hist <stat> [where <condition>, ...]
+      +census/refresh
+
+    The first form shows how many characters have a stat and its average,
+    lowest and highest rating; /count counts characters and /hist shows
+    how many characters have each rating. Groups are identity stats such
+    as splat, clan, tribe, auspice or tradition.
+
+    Conditions compare an identity stat by name (clan=Tremere, splat!=Mortal)
+    or a stat by rating (thaumaturgy>=3). The condition "approved" keeps
+    only approved characters.
+
+    Results come from a copy of the sheets that is refreshed once stats
+    have changed and it is a minute old; /refresh rebuilds it now.
+
+    Examples:
+      +census dexterity by tribe where splat=Shifter, approved
+      +census/count by clan where thaumaturgy>=3
+      +census/hist willpower where splat=Vampire
+    """
+
+    key = "+census"
+    aliases = ["census"]
+    locks = "cmd:perm(Builder)"
+    help_category = "Admin"
+
+    def parse(self):
+        """
+        Split the arguments into a stat, a group and conditions.
+        """
+        super().parse()
+        self.stat = self.group = None
+        self.where = []
+        self.approved = False
+        self.bad_conditions = []
+
+        # A leading space lets "by ..." and "where ..." start the arguments
+        args, conditions = (WHERE.split(f" {self.args.strip()}", maxsplit=1) + [''])[:2]
+        args, group = (BY.split(args, maxsplit=1) + [''])[:2]
+        self.stat = args.strip() or None
+        self.group = group.strip() or None
+
+        for condition in filter(None, (part.strip() for part in conditions.split(','))):
+            if condition.lower() == 'approved':
+                self.approved = True
+                continue
+            match = CONDITION.match(condition)
+            if match:
+                self.where.append((match['field'].strip(), match['op'], match['value'].strip()))
+            else:
+                self.bad_conditions.append(condition)
+
+    def func(self):
+        switches = [switch.lower() for switch in self.switches]
+        if self.bad_conditions:
+            self.caller.msg(f"|rCan't read condition: {', '.join(self.bad_conditions)}. "
+                            f"Use e.g. clan=Tremere or dexterity>=3.|n")
+            return
+        try:
+            rebuilt = CENSUS.ensure_current(refresh='refresh' in switches)
+            if 'refresh' in switches:
+                self.caller.msg(f"Census rebuilt from {len(CENSUS)} characters.")
+            elif 'count' in switches:
+                self.show_counts()
+            elif 'hist' in switches:
+                self.show_histogram()
+            elif self.stat:
+                self.show_summary()
+            else:
+                self.caller.msg("Usage: +census <stat> [by <group>] [where <condition>, ...]")
+                return
+        except CensusError as err:
+            self.caller.msg(f"|r{err}|n")
+            return
+        if rebuilt and 'refresh' not in switches:
+            self.caller.msg(f"|x(Census rebuilt from {len(CENSUS)} characters.)|n")
+
+    def title(self, text):
+        parts = [text]
+        if self.group:
+            parts.append(f"by {self.group}")
+        conditions = [f"{field}{op}{value}" for field, op, value in self.where]
+        if self.approved:
+            conditions.append("approved")
+        if conditions:
+            parts.append(f"where {', '.join(conditions)}")
+        return ' '.join(parts)
+
+    def show_summary(self):
+        rows = CENSUS.summary(self.stat, by=self.group, where=self.where, approved=self.approved)
+        lines = [header(self.title(f"Census: {self.stat.title()}"), width=78)]
+        lines.append(f"|w{'Group':<30}{'Count':>8}{'Mean':>10}{'Min':>8}{'Max':>8}|n\n")
+        for group, count, mean, low, high in rows:
+            lines.append(f"{group[:29]:<30}{count:>8}{mean:>10.2f}{low:>8.0f}{high:>8.0f}\n")
+        if not rows:
+            lines.append("No characters match.\n")
+        lines.append(footer(width=78))
+        EvMore(self.caller, ''.join(str(line) for line in lines))
+
+    def show_counts(self):
+        rows = CENSUS.counts(by=self.group, where=self.where, approved=self.approved)
+        total = sum(count for _, count in rows)
+        lines = [header(self.title("Census: Characters"), width=78)]
+        lines.append(f"|w{'Group':<30}{'Count':>8}{'Share':>10}|n\n")
+        for group, count in rows:
+            lines.append(f"{group[:29]:<30}{count:>8}{count / total:>10.1%}\n")
+        lines.append(f"{total} of {len(CENSUS)} characters match.\n")
+        lines.append(footer(width=78))
+        EvMore(self.caller, ''.join(str(line) for line in lines))
+
+    def show_histogram(self):
+        if not self.stat:
+            self.caller.msg("Usage: +census/hist <stat> [where <condition>, ...]")
+            return
+        self.group = None
+        rows = CENSUS.histogram(self.stat, where=self.where, approved=self.approved)
+        most = max((count for _, count in rows), default=0)
+        lines = [header(self.title(f"Census: {self.stat.title()}"), width=78)]
+        for value, count in rows:
+            bar = '#' * max(1, round(BAR_WIDTH * count / most))
+            lines.append(f"{value:>4} {count:>7}  |g{bar}|n\n")
+        if not rows:
+            lines.append("No characters match.\n")
+        lines.append(footer(width=78))
+        EvMore(self.caller, ''.join(str(line) for line in lines))
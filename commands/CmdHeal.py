@@ -54,7 +54,7 @@ class CmdHeal(Command):
         damage_type_full = {'b': 'bashing', 'l': 'lethal', 'a': 'aggravated'}[damage_type]
 
         # Apply healing (negative damage)
-        apply_damage_or_healing(target, -healing, damage_type_full)
+        apply_damage_or_healing(target, -healing, damage_type_full, actor=self.caller)
 
         # Get the green gradient_name of th target
         target_gradient = target.db.gradient_name or target.key
@@ -52,12 +52,12 @@ class CmdHurt(Command):
             return
 
         damage_type_full = {'b': 'bashing', 'l': 'lethal', 'a': 'aggravated'}[damage_type]
-        health = target.get_stat('other', 'other', 'Health') or 7
+        health = target.derived['health_levels']
         if health == 0 and damage_type != 'a':
             self.caller.msg(f"{target.name} is already dead and cannot take more bashing or lethal damage.")
             return
 
-        apply_damage_or_healing(target, damage, damage_type_full)
+        apply_damage_or_healing(target, damage, damage_type_full, actor=self.caller)
         # if the character's character.db.agg is greater than 
         if target.get_stat('Other', 'Splat', 'Splat') == 'Vampire':
             health = health + 2
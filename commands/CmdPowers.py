@@ -0,0 +1,119 @@
+from evennia import default_cmds
+from evennia.utils.evmore import EvMore
+from world.wod20th.power_index import POWER_INDEX
+from world.wod20th.utils.formatting import header, footer
+
+FILTER_KEYS = {
+    'type': 'stat_type',
+    'line': 'game_line',
+    'splat': 'splat',
+}
+
+
+class CmdPowers(default_cmds.MuxCommand):
+    """
+    Search gifts, disciplines, spheres, arts and other powers.
+
+    Usage:
+      +powers <search terms> [type=<stat type>] [line=<game line>] [splat=<splat>]
+      +powers/info <power name>
+
+    Every search term must appear in the power's name or description; the
+    start of a word is enough, so "heal" finds "healing". Matches on the
+    name rank above matches in the description.
+
+    Examples:
+      +powers claws
+      +powers spirit type=gift
+      +powers type=sphere
+      +powers fire splat=shifter
+      +powers/info Razor Claws
+    """
+
+    key = "+powers"
+    aliases = ["powers"]
+    locks = "cmd:all()"
+    help_category = "Character"
+
+    def parse(self):
+        """
+        Split the arguments into search terms and key=value filters.
+        """
+        self.terms = []
+        self.filters = {}
+        self.bad_filters = []
+        for word in self.args.split():
+            key, sep, value = word.partition('=')
+            if not sep:
+                self.terms.append(word)
+            elif key.lower() in FILTER_KEYS and value:
+                self.filters[FILTER_KEYS[key.lower()]] = value.replace('_', ' ')
+            else:
+                self.bad_filters.append(word)
+        self.query = ' '.join(self.terms)
+
+    def func(self):
+        switches = [switch.lower() for switch in self.switches]
+        if 'info' in switches:
+            self.show_info()
+            return
+
+        if self.bad_filters:
+            self.caller.msg(f"|rUnknown filter: {', '.join(self.bad_filters)}. "
+                            f"Use type=, line= or splat=.|n")
+            return
+        if not self.query and not self.filters:
+            types = ', '.join(POWER_INDEX.stat_types())
+            self.caller.msg(f"Usage: +powers <search terms> [type=<stat type>] [line=<game line>] "
+                            f"[splat=<splat>]\nPower types: {types}")
+            return
+        if 'stat_type' in self.filters:
+            # Let players type the plural form, e.g. type=gifts
+            stat_type = self.filters['stat_type'].lower()
+            types = POWER_INDEX.stat_types()
+            if stat_type not in types and stat_type.rstrip('s') in types:
+                self.filters['stat_type'] = stat_type.rstrip('s')
+
+        results = POWER_INDEX.search(self.query, **self.filters)
+        if not results:
+            self.caller.msg("|rNo powers match that search.|n")
+            return
+
+        title = f"Powers: {self.args.strip()}"
+        lines = [header(title, width=78)]
+        lines.append(f"|w{'Name':<30}{'Type':<12}{'Game Line':<26}Ranks|n\n")
+        for stat, _ in results:
+            ranks = ', '.join(str(value) for value in stat.values or [])
+            lines.append(
+                f"{stat.name[:29]:<30}{stat.stat_type.replace('_', ' ').title()[:11]:<12}"
+                f"{(stat.game_line or '')[:25]:<26}{ranks[:10]}\n"
+            )
+        lines.append(f"{len(results)} match{'es' if len(results) != 1 else ''}. "
+                     f"Use +powers/info <name> for details.\n")
+        lines.append(footer(width=78))
+        EvMore(self.caller, ''.join(str(line) for line in lines))
+
+    def show_info(self):
+        if not self.query:
+            self.caller.msg("Usage: +powers/info <power name>")
+            return
+        results = POWER_INDEX.search(self.query, **self.filters)
+        if not results:
+            self.caller.msg(f"|rNo power named '{self.query}' found.|n")
+            return
+
+        best = results[0][1]
+        stats = [stat for stat, score in results if score == best]
+        text = []
+        for stat in stats:
+            ranks = ', '.join(str(value) for value in stat.values or [])
+            text.append(header(stat.name, width=78))
+            text.append(f"|wType:|n {stat.stat_type.replace('_', ' ').title()}    "
+                        f"|wGame Line:|n {stat.game_line or 'Any'}\n")
+            if stat.splat:
+                text.append(f"|wSplat:|n {stat.splat}\n")
+            if ranks:
+                text.append(f"|wRanks:|n {ranks}\n")
+            text.append(f"\n{stat.description or 'No description available.'}\n")
+            text.append(footer(width=78))
+        EvMore(self.caller, ''.join(str(line) for line in text))
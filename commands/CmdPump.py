@@ -1,6 +1,10 @@
 from evennia import default_cmds
-from evennia.utils import utils
 from world.wod20th.models import Stat
+from world.wod20th.overlays import PUMP_LAYER
+from world.wod20th.timers import schedule
+
+# Seconds a boost lasts
+PUMP_DURATION = 3600
 
 class CmdPump(default_cmds.MuxCommand):
     """
@@ -63,12 +67,8 @@ class CmdPump(default_cmds.MuxCommand):
             caller.msg(f"You don't have enough blood. Current blood: {current_blood}")
             return
 
-        current_value = caller.get_stat('attributes', 'physical', attribute.capitalize())
-        try:
-            current_value = int(current_value)
-        except ValueError:
-            caller.msg(f"Error: Current {attribute} value is not a number.")
-            return
+        stat_key = ('attributes', 'physical', attribute.capitalize())
+        current_value = caller.overlays.effective(*stat_key) or 0
 
         new_value = min(current_value + amount, 10)
         actual_increase = new_value - current_value
@@ -77,20 +77,21 @@ class CmdPump(default_cmds.MuxCommand):
             caller.msg(f"Your {attribute.capitalize()} is already at maximum (10).")
             return
 
-        # Decrease blood pool
-        caller.db.stats['pools']['dual']['Blood']['temp'] = current_blood - actual_increase
+        with caller.stats.batch(actor=caller, reason=f"+pump {attribute}={amount}"):
+            # Decrease blood pool
+            caller.db.stats['pools']['dual']['Blood']['temp'] = current_blood - actual_increase
 
         # Increase attribute
-        caller.set_stat('attributes', 'physical', attribute.capitalize(), new_value, temp=True)
+        caller.overlays.adjust(PUMP_LAYER, stat_key, actual_increase)
 
         # Schedule the attribute to return to normal after 1 hour
-        utils.delay(3600, self._remove_boost, attribute, actual_increase)
+        schedule(
+            caller, PUMP_DURATION, 'overlay',
+            layer=PUMP_LAYER,
+            stat=stat_key,
+            amount=actual_increase,
+            source='+pump',
+            message="Your {name} returns to normal ({value}).",
+        )
 
         caller.msg(f"You spend {actual_increase} blood point{'s' if actual_increase > 1 else ''} to boost your {attribute.capitalize()} to {new_value} for one hour.")
-
-    def _remove_boost(self, attribute, amount):
-        """Remove the attribute boost after the duration."""
-        current_value = self.caller.get_stat('attributes', 'physical', attribute.capitalize(), temp=True)
-        new_value = max(current_value - amount, self.caller.get_stat('attributes', 'physical', attribute.capitalize()))
-        self.caller.set_stat('attributes', 'physical', attribute.capitalize(), new_value, temp=True)
-        self.caller.msg(f"Your {attribute.capitalize()} returns to normal ({new_value}).")
\ No newline at end of file
@@ -2,30 +2,76 @@ from evennia import default_cmds
 from evennia.utils.ansi import ANSIString
 from evennia.utils import inherits_from
 from world.wod20th.models import Stat
-from world.wod20th.utils.dice_rolls import roll_dice, interpret_roll_results
+from world.wod20th.utils.dice_odds import pool_odds
+from world.wod20th.utils.dice_rolls import DICE, format_roll
+from world.wod20th.utils.roll_expressions import compile_expression, parse_expression
 import re
-from difflib import get_close_matches
-from datetime import datetime
+from django.utils import timezone
+from world.wod20th.roll_log import ROLL_LOG
+
+# Results less likely than this aren't listed by +roll/odds
+ODDS_SHOWN = 0.0005
+# Rolls shown per page of +roll/log and +roll/search
+LOG_PAGE_SIZE = 10
+# Most NPCs rolled by one +roll/group or +roll/npc
+MAX_BATCH = 50
+NPC_ENTRY = re.compile(r'^(.+?)(?:\s+x\s*(\d+))?\s*=\s*(.+)$', re.IGNORECASE)
+
+
+def format_successes(result):
+    """
+    Describe a RollResult in a few characters, for batch logs.
+    """
+    if result.botch:
+        return "|rBotch|n"
+    colour = "|g" if result.successes > 0 else "|y"
+    return f"{colour}{result.successes}|n"
+
 
 class CmdRoll(default_cmds.MuxCommand):
     """
     Roll dice for World of Darkness 20th Anniversary Edition.
 
     Usage:
-      +roll <expression> [vs <difficulty>]
-      +roll/log
+      +roll[/spec][/wp] <expression> [vs <difficulty>]
+      +roll/odds[/spec][/wp] <expression> [vs <difficulty>]
+      +roll/group[/spec] <count> <pool> [vs <difficulty>]
+      +roll/npc[/spec] <name>[ x<count>]=<pool>[, ...] [vs <difficulty>]
+      +roll/log [<page>]
+      +roll/search <character>[=<page>]
 
     Examples:
       +roll strength+dexterity+3-2
       +roll stre+dex+3-2 vs 7
+      +roll/spec dex+melee vs 6
+      +roll/wp wits+alertness vs 8
+      +roll/odds/spec dex+melee vs 7
+      +roll/group 12 6 vs 7
+      +roll/npc Thug x3=5, Ghoul=7, Sire=4+5 vs 6
       +roll/log
 
     This command allows you to roll dice based on your character's stats
     and any modifiers. You can specify stats by their full name or abbreviation.
-    The difficulty is optional and defaults to 6 if not specified.
-    Stats that don't exist or have non-numeric values are treated as 0.
+    The difficulty is optional and defaults to 6 if not specified; it is
+    capped at 10. Stats that don't exist or have non-numeric values are
+    treated as 0.
 
-    Use +roll/log to view the last 10 rolls made in the current location.
+    Ones cancel successes, and a roll with no successes and at least one 1
+    is a botch. /spec rolls with a specialty: every 10 adds another die.
+    /wp spends a point of Willpower for one automatic success, which also
+    prevents a botch.
+
+    /odds shows the exact chance of each number of successes, and of a
+    botch, for a roll without making it (or spending Willpower).
+
+    /group rolls the same pool for several NPCs, and /npc rolls a list of
+    named NPCs, each with its own pool; 'x3' after a name rolls for three
+    of them. NPC pools are numbers, and all of them are rolled at once,
+    shown to the room as one table and logged as one roll.
+
+    Use +roll/log to view the rolls made in the current location, newest
+    first, 10 to a page; +roll/log 2 shows the next 10. Staff can use
+    +roll/search to list one character's rolls from every room.
     """
 
     key = "+roll"
@@ -37,6 +83,9 @@ class CmdRoll(default_cmds.MuxCommand):
         if self.switches and "log" in self.switches:
             self.display_roll_log()
             return
+        if self.switches and "search" in self.switches:
+            self.search_rolls()
+            return
 
         if not self.args:
             self.caller.msg("Usage: +roll <expression> [vs <difficulty>]")
@@ -51,44 +100,28 @@ class CmdRoll(default_cmds.MuxCommand):
         expression, difficulty = match.groups()
         difficulty = int(difficulty) if difficulty else 6
 
-        # Process the expression
-        components = re.findall(r'([+-])?\s*(\w+|\d+)', expression)
-        dice_pool = 0
-        description = []
-        detailed_description = []
-        warnings = []
-
-        for sign, value in components:
-            sign = sign or '+'  # Default to '+' if no sign is given
-            if value.isdigit():
-                modifier = int(value)
-                dice_pool += modifier if sign == '+' else -modifier
-                description.append(f"{sign} |w{value}|n")
-                detailed_description.append(f"{sign} |w{value}|n")
-            else:
-                try:
-                    stat_value, full_name = self.get_stat_value_and_name(value)
-                except AttributeError:
-                    stat_value, full_name = 0, value
-                    
-                if stat_value > 0:
-                    dice_pool += stat_value if sign == '+' else -stat_value
-                    description.append(f"{sign}|n |w{full_name}|n")
-                    detailed_description.append(f"{sign} |w{full_name} ({stat_value})|n")
-                elif stat_value == 0 and full_name:
-                    description.append(f"{sign} |w{full_name}|n")
-                    detailed_description.append(f"{sign} |w{full_name} (0)|n")
-                    warnings.append(f"|rWarning: Stat '{full_name}' not found or has no value. Treating as 0.|n")
-                else:
-                    description.append(f"{sign} |h|x{full_name}|n")
-                    detailed_description.append(f"{sign} |h|x{full_name} (0)|n")
-                    warnings.append(f"|rWarning: Stat '{full_name}' not found or has no value. Treating as 0.|n")
+        switches = [switch.lower() for switch in self.switches]
+        willpower = 'wp' in switches
+        if 'group' in switches or 'npc' in switches:
+            parse = self.parse_group if 'group' in switches else self.parse_npcs
+            entries = parse(expression)
+            if entries:
+                self.roll_batch(entries, difficulty, specialty='spec' in switches, willpower=willpower)
+            return
 
-        # Roll the dice using our utility function
-        rolls, successes, ones = roll_dice(dice_pool, difficulty)
-        
-        # Interpret the results
-        result = interpret_roll_results(successes, ones, rolls=rolls, diff=difficulty)
+        dice_pool, description, detailed_description, warnings = self.evaluate(expression)
+
+        if 'odds' in switches:
+            self.display_odds(dice_pool, difficulty, " ".join(detailed_description), warnings,
+                              specialty='spec' in switches, willpower=willpower)
+            return
+        if willpower and not self.spend_willpower():
+            return
+
+        # The whole pool in one draw; the seed lets staff replay the roll
+        roll = DICE.roll(dice_pool, difficulty, specialty='spec' in switches, willpower=willpower)
+        difficulty = roll.difficulty
+        result = format_roll(roll)
 
         # Format the outputs
         public_description = " ".join(description)
@@ -96,7 +129,7 @@ class CmdRoll(default_cmds.MuxCommand):
         
         public_output = f"|rRoll>|n {self.caller.db.gradient_name or self.caller.key} |yrolls |n{public_description} |yvs {difficulty} |r=>|n {result}"
         private_output = f"|rRoll> |yYou roll |n{private_description} |yvs {difficulty} |r=>|n {result}"
-        builder_output = f"|rRoll> |n{self.caller.db.gradient_name or self.caller.key} rolls {private_description} |yvs {difficulty}|r =>|n {result}"
+        builder_output = f"|rRoll> |n{self.caller.db.gradient_name or self.caller.key} rolls {private_description} |yvs {difficulty}|r =>|n {result} |x[seed {roll.seed}]|n"
 
         # Send outputs
         self.caller.msg(private_output)
@@ -113,71 +146,214 @@ class CmdRoll(default_cmds.MuxCommand):
 
         # After processing the roll, log it
         log_description = f"{private_description} vs {difficulty}"
-        self.caller.location.log_roll(self.caller.key, log_description, result)
+        self.caller.location.log_roll(self.caller, log_description, result, seed=roll.seed)
 
-    def get_stat_value_and_name(self, stat_name):
+    def evaluate(self, expression):
         """
-        Retrieve the value and full name of a stat for the character by searching the character's stats.
-        Returns the closest matching stat if an exact match is not found.
-        Uses 'temp' value if available and non-zero, otherwise uses 'perm'.
+        Work out the dice pool of a roll expression such as 'str+brawl-1'.
+        Returns (dice pool, public description parts, detailed description
+        parts, warnings).
+
+        Stats are matched by full name or abbreviation against the caller's
+        sheet, using each stat's effective value: 'temp' if available and
+        non-zero, otherwise 'perm', plus any overlay modifiers such as a form
+        or +pump. The parsed expression is cached until the sheet changes.
         """
         if not inherits_from(self.caller, "typeclasses.characters.Character"):
             self.caller.msg("Error: This command can only be used by characters.")
-            return 0, stat_name.capitalize()
+            return parse_expression(expression).evaluate(None)
+        return compile_expression(self.caller, expression).evaluate(self.caller)
 
-        character_stats = self.caller.db.stats or {}
-        all_stats = []
+    def parse_group(self, args):
+        """
+        Parse '<count> <pool>' for /group into [(name, pool)].
+        """
+        match = re.match(r'(\d+)\s+(\S.*)$', args.strip())
+        if not match:
+            self.caller.msg("Usage: +roll/group <count> <pool> [vs <difficulty>]")
+            return []
+        count = int(match.group(1))
+        if not 1 <= count <= MAX_BATCH:
+            self.caller.msg(f"You can roll for 1 to {MAX_BATCH} NPCs at once.")
+            return []
+        pool = self.npc_pool(match.group(2))
+        if pool is None:
+            return []
+        return [(f"#{number}", pool) for number in range(1, count + 1)]
 
-        # Flatten the nested dictionary structure
-        for category in character_stats.values():
-            for stat_type in category.values():
-                all_stats.extend(stat_type.keys())
+    def parse_npcs(self, args):
+        """
+        Parse a /npc statblock, '<name>[ x<count>]=<pool>, ...', into
+        [(name, pool)].
+        """
+        entries = []
+        for part in [part.strip() for part in args.split(',') if part.strip()]:
+            match = NPC_ENTRY.match(part)
+            if not match:
+                self.caller.msg(f"Can't read '{part}'. Use: +roll/npc <name>[ x<count>]=<pool>, ... [vs <difficulty>]")
+                return []
+            name, count, expression = match.groups()
+            pool = self.npc_pool(expression)
+            if pool is None:
+                return []
+            count = int(count or 1)
+            if count == 1:
+                entries.append((name, pool))
+            else:
+                entries.extend((f"{name} {number}", pool) for number in range(1, count + 1))
+        if not entries:
+            self.caller.msg("Usage: +roll/npc <name>[ x<count>]=<pool>, ... [vs <difficulty>]")
+        elif len(entries) > MAX_BATCH:
+            self.caller.msg(f"You can roll for 1 to {MAX_BATCH} NPCs at once.")
+            return []
+        return entries
 
-        # Find the closest matching stat name
-        closest_matches = get_close_matches(stat_name.lower(), [s.lower() for s in all_stats], n=1, cutoff=0.6)
-        
-        if closest_matches:
-            closest_match = next(s for s in all_stats if s.lower() == closest_matches[0])
-            
-            # Find the category and stat_type for the matched stat
-            for category, cat_stats in character_stats.items():
-                for stat_type, stats in cat_stats.items():
-                    if closest_match in stats:
-                        stat_data = stats[closest_match]
-                        temp_value = stat_data.get('temp', 0)
-                        perm_value = stat_data.get('perm', 0)
-                        
-                        # Use temp value if it's non-zero, otherwise use perm value
-                        value = temp_value if temp_value != 0 else perm_value
-                        
-                        try:
-                            return int(value), closest_match
-                        except ValueError:
-                            return 0, closest_match
-
-        # If no matching stat is found, return 0 and the capitalized input
-        return 0, stat_name.capitalize()
+    def npc_pool(self, expression):
+        """
+        Return the size of an NPC's pool, or None. NPC pools are numbers
+        only, like 4+2: NPCs have no sheet to look stats up on.
+        """
+        if not re.fullmatch(r'[\d\s+-]+', expression) or not re.search(r'\d', expression):
+            self.caller.msg(f"NPC pools are numbers, like 6 or 4+2, not '{expression.strip()}'.")
+            return None
+        return max(parse_expression(expression).evaluate(None).pool, 0)
+
+    def roll_batch(self, entries, difficulty, specialty=False, willpower=False):
+        """
+        Roll for a batch of NPCs, given as [(name, pool)]: every
+        pool drawn at once, one table sent to the room and one log entry.
+        NPCs have no Willpower to spend, so /wp just adds its success.
+        """
+        results = DICE.roll_many([pool for _, pool in entries], difficulty,
+                                 specialty=specialty, willpower=willpower)
+        difficulty = results[0].difficulty
+        roller = self.caller.db.gradient_name or self.caller.key
+        options = "".join(label for label, used in ((" with specialty", specialty), (" with Willpower", willpower)) if used)
+
+        width = max(len(name) for name, _ in entries)
+        rows = []
+        for (name, pool), result in zip(entries, results):
+            rows.append(f"  |w{name:<{width}}|n  {pool:>2} dice  {format_roll(result)}")
+        header = f"|rRoll>|n {roller} |yrolls for {len(entries)} NPCs vs {difficulty}{options}|n"
+        table = "\n".join(rows)
+        output = f"{header}\n{table}"
+        builder_output = f"{header} |x[seed {results[0].seed}]|n\n{table}"
+
+        for obj in self.caller.location.contents:
+            if inherits_from(obj, "typeclasses.characters.Character"):
+                if obj != self.caller and obj.locks.check_lockstring(obj, "perm(Builder)"):
+                    obj.msg(builder_output)
+                else:
+                    obj.msg(output)
+
+        # One log entry for the whole batch
+        log_description = ", ".join(f"{name} ({pool})" for name, pool in entries)
+        log_result = ", ".join(f"{name}: {format_successes(result)}" for (name, _), result in zip(entries, results))
+        self.caller.location.log_roll(self.caller, f"NPCs {log_description} vs {difficulty}{options}",
+                                      log_result, seed=results[0].seed)
+
+    def display_odds(self, dice_pool, difficulty, description, warnings, specialty=False, willpower=False):
+        """
+        Show the exact chances of each result of a roll, without rolling.
+        """
+        odds = pool_odds(dice_pool, difficulty, specialty=specialty, willpower=willpower)
+        options = [label for label, used in (("specialty", specialty), ("Willpower", willpower)) if used]
+        header = f"|rOdds> |n{description} |yvs {odds.difficulty}|n"
+        if options:
+            header += f" |x({', '.join(options)})|n"
+        lines = [header, f"|w{'Successes':>10}  {'Exactly':>8}  {'At least':>8}|n"]
+        for successes, chance in odds.distribution.items():
+            at_least = odds.at_least(successes)
+            if at_least < ODDS_SHOWN:
+                break
+            lines.append(f"{successes:>10}  {chance:>8.1%}  {at_least:>8.1%}")
+        lines.append(f"|yAt least one success:|n {odds.at_least(1):.1%}   "
+                     f"|rBotch:|n {odds.botch:.1%}   "
+                     f"|yAverage:|n {odds.expected:.2f}")
+        if warnings:
+            lines.extend(warnings)
+        self.caller.msg("\n".join(lines))
+
+    def spend_willpower(self):
+        """
+        Take a point of temporary Willpower for a /wp roll. Returns False,
+        with a message, if the caller has none left.
+        """
+        stats = self.caller.stats
+        current = stats.get('pools', 'dual', 'Willpower', temp=True)
+        if current is None:
+            current = stats.get('pools', 'dual', 'Willpower') or 0
+        if current <= 0:
+            self.caller.msg("|rYou have no Willpower left to spend.|n")
+            return False
+        with stats.batch(actor=self.caller, reason="+roll/wp"):
+            stats.set('pools', 'dual', 'Willpower', current - 1, temp=True)
+        return True
 
     def display_roll_log(self):
         """
-        Display the roll log for the current room.
+        Display a page of the roll log for the current room, newest first.
         """
         room = self.caller.location
-        roll_log = room.get_roll_log()
+        page = self.page_number(self.args)
+        if page is None:
+            return
+        self.display_rolls(room.get_roll_log(), page, "Rolls in this location",
+                           "No rolls have been logged in this location yet.", "+roll/log")
 
-        if not roll_log:
-            self.caller.msg("No rolls have been logged in this location yet.")
+    def search_rolls(self):
+        """
+        Display a page of one character's rolls, from every room.
+        """
+        if not self.caller.check_permstring("builders"):
+            self.caller.msg("Only staff can search the roll log.")
+            return
+        if not self.lhs:
+            self.caller.msg("Usage: +roll/search <character>[=<page>]")
             return
+        page = self.page_number(self.rhs)
+        if page is None:
+            return
+        target = self.caller.search(self.lhs, global_search=True, typeclass="typeclasses.characters.Character")
+        if not target:
+            return
+        self.display_rolls(ROLL_LOG.for_roller(target), page, f"Rolls by {target.key}",
+                           f"{target.key} has no logged rolls.", f"+roll/search {target.key}=", rooms=True)
 
-        header = "|yRecent rolls in this location:|n"
-        log_entries = []
-        for entry in roll_log:
-            timestamp = entry['timestamp']
-            if isinstance(timestamp, datetime):
-                timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                # Assume it's already a string or has a string representation
-                timestamp_str = str(timestamp)
-            log_entries.append(f"{timestamp_str} - {entry['roller']}: {entry['description']} => {entry['result']}")
+    def page_number(self, text):
+        text = (text or '').strip()
+        if not text:
+            return 1
+        if not text.isdigit() or int(text) < 1:
+            self.caller.msg("The page must be a number, starting from 1.")
+            return None
+        return int(text)
+
+    def display_rolls(self, rolls, page, title, empty, more_command, rooms=False):
+        """
+        Show page `page` of `rolls`, a RollLog queryset, LOG_PAGE_SIZE at a
+        time. With `rooms`, each line says where the roll was made.
+        """
+        total = rolls.count()
+        if not total:
+            self.caller.msg(empty)
+            return
+        pages = (total + LOG_PAGE_SIZE - 1) // LOG_PAGE_SIZE
+        page = min(page, pages)
+        start = (page - 1) * LOG_PAGE_SIZE
+        if rooms:
+            rolls = rolls.select_related('room')
 
-        self.caller.msg(header + "\n" + "\n".join(log_entries))
+        show_seeds = self.caller.check_permstring("builders")
+        lines = [f"|y{title} (page {page} of {pages}):|n"]
+        for entry in rolls[start:start + LOG_PAGE_SIZE]:
+            timestamp = timezone.localtime(entry.timestamp).strftime("%Y-%m-%d %H:%M:%S")
+            where = f" in {entry.room.key}" if rooms else ""
+            line = f"{timestamp}{where} - {entry.roller_name}: {entry.description} => {entry.result}"
+            if show_seeds and entry.seed is not None:
+                line += f" |x[seed {entry.seed}]|n"
+            lines.append(line)
+        if page < pages:
+            separator = "" if more_command.endswith("=") else " "
+            lines.append(f"|xOlder rolls: {more_command}{separator}{page + 1}|n")
+        self.caller.msg("\n".join(lines))
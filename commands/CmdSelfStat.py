@@ -1,6 +1,8 @@
 from evennia import default_cmds
-from world.wod20th.models import Stat, SHIFTER_IDENTITY_STATS, SHIFTER_RENOWN, calculate_willpower, calculate_road
+from world.wod20th.models import Stat, SHIFTER_IDENTITY_STATS, SHIFTER_RENOWN
 from evennia.utils import search
+from world.wod20th.utils.name_index import find_stats
+from world.wod20th.stat_schema import StatValueError, coerce_stat_value
 
 class CmdSelfStat(default_cmds.MuxCommand):
     """
@@ -62,23 +64,24 @@ class CmdSelfStat(default_cmds.MuxCommand):
 
     def func(self):
         """Implement the command"""
+        with self.caller.stats.batch(actor=self.caller, reason="+selfstat"):
+            self.update_stat()
+
+    def update_stat(self):
         character = self.caller
 
         if not self.stat_name:
             self.caller.msg("|rUsage: +selfstat <stat>[(<instance>)]/[<category>]=[+-]<value>|n")
             return
 
-        # Fetch the stat definition from the database
+        # Resolve the stat definition, tolerating abbreviations and typos
         try:
-            matching_stats = Stat.objects.filter(name__iexact=self.stat_name.strip())
-            
-            if not matching_stats.exists():
-                matching_stats = Stat.objects.filter(name__icontains=self.stat_name.strip())
+            matching_stats = find_stats(self.stat_name)
         except Exception as e:
             self.caller.msg(f"|rError fetching stats: {e}|n")
             return
 
-        if not matching_stats.exists():
+        if not matching_stats:
             self.caller.msg(f"|rNo stats matching '{self.stat_name}' found in the database.|n")
             return
 
@@ -86,7 +89,7 @@ class CmdSelfStat(default_cmds.MuxCommand):
             self.caller.msg(f"|rMultiple stats matching '{self.stat_name}' found: {[stat.name for stat in matching_stats]}. Please be more specific.|n")
             return
 
-        stat = matching_stats.first()
+        stat = matching_stats[0]
         full_stat_name = stat.name
 
         # Check if the stat is instanced and handle accordingly
@@ -150,13 +153,12 @@ class CmdSelfStat(default_cmds.MuxCommand):
             self.caller.msg(f"|rValue '{new_value}' is not valid for stat '{full_stat_name}'. Valid values are: {valid_values}|n")
             return
 
-        # Convert value to integer for virtues
-        if full_stat_name in ['Courage', 'Self-Control', 'Conscience', 'Conviction', 'Instinct']:
-            try:
-                new_value = int(new_value)
-            except ValueError:
-                self.caller.msg(f"|rInvalid value for {full_stat_name}. Please provide an integer.|n")
-                return
+        # Numeric stats must be given numbers
+        try:
+            new_value = coerce_stat_value(stat.category, stat.stat_type, full_stat_name, new_value)
+        except StatValueError as error:
+            self.caller.msg(f"|r{error}|n")
+            return
 
         # Update the stat
         character.set_stat(stat.category, stat.stat_type, full_stat_name, new_value, temp=False)
@@ -170,11 +172,11 @@ class CmdSelfStat(default_cmds.MuxCommand):
 
         # After setting a stat, recalculate Willpower and Road
         if full_stat_name in ['Courage', 'Self-Control', 'Conscience', 'Conviction', 'Instinct']:
-            new_willpower = calculate_willpower(character)
+            new_willpower = character.derived['willpower']
             character.set_stat('pools', 'dual', 'Willpower', new_willpower, temp=False)
             character.set_stat('pools', 'dual', 'Willpower', new_willpower, temp=True)
             self.caller.msg(f"|gRecalculated Willpower to {new_willpower}.|n")
 
-            new_road = calculate_road(character)
+            new_road = character.derived['road']
             character.set_stat('pools', 'moral', 'Road', new_road, temp=False)
             self.caller.msg(f"|gRecalculated Road to {new_road}.|n")
\ No newline at end of file
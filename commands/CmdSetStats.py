@@ -1,22 +1,38 @@
+from datetime import datetime
+
+from django.utils import timezone
 from evennia import default_cmds
-from world.wod20th.models import Stat, SHIFTER_IDENTITY_STATS, SHIFTER_RENOWN, calculate_willpower, calculate_road
+from world.wod20th.models import Stat
 from evennia.utils import search
+from evennia.utils.evmore import EvMore
+from world.wod20th.ledger import LEDGER
+from world.wod20th.sheet_versions import record_version
+from world.wod20th.catalog import STAT_CATALOG
+from world.wod20th.utils.name_index import find_stats
+from world.wod20th.splat_templates import get_template, template_for
+from world.wod20th.stat_schema import StatValueError, coerce_stat_value
+from world.wod20th.utils.formatting import header, footer
+
+# +stats/history shows at most this many entries
+HISTORY_LIMIT = 200
+
+class BatchAborted(Exception):
+    """
+    Raised inside +stats/batch to discard every change made so far.
+    """
+
+
+def format_ledger_value(value):
+    """
+    Format a ledger {'perm', 'temp'} value as "perm" or "perm/temp".
+    """
+    if not isinstance(value, dict):
+        return '-' if value is None else str(value)
+    perm, temp = value.get('perm'), value.get('temp')
+    if temp is None or temp == perm:
+        return str(perm if perm is not None else '-')
+    return f"{perm if perm is not None else '-'}/{temp}"
 
-# Define the allowed identity stats for each shifter type
-SHIFTER_IDENTITY_STATS = {
-    "Garou": ["Tribe", "Breed", "Auspice"],
-    "Gurahl": ["Tribe", "Breed", "Auspice"],
-    "Rokea": ["Tribe", "Breed", "Auspice"],
-    "Ananasi": ["Aspect", "Ananasi Faction", "Breed", "Ananasi Cabal"],
-    "Ajaba": ["Aspect", "Breed"],
-    "Bastet": ["Tribe", "Breed"],
-    "Corax": ["Breed"],
-    "Kitsune": ["Kitsune Path", "Kitsune Faction", "Breed"],
-    "Mokole": ["Varnas", "Stream", "Breed"],
-    "Nagah": ["Crown", "Breed", "Auspice"],
-    "Nuwisha": ["Breed"],
-    "Ratkin": ["Aspect", "Plague", "Breed"]
-}
 
 class CmdStats(default_cmds.MuxCommand):
     """
@@ -25,6 +41,15 @@ class CmdStats(default_cmds.MuxCommand):
       +stats me/<stat>[(<instance>)]/<category>=[+-]<value>
       +stats <character>=reset
       +stats me=reset
+      +stats/batch <character>/<stat>=<value>, <stat>=<value>, ...
+      +stats/history <character>[/<stat>]
+      +stats/history <character>[/<stat>]=<YYYY-MM-DD[ HH:MM]>
+
+    /batch applies every change together: if one of them is invalid, none
+    are made.
+
+    /history lists who changed a character's stats, when and why, newest
+    first. With a date it shows the stats as they were at that time.
 
     Examples:
       +stats Bob/Strength/Physical=+2
@@ -32,12 +57,17 @@ class CmdStats(default_cmds.MuxCommand):
       +stats John/Status(Ventrue)/Social=
       +stats me=reset
       +stats me/Strength=3
+      +stats/batch Bob/Strength=3, Dexterity=2, Status(Ventrue)=1
+      +stats/history Bob/Willpower
+      +stats/history Bob=2024-05-01 20:00
     """
 
     key = "stats"
     aliases = ["stat"]
     locks = "cmd:perm(Builder)"  # Only Builders and above can use this command
     help_category = "Chargen & Character Info"
+    # Messages held back during +stats/batch; see report()
+    held_messages = None
 
     def parse(self):
         """
@@ -49,6 +79,16 @@ class CmdStats(default_cmds.MuxCommand):
         self.category = None
         self.value_change = None
         self.temp = False
+        self.batch = []
+        self.when = None
+
+        switches = [switch.lower() for switch in self.switches]
+        if 'batch' in switches:
+            self.parse_batch()
+            return
+        if 'history' in switches:
+            self.parse_history()
+            return
 
         try:
             args = self.args.strip()
@@ -69,32 +109,69 @@ class CmdStats(default_cmds.MuxCommand):
                 self.character_name = first_part
                 stat_part = ''
 
-            try:
-                if '(' in stat_part and ')' in stat_part:
-                    self.stat_name, instance_and_category = stat_part.split('(', 1)
-                    self.instance, self.category = instance_and_category.split(')', 1)
-                    self.category = self.category.lstrip('/').strip() if '/' in self.category else None
-                else:
-                    parts = stat_part.split('/')
-                    if len(parts) == 3:
-                        self.stat_name, self.instance, self.category = parts
-                    elif len(parts) == 2:
-                        self.stat_name, self.category = parts
-                    else:
-                        self.stat_name = parts[0]
-
-                    self.stat_name = self.stat_name.strip()
-                    self.instance = self.instance.strip() if self.instance else None
-                    self.category = self.category.strip() if self.category else None
-
-            except ValueError:
-                self.stat_name = stat_part.strip()
-            except UnboundLocalError:
-                self.stat_name = stat_part.strip()
+            self.parse_stat_part(stat_part)
 
         except ValueError:
             self.character_name = self.stat_name = self.value_change = self.instance = self.category = None
 
+    def parse_stat_part(self, stat_part):
+        """
+        Parse <stat>[(<instance>)]/[<category>] into stat_name, instance
+        and category.
+        """
+        self.stat_name = ""
+        self.instance = None
+        self.category = None
+        try:
+            if '(' in stat_part and ')' in stat_part:
+                self.stat_name, instance_and_category = stat_part.split('(', 1)
+                self.instance, self.category = instance_and_category.split(')', 1)
+                self.category = self.category.lstrip('/').strip() if '/' in self.category else None
+            else:
+                parts = stat_part.split('/')
+                if len(parts) == 3:
+                    self.stat_name, self.instance, self.category = parts
+                elif len(parts) == 2:
+                    self.stat_name, self.category = parts
+                else:
+                    self.stat_name = parts[0]
+
+                self.stat_name = self.stat_name.strip()
+                self.instance = self.instance.strip() if self.instance else None
+                self.category = self.category.strip() if self.category else None
+
+        except ValueError:
+            self.stat_name = stat_part.strip()
+        except UnboundLocalError:
+            self.stat_name = stat_part.strip()
+
+    def parse_batch(self):
+        """
+        Parse <character>/<stat>=<value>, <stat>=<value>, ... into
+        character_name and a list of (stat part, value) pairs.
+        """
+        args = self.args.strip()
+        if '/' not in args:
+            return
+        self.character_name, pairs = args.split('/', 1)
+        self.character_name = self.character_name.strip()
+        for pair in pairs.split(','):
+            if not pair.strip():
+                continue
+            stat_part, sep, value = pair.partition('=')
+            self.batch.append((stat_part.strip(), value.strip() if sep else None))
+
+    def parse_history(self):
+        """
+        Parse <character>[/<stat>][=<when>].
+        """
+        args, _, self.when = self.args.strip().partition('=')
+        self.when = self.when.strip() or None
+        self.character_name, _, stat_part = args.partition('/')
+        self.character_name = self.character_name.strip()
+        if stat_part.strip():
+            self.parse_stat_part(stat_part.strip())
+
     def func(self):
         """Implement the command"""
 
@@ -111,9 +188,19 @@ class CmdStats(default_cmds.MuxCommand):
             self.caller.msg(f"|rCharacter '{self.character_name}' not found.|n")
             return
 
+        switches = [switch.lower() for switch in self.switches]
+        if 'batch' in switches:
+            self.apply_batch(character)
+            return
+        if 'history' in switches:
+            self.show_history(character)
+            return
+
         # Handle the reset command
         if self.stat_name and self.stat_name.lower() == 'reset':
-            character.db.stats = {}
+            with character.stats.batch(actor=self.caller, reason="+stats reset"):
+                character.db.stats = {}
+            record_version(character, actor=self.caller, reason="+stats reset")
             self.caller.msg(f"|gReset all stats for {character.name}.|n")
             character.msg(f"|y{self.caller.name}|n |greset all your stats.|n")
             return
@@ -122,33 +209,41 @@ class CmdStats(default_cmds.MuxCommand):
             self.caller.msg("|rUsage: +stats <character>/<stat>[(<instance>)]/[<category>]=[+-]<value>|n")
             return
 
-        # Fetch the stat definition from the database
+        # Pools, templates and recalculated Willpower/Road are saved together
+        with character.stats.batch(actor=self.caller, reason="+stats"):
+            changed = self.apply_stat_change(character)
+        if changed:
+            record_version(character, actor=self.caller, reason="+stats")
+
+    def apply_stat_change(self, character):
+        """
+        Apply self.stat_name/instance/category=value_change to a character.
+        Returns True if the stat was changed or removed.
+        """
+        # Resolve the stat definition, tolerating abbreviations and typos
         try:
             if self.stat_name.lower() in ['nature', 'demeanor']:
-                matching_stats = Stat.objects.filter(name=self.stat_name, category='identity', stat_type='personal')
+                matching_stats = STAT_CATALOG.filter(name=self.stat_name, category='identity', stat_type='personal')
             else:
-                matching_stats = Stat.objects.filter(name__iexact=self.stat_name.strip())
-            
-            if not matching_stats.exists():
-                matching_stats = Stat.objects.filter(name__icontains=self.stat_name.strip())
+                matching_stats = find_stats(self.stat_name)
         except Exception as e:
             self.caller.msg(f"|rError fetching stats: {e}|n")
-            return
+            return False
 
-        if not matching_stats.exists():
+        if not matching_stats:
             self.caller.msg(f"|rNo stats matching '{self.stat_name}' found in the database.|n")
-            return
+            return False
 
         if len(matching_stats) > 1:
             # If multiple matches and one of them is 'Seelie Legacy', use that
-            seelie_legacy = matching_stats.filter(name='Seelie Legacy').first()
+            seelie_legacy = next((stat for stat in matching_stats if stat.name == 'Seelie Legacy'), None)
             if seelie_legacy:
                 stat = seelie_legacy
             else:
                 self.caller.msg(f"|rMultiple stats matching '{self.stat_name}' found: {[stat.name for stat in matching_stats]}. Please be more specific.|n")
-                return
+                return False
         else:
-            stat = matching_stats.first()
+            stat = matching_stats[0]
 
         full_stat_name = stat.name
 
@@ -156,41 +251,33 @@ class CmdStats(default_cmds.MuxCommand):
         if stat.instanced:
             if not self.instance:
                 self.caller.msg(f"|rThe stat '{full_stat_name}' requires an instance. Use the format: {full_stat_name}(instance)|n")
-                return
+                return False
             full_stat_name = f"{full_stat_name}({self.instance})"
         elif self.instance:
             self.caller.msg(f"|rThe stat '{full_stat_name}' does not support instances.|n")
-            return
+            return False
 
         # Check if the character passes the stat's lock_string
         try:
             if stat.lockstring and not character.locks.check_lockstring(character, stat.lockstring):
                 self.caller.msg(f"|rYou do not have permission to modify the stat '{full_stat_name}' for {character.name}.|n")
-                return
+                return False
         except AttributeError:
             pass
         
+        template = template_for(character)
+
         # Check if the stat being set is an identity stat for a shifter
-        if character.get_stat('other', 'splat', 'Splat').lower() == 'shifter' and stat.category == 'identity':
-            shifter_type = character.get_stat('identity', 'lineage', 'Type')
-            if shifter_type and full_stat_name != 'Type':
-                allowed_stats = SHIFTER_IDENTITY_STATS.get(shifter_type, [])
-                if full_stat_name not in allowed_stats:
-                    self.caller.msg(f"|rThe stat '{full_stat_name}' is not valid for {shifter_type} characters.|n")
-                    return
+        if template.splat == 'Shifter' and template.subtype and stat.category == 'identity':
+            if full_stat_name not in template.identity:
+                self.caller.msg(f"|rThe stat '{full_stat_name}' is not valid for {template.subtype} characters.|n")
+                return False
 
         # Add this check before updating the stat
         if stat.category == 'pools':
-            splat = character.get_stat('other', 'splat', 'Splat')
-            valid_pools = ['Willpower']
-            if splat.lower() == 'vampire':
-                valid_pools.extend(['Blood', 'Road'])
-            elif splat.lower() == 'shifter':
-                valid_pools.extend(['Gnosis', 'Rage'])
-            
-            if full_stat_name not in valid_pools:
-                self.caller.msg(f"|rThe pool '{full_stat_name}' is not valid for {splat}.|n")
-                return
+            if full_stat_name not in template.pool_names:
+                self.caller.msg(f"|rThe pool '{full_stat_name}' is not valid for {template.splat}.|n")
+                return False
 
         # Determine if the stat should be removed
         if self.value_change == '':
@@ -198,11 +285,11 @@ class CmdStats(default_cmds.MuxCommand):
             if full_stat_name in current_stats:
                 del current_stats[full_stat_name]
                 character.db.stats[stat.category][stat.stat_type] = current_stats
-                self.caller.msg(f"|gRemoved stat '{full_stat_name}' from {character.name}.|n")
-                character.msg(f"|y{self.caller.name}|n |rremoved your stat|n '|y{full_stat_name}|n'.")
-            else:
-                self.caller.msg(f"|rStat '{full_stat_name}' not found on {character.name}.|n")
-            return
+                self.report(self.caller, f"|gRemoved stat '{full_stat_name}' from {character.name}.|n")
+                self.report(character, f"|y{self.caller.name}|n |rremoved your stat|n '|y{full_stat_name}|n'.")
+                return True
+            self.caller.msg(f"|rStat '{full_stat_name}' not found on {character.name}.|n")
+            return False
 
         # Determine if the stat value should be treated as a number or a string
         try:
@@ -226,7 +313,7 @@ class CmdStats(default_cmds.MuxCommand):
                 new_value = current_value + value_change
             else:
                 self.caller.msg(f"|rIncrement/decrement values must be integers.|n")
-                return
+                return False
         else:
             new_value = value_change
 
@@ -234,15 +321,14 @@ class CmdStats(default_cmds.MuxCommand):
         valid_values = stat.values
         if valid_values and new_value not in valid_values and valid_values != []:
             self.caller.msg(f"|rValue '{new_value}' is not valid for stat '{full_stat_name}'. Valid values are: {valid_values}|n")
-            return
+            return False
 
-        # Convert value to integer for virtues
-        if full_stat_name in ['Courage', 'Self-Control', 'Conscience', 'Conviction', 'Instinct']:
-            try:
-                new_value = int(new_value)
-            except ValueError:
-                self.caller.msg(f"|rInvalid value for {full_stat_name}. Please provide an integer.|n")
-                return
+        # Numeric stats must be given numbers
+        try:
+            new_value = coerce_stat_value(stat.category, stat.stat_type, full_stat_name, new_value)
+        except StatValueError as error:
+            self.caller.msg(f"|r{error}|n")
+            return False
 
         # Update the stat
         character.set_stat(stat.category, stat.stat_type, full_stat_name, new_value, temp=False)
@@ -250,11 +336,11 @@ class CmdStats(default_cmds.MuxCommand):
         # If the stat is in the 'pools' category or has a 'dual' stat_type, update the temporary value as well
         if stat.category == 'pools' or stat.stat_type == 'dual':
             character.set_stat(stat.category, stat.stat_type, full_stat_name, new_value, temp=True)
-            self.caller.msg(f"|gUpdated {character.name}'s {full_stat_name} to {new_value} (both permanent and temporary).|n")
-            character.msg(f"|y{self.caller.name}|n |gupdated your|n '|y{full_stat_name}|n' |gto|n '|y{new_value}|n' |g(both permanent and temporary).|n")
+            self.report(self.caller, f"|gUpdated {character.name}'s {full_stat_name} to {new_value} (both permanent and temporary).|n")
+            self.report(character, f"|y{self.caller.name}|n |gupdated your|n '|y{full_stat_name}|n' |gto|n '|y{new_value}|n' |g(both permanent and temporary).|n")
         else:
-            self.caller.msg(f"|gUpdated {character.name}'s {full_stat_name} to {new_value}.|n")
-            character.msg(f"|y{self.caller.name}|n |gupdated your|n '|y{full_stat_name}|n' |gto|n '|y{new_value}|n'.")
+            self.report(self.caller, f"|gUpdated {character.name}'s {full_stat_name} to {new_value}.|n")
+            self.report(character, f"|y{self.caller.name}|n |gupdated your|n '|y{full_stat_name}|n' |gto|n '|y{new_value}|n'.")
 
         # If the stat is 'Type' for a Shifter, apply the correct pools and renown
         if full_stat_name == 'Type' and character.get_stat('other', 'splat', 'Splat').lower() == 'shifter':
@@ -263,8 +349,8 @@ class CmdStats(default_cmds.MuxCommand):
         # If the stat is Willpower, update the temporary Willpower pool to match the permanent value
         if full_stat_name == 'Willpower':
             character.set_stat('pools', 'temporary', 'Willpower', new_value, temp=True)
-            self.caller.msg(f"|gAlso updated {character.name}'s temporary Willpower pool to {new_value}.|n")
-            character.msg(f"|gYour temporary Willpower pool has also been set to {new_value}.|n")
+            self.report(self.caller, f"|gAlso updated {character.name}'s temporary Willpower pool to {new_value}.|n")
+            self.report(character, f"|gYour temporary Willpower pool has also been set to {new_value}.|n")
 
         # If the stat is 'Splat', apply the correct pools and bio stats
         if full_stat_name == 'Splat':
@@ -276,18 +362,141 @@ class CmdStats(default_cmds.MuxCommand):
 
         # After setting a stat, recalculate Willpower and Road
         if full_stat_name in ['Courage', 'Self-Control', 'Conscience', 'Conviction', 'Instinct', 'Enlightenment']:
-            new_willpower = calculate_willpower(character)
+            new_willpower = character.derived['willpower']
             character.set_stat('pools', 'dual', 'Willpower', new_willpower, temp=False)
             character.set_stat('pools', 'dual', 'Willpower', new_willpower, temp=True)
-            self.caller.msg(f"|gRecalculated Willpower to {new_willpower}.|n")
+            self.report(self.caller, f"|gRecalculated Willpower to {new_willpower}.|n")
 
             # If Enlightenment is changed, update the virtues
             if full_stat_name == 'Enlightenment':
                 self.update_virtues_for_enlightenment(character)
 
-            new_road = calculate_road(character)
+            new_road = character.derived['road']
             character.set_stat('pools', 'moral', 'Road', new_road, temp=False)
-            self.caller.msg(f"|gRecalculated Road to {new_road}.|n")
+            self.report(self.caller, f"|gRecalculated Road to {new_road}.|n")
+
+        return True
+
+    def report(self, obj, text):
+        """
+        Tell `obj` about a change. During +stats/batch the message is held
+        until the batch is saved, so no one hears about changes that are
+        then rolled back.
+        """
+        if self.held_messages is not None:
+            self.held_messages.append((obj, text))
+        else:
+            obj.msg(text)
+
+    def apply_batch(self, character):
+        """
+        Apply every stat=value pair from +stats/batch in one save. If any
+        pair fails, none of them are applied.
+        """
+        if not self.batch:
+            self.caller.msg("|rUsage: +stats/batch <character>/<stat>=<value>, <stat>=<value>, ...|n")
+            return
+
+        self.held_messages = []
+        try:
+            with character.stats.batch(actor=self.caller, reason="+stats/batch"):
+                for stat_part, value in self.batch:
+                    self.parse_stat_part(stat_part)
+                    self.value_change = value
+                    if not self.stat_name or value is None:
+                        self.caller.msg(f"|rCould not parse '{stat_part}'. Use <stat>=<value>.|n")
+                        raise BatchAborted
+                    if not self.apply_stat_change(character):
+                        raise BatchAborted
+        except BatchAborted:
+            self.caller.msg(f"|rNo changes were made to {character.name}.|n")
+            return
+        finally:
+            held, self.held_messages = self.held_messages, None
+
+        # The batch is saved: now report its changes
+        for obj, text in held:
+            obj.msg(text)
+        record_version(character, actor=self.caller, reason="+stats/batch")
+        self.caller.msg(f"|gApplied {len(self.batch)} stat changes to {character.name}.|n")
+
+    def history_filter(self):
+        """
+        Return (category, stat_type, name) to narrow +stats/history to, with
+        None for parts that aren't narrowed.
+        """
+        if not self.stat_name:
+            return None, None, None
+        matching_stats = find_stats(self.stat_name)
+        if len(matching_stats) != 1:
+            # Not a unique stat, e.g. damage: match the name as typed
+            return None, None, self.stat_name.strip().title()
+        stat = matching_stats[0]
+        name = f"{stat.name}({self.instance})" if self.instance else stat.name
+        return stat.category, stat.stat_type, name
+
+    def show_history(self, character):
+        """
+        List stat ledger entries for a character, or its stats at a time.
+        """
+        if not self.character_name:
+            self.caller.msg("|rUsage: +stats/history <character>[/<stat>][=<YYYY-MM-DD[ HH:MM]>]|n")
+            return
+        category, stat_type, name = self.history_filter()
+
+        if self.when:
+            when = None
+            for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+                try:
+                    when = datetime.strptime(self.when, fmt)
+                    break
+                except ValueError:
+                    continue
+            if when is None:
+                self.caller.msg("|rUse a date like 2024-05-01 or 2024-05-01 20:00.|n")
+                return
+            self.show_state_at(character, timezone.make_aware(when), category, stat_type, name)
+            return
+
+        entries = list(LEDGER.history(character, category, stat_type, name)[:HISTORY_LIMIT])
+        if not entries:
+            self.caller.msg(f"|rNo recorded stat changes for {character.name}.|n")
+            return
+
+        lines = [header(f"Stat History: {character.name}", width=78)]
+        lines.append(f"|w{'When':<17}{'Stat':<22}{'Change':<15}By / Reason|n\n")
+        for entry in entries:
+            change = f"{format_ledger_value(entry.old_value)} -> {format_ledger_value(entry.new_value)}"
+            by = ' / '.join(part for part in (entry.actor, entry.reason) if part)
+            lines.append(
+                f"{timezone.localtime(entry.timestamp).strftime('%Y-%m-%d %H:%M'):<17}"
+                f"{entry.name[:21]:<22}{change[:14]:<15}{by[:24]}\n"
+            )
+        if len(entries) == HISTORY_LIMIT:
+            lines.append(f"Showing the latest {HISTORY_LIMIT} changes.\n")
+        lines.append(footer(width=78))
+        EvMore(self.caller, ''.join(str(line) for line in lines))
+
+    def show_state_at(self, character, when, category, stat_type, name):
+        state = LEDGER.state_at(character, when)
+        lines = [header(f"{character.name} at {self.when}", width=78)]
+        found = False
+        for cat, types in sorted(state.items()):
+            if category and cat != category:
+                continue
+            for typ, stats in sorted(types.items()):
+                if stat_type and typ != stat_type:
+                    continue
+                for stat, value in sorted(stats.items()):
+                    if name and stat != name:
+                        continue
+                    found = True
+                    lines.append(f"{cat}/{typ}/{stat}: {format_ledger_value(value)}\n")
+        if not found:
+            self.caller.msg(f"|rNo matching stats for {character.name} at {self.when}.|n")
+            return
+        lines.append(footer(width=78))
+        EvMore(self.caller, ''.join(str(line) for line in lines))
 
     def update_virtues_for_enlightenment(self, character):
         enlightenment = character.get_stat('identity', 'personal', 'Enlightenment', temp=False)
@@ -329,7 +538,7 @@ class CmdStats(default_cmds.MuxCommand):
             for virtue in virtues:
                 character.set_stat('virtues', 'moral', virtue, 1, temp=False)
             
-            self.caller.msg(f"|gUpdated virtues for {enlightenment}: {', '.join(virtues)}.|n")
+            self.report(self.caller, f"|gUpdated virtues for {enlightenment}: {', '.join(virtues)}.|n")
         else:
             self.caller.msg(f"|rUnknown path of enlightenment: {enlightenment}|n")
     def apply_splat_pools(self, character, splat):
@@ -342,24 +551,19 @@ class CmdStats(default_cmds.MuxCommand):
             character.set_stat('pools', 'dual', 'Willpower', 1, temp=False)
             character.set_stat('pools', 'dual', 'Willpower', 1, temp=True)
 
+        self.apply_template_pools(character, get_template(splat))
+
         if splat.lower() == 'vampire':
             self.apply_vampire_stats(character)
-        elif splat.lower() == 'shifter':
-            self.apply_shifter_stats(character)
         elif splat.lower() == 'mage':
             self.apply_mage_stats(character)
         elif splat.lower() == 'changeling':
             self.apply_changeling_stats(character)
 
-        self.caller.msg(f"|gApplied default stats for {splat} to {character.name}.|n")
-        character.msg(f"|gYour default stats for {splat} have been applied.|n")
+        self.report(self.caller, f"|gApplied default stats for {splat} to {character.name}.|n")
+        self.report(character, f"|gYour default stats for {splat} have been applied.|n")
 
     def apply_vampire_stats(self, character):
-        # Add Vampire-specific pools
-        character.set_stat('pools', 'dual', 'Blood', 10, temp=False)
-        character.set_stat('pools', 'dual', 'Blood', 10, temp=True)
-        character.set_stat('pools', 'moral', 'Road', 1, temp=False)
-
         # Set default Enlightenment to Humanity if not already set
         enlightenment = character.get_stat('identity', 'personal', 'Enlightenment', temp=False)
         if not enlightenment:
@@ -370,39 +574,19 @@ class CmdStats(default_cmds.MuxCommand):
         self.update_virtues_for_enlightenment(character)
 
         # Recalculate Willpower and Road after setting virtues
-        new_willpower = calculate_willpower(character)
+        new_willpower = character.derived['willpower']
         character.set_stat('pools', 'dual', 'Willpower', new_willpower, temp=False)
         character.set_stat('pools', 'dual', 'Willpower', new_willpower, temp=True)
 
-        new_road = calculate_road(character)
+        new_road = character.derived['road']
         character.set_stat('pools', 'moral', 'Road', new_road, temp=False)
 
-    def apply_shifter_stats(self, character):
-        # Add Shifter-specific pools
-        character.set_stat('pools', 'dual', 'Gnosis', 1, temp=False)
-        character.set_stat('pools', 'dual', 'Gnosis', 1, temp=True)
-        character.set_stat('pools', 'dual', 'Rage', 1, temp=False)
-        character.set_stat('pools', 'dual', 'Rage', 1, temp=True)
-
     def apply_mage_stats(self, character):
-        # Add Mage-specific pools
-        character.set_stat('pools', 'dual', 'Quintessence', 1, temp=False)
-        character.set_stat('pools', 'dual', 'Quintessence', 1, temp=True)
-        character.set_stat('pools', 'dual', 'Paradox', 0, temp=False)
-        character.set_stat('pools', 'dual', 'Paradox', 0, temp=True)
-        character.set_stat('other', 'advantage', 'Arete', 1, temp=False)
-
         # Add Mage-specific bio stats
         character.set_stat('identity', 'lineage', 'Essence', '')
         character.set_stat('identity', 'lineage', 'Mage Faction', '')
 
     def apply_changeling_stats(self, character):
-        # Add Changeling-specific pools
-        character.set_stat('pools', 'dual', 'Glamour', 1, temp=False)
-        character.set_stat('pools', 'dual', 'Glamour', 1, temp=True)
-        character.set_stat('pools', 'dual', 'Banality', 5, temp=False)
-        character.set_stat('pools', 'dual', 'Banality', 5, temp=True)
-
         # Add Changeling-specific bio stats
         character.set_stat('identity', 'lineage', 'Kith', '')
         character.set_stat('identity', 'lineage', 'Seeming', '')
@@ -427,10 +611,10 @@ class CmdStats(default_cmds.MuxCommand):
                 }
             )
             if created:
-                self.caller.msg(f"|gCreated new stat: {stat_name}|n")
+                self.report(self.caller, f"|gCreated new stat: {stat_name}|n")
 
-        self.caller.msg(f"|gApplied Changeling-specific stats to {character.name}.|n")
-        character.msg(f"|gYour Changeling-specific stats have been applied.|n")
+        self.report(self.caller, f"|gApplied Changeling-specific stats to {character.name}.|n")
+        self.report(character, f"|gYour Changeling-specific stats have been applied.|n")
 
     def apply_mage_faction_stats(self, character, faction):
         if faction.lower() == 'traditions':
@@ -447,8 +631,15 @@ class CmdStats(default_cmds.MuxCommand):
             if stat not in character.db.stats.get('identity', {}).get('lineage', {}):
                 character.db.stats['identity']['lineage'].pop(stat, None)
 
-        self.caller.msg(f"|gApplied {faction} specific stats to {character.name}.|n")
-        character.msg(f"|gYour {faction} specific stats have been applied.|n")
+        self.report(self.caller, f"|gApplied {faction} specific stats to {character.name}.|n")
+        self.report(character, f"|gYour {faction} specific stats have been applied.|n")
+
+    def apply_template_pools(self, character, template):
+        """Set every pool the template defines to its starting value."""
+        for pool in template.pools:
+            character.set_stat(pool.category, pool.stat_type, pool.name, pool.perm, temp=False)
+            if pool.temp is not None:
+                character.set_stat(pool.category, pool.stat_type, pool.name, pool.temp, temp=True)
 
     def apply_shifter_pools(self, character, shifter_type):
         """Apply the correct pools and renown based on the Shifter's type."""
@@ -457,36 +648,28 @@ class CmdStats(default_cmds.MuxCommand):
             character.set_stat('pools', 'dual', 'Willpower', 1, temp=False)
             character.set_stat('pools', 'dual', 'Willpower', 1, temp=True)
 
-        # Set Gnosis for all Shifter types
-        character.set_stat('pools', 'dual', 'Gnosis', 1, temp=False)
-        character.set_stat('pools', 'dual', 'Gnosis', 1, temp=True)
-
-        if shifter_type == 'Ananasi':
-            # Remove Rage if it exists
-            if 'Rage' in character.db.stats.get('pools', {}):
-                del character.db.stats['pools']['Rage']
-            # Add Blood
-            character.set_stat('pools', 'dual', 'Blood', 10, temp=False)
-            character.set_stat('pools', 'dual', 'Blood', 10, temp=True)
-        else:
-            # Remove Blood if it exists
-            if 'Blood' in character.db.stats.get('pools', {}):
-                del character.db.stats['pools']['Blood']
-            # Add Rage
-            character.set_stat('pools', 'dual', 'Rage', 1, temp=False)
-            character.set_stat('pools', 'dual', 'Rage', 1, temp=True)
+        template = get_template('Shifter', shifter_type)
+        pool_names = template.pool_names
+
+        # Drop pools this type doesn't use, e.g. Rage for Ananasi
+        dual_pools = character.db.stats.get('pools', {}).get('dual', {})
+        for pool in ['Rage', 'Blood']:
+            if pool not in pool_names and pool in dual_pools:
+                del character.db.stats['pools']['dual'][pool]
+
+        self.apply_template_pools(character, template)
 
         # Set Renown
-        renown_types = SHIFTER_RENOWN.get(shifter_type, [])
-        for renown_type in renown_types:
+        for renown_type in template.renown:
             character.set_stat('advantages', 'renown', renown_type, 0, temp=False)
 
-        self.caller.msg(f"|gApplied specific pools and renown for {shifter_type} to {character.name}.|n")
-        character.msg(f"|gYour specific pools and renown for {shifter_type} have been applied.|n")
+        self.report(self.caller, f"|gApplied specific pools and renown for {shifter_type} to {character.name}.|n")
+        self.report(character, f"|gYour specific pools and renown for {shifter_type} have been applied.|n")
 
 from evennia.commands.default.muxcommand import MuxCommand
 from world.wod20th.models import Stat
 from evennia.utils import search
+from world.wod20th.utils.name_index import find_stats
 
 class CmdSpecialty(MuxCommand):
     """
@@ -544,14 +727,14 @@ class CmdSpecialty(MuxCommand):
             self.caller.msg(f"|rCharacter '{self.character_name}' not found.|n")
             return
 
-        # Fetch the stat definition from the database
+        # Resolve the stat definition, tolerating abbreviations and typos
         try:
-            matching_stats = Stat.objects.filter(name__icontains=self.stat_name.strip())
+            matching_stats = find_stats(self.stat_name)
         except Exception as e:
             self.caller.msg(f"|rError fetching stats: {e}|n")
             return
 
-        if not matching_stats.exists():
+        if not matching_stats:
             self.caller.msg(f"|rNo stats matching '{self.stat_name}' found in the database.|n")
             return
 
@@ -559,7 +742,7 @@ class CmdSpecialty(MuxCommand):
             self.caller.msg(f"|rMultiple stats matching '{self.stat_name}' found: {[stat.name for stat in matching_stats]}. Please be more specific.|n")
             return
 
-        stat = matching_stats.first()
+        stat = matching_stats[0]
         stat_name = stat.name
 
         specialties = character.db.specialties or {}
@@ -5,30 +5,11 @@ from evennia.utils import evtable
 from typeclasses.characters import Character
 from world.wod20th.models import ShapeshifterForm, Stat
 from world.wod20th.utils.formatting import format_stat
+from world.wod20th.catalog import STAT_CATALOG
+from world.wod20th.overlays import FORM_LAYER
+from world.wod20th.timers import cancel, reset_form_stats, schedule
 
-from random import randint
-from typing import List, Tuple
-
-def roll_dice(dice_pool: int, difficulty: int) -> Tuple[List[int], int, int]:
-    rolls = [randint(1, 10) for _ in range(max(0, dice_pool))]
-    successes = sum(1 for roll in rolls if roll >= difficulty)
-    ones = sum(1 for roll in rolls if roll == 1)
-    successes = max(0, successes - ones)  # Ensure successes don't go negative
-    return rolls, successes, ones
-
-def interpret_roll_results(successes, ones, diff=6, rolls=None):
-    success_string = f"|g{successes}|n" if successes > 0 else f"|y{successes}|n" if successes == 0 else f"|r{successes}|n"
-    
-    msg = f"|w(|n{success_string}|w)|n"
-    msg += f"|r Botch!|n" if successes == 0 and ones > 0 else "|y Successes|n" if successes != 1 else "|y Success|n"
-    
-    if rolls:
-        msg += " |w(|n"
-        rolls.sort(reverse=True)
-        msg += " ".join(f"|r{roll}|n" if roll == 1 else f"|g{roll}|n" if roll >= diff else f"|y{roll}|n" for roll in rolls)
-        msg += "|w)|n"
-    
-    return msg
+from world.wod20th.utils.dice_rolls import DICE, format_roll
 
 class CmdShift(default_cmds.MuxCommand):
     """
@@ -116,17 +97,25 @@ class CmdShift(default_cmds.MuxCommand):
             self.caller.msg(f"You don't have permission to use the {form_name} form.")
             return
 
-        self._reset_stats(character)
+        # Rage spent and the form change are saved in one write
+        with character.stats.batch(actor=character, reason=f"+shift {form.name}"):
+            self._reset_stats(character)
 
-        if "roll" in self.switches:
-            success = self._shift_with_roll(character, form)
-        elif "rage" in self.switches:
-            success = self._shift_with_rage(character, form)
-        else:
-            success = self._shift_default(character, form)
+            if "roll" in self.switches:
+                success = self._shift_with_roll(character, form)
+            elif "rage" in self.switches:
+                success = self._shift_with_rage(character, form)
+            else:
+                success = self._shift_default(character, form)
+
+            if success:
+                # A new shift replaces any timed form still running
+                cancel(character, kind='form')
+                self._apply_form_changes(character, form)
+                if form.duration:
+                    schedule(character, form.duration, 'form', form=form.name, source='+shift')
 
         if success:
-            self._apply_form_changes(character, form)
             self._display_shift_message(character, form)
 
     def is_valid_character(self, obj):
@@ -146,13 +135,10 @@ class CmdShift(default_cmds.MuxCommand):
 
 
     def _reset_stats(self, character):
-        # Reset all stats that can be modified by shapeshifting
-        stats_to_reset = ['strength', 'dexterity', 'stamina', 'charisma', 'manipulation', 'appearance', 'perception', 'intelligence', 'wits']
-        for stat in stats_to_reset:
-           stat_obj = Stat.objects.get(name__iexact=stat, category='attributes')
-           if stat_obj.category and stat_obj.stat_type:
-               curr_stat = character.get_stat(stat_obj.category, stat_obj.stat_type, stat_obj.name)
-               character.set_stat(stat_obj.category, stat_obj.stat_type, stat_obj.name, curr_stat, temp=True)
+        # Drop the current form's modifiers
+        if not character.overlays.remove_layer(FORM_LAYER) and character.db.current_form:
+            # Shifted before forms were an overlay: its changes are in temp
+            reset_form_stats(character)
 
     def _shift_with_roll(self, character, form):
         # Use the character's Primal-Urge (or equivalent) + relevant Attribute for the dice pool
@@ -161,17 +147,17 @@ class CmdShift(default_cmds.MuxCommand):
         dice_pool = primal_urge + relevant_attribute
         difficulty = form.difficulty
 
-        rolls, successes, ones = roll_dice(dice_pool, difficulty)
-        result_msg = interpret_roll_results(successes, ones, difficulty, rolls)
+        roll = DICE.roll(dice_pool, difficulty)
+        result_msg = format_roll(roll)
 
         self.caller.msg(f"Attempting to shift into {form.name} form...")
-        self.caller.msg(f"Rolling {dice_pool} dice (Primal-Urge {primal_urge} + Stamina {relevant_attribute}) against difficulty {difficulty}.")
+        self.caller.msg(f"Rolling {dice_pool} dice (Primal-Urge {primal_urge} + Stamina {relevant_attribute}) against difficulty {roll.difficulty}.")
         self.caller.msg(f"Roll result: {result_msg}")
 
-        if successes > 0:
+        if roll.successes > 0:
             self.caller.msg(f"Success! You shift into {form.name} form.")
             return True
-        elif successes == 0 and ones > 0:
+        elif roll.botch:
             self.caller.msg(f"Botch! Your attempt to shift goes horribly wrong!")
             # Implement botch consequences here
             return False
@@ -201,23 +187,24 @@ class CmdShift(default_cmds.MuxCommand):
             # reset all attributes.
             self._reset_stats(character)
             return
-        
+
+        # The form's modifiers replace the previous form's as one overlay
+        modifiers = {}
         for stat, modifier in form.stat_modifiers.items():
-            stat_obj = Stat.objects.get(name__iexact=stat)  # Get the Stat object for the stat name
-            
-            if not stat:
-                self.caller.msg(f"Stat '{stat}' not found.")
-                continue
-
-            if stat_obj.category and stat_obj.stat_type:
-                current_value = self.caller.get_stat(stat_obj.category, stat_obj.stat_type, stat_obj.name, default=1)
-                new_value = int(current_value) + int(modifier)
-                character.set_stat(stat_obj.category, stat_obj.stat_type, stat_obj.name, new_value, temp=True)
-                text_val = f"|g{new_value}" if new_value >= 0 else f"|r{new_value}|n"
-                self.caller.msg("|YSHIFT>|n" + format_stat(stat_obj.name, current_value) +  f" -> {text_val}")
-              
+            stat_obj = next(iter(STAT_CATALOG.get_by_name(stat)), None)  # Get the Stat object for the stat name
+
+            if stat_obj and stat_obj.category and stat_obj.stat_type:
+                if int(modifier):
+                    modifiers[(stat_obj.category, stat_obj.stat_type, stat_obj.name)] = int(modifier)
             else:
                 self.caller.msg(f"Stat '{stat}' not found.")
+        character.overlays.set_layer(FORM_LAYER, modifiers)
+
+        for (category, stat_type, name), modifier in modifiers.items():
+            current_value = character.overlays.effective(category, stat_type, name) - modifier
+            new_value = current_value + modifier
+            text_val = f"|g{new_value}" if new_value >= 0 else f"|r{new_value}|n"
+            self.caller.msg("|YSHIFT>|n" + format_stat(name, current_value) +  f" -> {text_val}")
 
         # Set the current form
         character.db.current_form = form.name
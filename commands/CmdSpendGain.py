@@ -70,7 +70,8 @@ class CmdSpendGain(default_cmds.MuxCommand):
             action = "gained"
 
         # Update the pool value
-        caller.db.stats['pools']['dual'][pool.capitalize()]['temp'] = new_value
+        with caller.stats.batch(actor=caller, reason=f"{cmd} {reason.strip()}".strip()):
+            caller.db.stats['pools']['dual'][pool.capitalize()]['temp'] = new_value
 
         # Prepare the message
         msg = f"You have {action} {amount} point{'s' if amount > 1 else ''} of {pool}."
@@ -1,5 +1,6 @@
 from commands.communication import AdminCommand
 from evennia.utils import logger
+from world.wod20th.sheet_versions import record_version
 
 
 class CmdApprove(AdminCommand):
@@ -32,6 +33,9 @@ class CmdApprove(AdminCommand):
 
         target.tags.remove("unapproved", category="approval")
         target.tags.add("approved", category="approval")
+        if hasattr(target, 'stats'):
+            # The approved sheet is the base later versions are diffed against
+            record_version(target, actor=self.caller, reason="approval", approval=True)
         logger.log_info(f"{target.name} has been approved by {self.caller.name}")
 
         self.caller.msg(f"You have approved {target.name}.")
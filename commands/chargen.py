@@ -2,8 +2,9 @@
 
 from evennia import Command
 from evennia.utils.evmenu import EvMenu
-from world.wod20th.models import Stat, SHIFTER_IDENTITY_STATS, SHIFTER_RENOWN, SHIFTER_RENOWN, CLAN, MAGE_FACTION, MAGE_SPHERES, TRADITION, TRADITION_SUBFACTION, CONVENTION, METHODOLOGIES, NEPHANDI_FACTION, SEEMING, KITH, SEELIE_LEGACIES, UNSEELIE_LEGACIES, ARTS, REALMS, calculate_willpower, calculate_road
+from world.wod20th.models import Stat, SHIFTER_IDENTITY_STATS, SHIFTER_RENOWN, SHIFTER_RENOWN, CLAN, MAGE_FACTION, MAGE_SPHERES, TRADITION, TRADITION_SUBFACTION, CONVENTION, METHODOLOGIES, NEPHANDI_FACTION, SEEMING, KITH, SEELIE_LEGACIES, UNSEELIE_LEGACIES, ARTS, REALMS
 from typeclasses.characters import Character
+from world.wod20th.splat_templates import get_template
 
 class CmdCharGen(Command):
     """
@@ -51,91 +52,85 @@ def _apply_chargen_data(caller):
         caller.msg("Error: No character generation data found.")
         return
 
-    # Initialize stats if it doesn't exist
-    if not caller.db.stats:
-        caller.db.stats = {}
-
-    # Apply splat
-    splat = chargen_data.get('splat', '')
-    caller.db.stats['other'] = {'splat': {'Splat': {'perm': splat}}}
-
-    # Apply basic information
-    caller.db.concept = chargen_data.get('concept', '')
-    caller.db.nature = chargen_data.get('nature', '')
-    caller.db.demeanor = chargen_data.get('demeanor', '')
-    caller.db.clan = chargen_data.get('clan', '')
-
-    # Apply attributes
-    for category, attributes in chargen_data.get('attributes', {}).items():
-        for attr, value in attributes.items():
-            caller.set_stat(category, 'attribute', attr, value)
-
-    # Apply abilities
-    for category, abilities in chargen_data.get('abilities', {}).items():
-        for ability, value in abilities.items():
-            caller.set_stat(category, 'ability', ability, value)
-
-    # Apply disciplines or other splat-specific powers
-    splat = caller.db.stats.get('other', {}).get('splat', {}).get('Splat', {}).get('perm', '')
-    if splat.lower() == 'vampire':
-        for discipline, value in chargen_data.get('disciplines', {}).items():
-            caller.set_stat('powers', 'discipline', discipline, value)
-    elif splat.lower() == 'mage':
-        for sphere, value in chargen_data.get('spheres', {}).items():
-            caller.set_stat('powers', 'sphere', sphere, value)
-    elif splat.lower() == 'changeling':
-        for art, value in chargen_data.get('arts', {}).items():
-            caller.set_stat('powers', 'art', art, value)
-        for realm, value in chargen_data.get('realms', {}).items():
-            caller.set_stat('powers', 'realm', realm, value)
-    elif splat.lower() == 'shifter':
-        for gift, value in chargen_data.get('gifts', {}).items():
-            caller.set_stat('powers', 'gift', gift, value)
-
-    # Apply backgrounds
-    for background, value in chargen_data.get('backgrounds', {}).items():
-        caller.set_stat('backgrounds', 'background', background, value)
-
-    # Apply virtues
-    for virtue, value in chargen_data.get('virtues', {}).items():
-        caller.set_stat('virtues', 'moral', virtue, value)
-
-    # Apply splat-specific stats
-    if splat.lower() == 'vampire':
-        caller.set_stat('pools', 'dual', 'Blood', 10, temp=False)
-        caller.set_stat('pools', 'dual', 'Blood', 10, temp=True)
-    elif splat.lower() == 'shifter':
-        caller.set_stat('pools', 'dual', 'Gnosis', 1, temp=False)
-        caller.set_stat('pools', 'dual', 'Gnosis', 1, temp=True)
-        caller.set_stat('pools', 'dual', 'Rage', 1, temp=False)
-        caller.set_stat('pools', 'dual', 'Rage', 1, temp=True)
-    elif splat.lower() == 'mage':
-        caller.set_stat('pools', 'dual', 'Quintessence', 1, temp=False)
-        caller.set_stat('pools', 'dual', 'Quintessence', 1, temp=True)
-        caller.set_stat('pools', 'dual', 'Paradox', 0, temp=False)
-        caller.set_stat('pools', 'dual', 'Paradox', 0, temp=True)
-        caller.set_stat('other', 'advantage', 'Arete', 1, temp=False)
-    elif splat.lower() == 'changeling':
-        caller.set_stat('pools', 'dual', 'Glamour', 1, temp=False)
-        caller.set_stat('pools', 'dual', 'Glamour', 1, temp=True)
-        caller.set_stat('pools', 'dual', 'Banality', 5, temp=False)
-        caller.set_stat('pools', 'dual', 'Banality', 5, temp=True)
-
-    # Calculate and set Willpower
-    new_willpower = calculate_willpower(caller)
-    caller.set_stat('pools', 'dual', 'Willpower', new_willpower, temp=False)
-    caller.set_stat('pools', 'dual', 'Willpower', new_willpower, temp=True)
-
-    # Calculate and set Road (for Vampires)
-    if splat.lower() == 'vampire':
-        new_road = calculate_road(caller)
-        caller.set_stat('pools', 'moral', 'Road', new_road, temp=False)
+    # Every stat below is saved in one write when the block exits
+    with caller.stats.batch():
+        # Initialize stats if it doesn't exist
+        if not caller.db.stats:
+            caller.db.stats = {}
+
+        # Apply splat
+        splat = chargen_data.get('splat', '')
+        caller.db.stats['other'] = {'splat': {'Splat': {'perm': splat}}}
+
+        # Apply basic information
+        caller.db.concept = chargen_data.get('concept', '')
+        caller.db.nature = chargen_data.get('nature', '')
+        caller.db.demeanor = chargen_data.get('demeanor', '')
+        caller.db.clan = chargen_data.get('clan', '')
+
+        # Apply attributes
+        for category, attributes in chargen_data.get('attributes', {}).items():
+            for attr, value in attributes.items():
+                caller.set_stat(category, 'attribute', attr, value)
+
+        # Apply abilities
+        for category, abilities in chargen_data.get('abilities', {}).items():
+            for ability, value in abilities.items():
+                caller.set_stat(category, 'ability', ability, value)
+
+        # Apply disciplines or other splat-specific powers
+        splat = caller.db.stats.get('other', {}).get('splat', {}).get('Splat', {}).get('perm', '')
+        if splat.lower() == 'vampire':
+            for discipline, value in chargen_data.get('disciplines', {}).items():
+                caller.set_stat('powers', 'discipline', discipline, value)
+        elif splat.lower() == 'mage':
+            for sphere, value in chargen_data.get('spheres', {}).items():
+                caller.set_stat('powers', 'sphere', sphere, value)
+        elif splat.lower() == 'changeling':
+            for art, value in chargen_data.get('arts', {}).items():
+                caller.set_stat('powers', 'art', art, value)
+            for realm, value in chargen_data.get('realms', {}).items():
+                caller.set_stat('powers', 'realm', realm, value)
+        elif splat.lower() == 'shifter':
+            for gift, value in chargen_data.get('gifts', {}).items():
+                caller.set_stat('powers', 'gift', gift, value)
+
+        # Apply backgrounds
+        for background, value in chargen_data.get('backgrounds', {}).items():
+            caller.set_stat('backgrounds', 'background', background, value)
+
+        # Apply virtues
+        for virtue, value in chargen_data.get('virtues', {}).items():
+            caller.set_stat('virtues', 'moral', virtue, value)
+
+        # Apply splat-specific pools from the splat's template
+        template = get_template(splat, chargen_data.get('shifter_type'))
+        for pool in template.pools:
+            caller.set_stat(pool.category, pool.stat_type, pool.name, pool.perm, temp=False)
+            if pool.temp is not None:
+                caller.set_stat(pool.category, pool.stat_type, pool.name, pool.temp, temp=True)
+
+        # Calculate and set Willpower
+        new_willpower = caller.derived['willpower']
+        caller.set_stat('pools', 'dual', 'Willpower', new_willpower, temp=False)
+        caller.set_stat('pools', 'dual', 'Willpower', new_willpower, temp=True)
+
+        # Calculate and set Road (for Vampires)
+        if splat.lower() == 'vampire':
+            new_road = caller.derived['road']
+            caller.set_stat('pools', 'moral', 'Road', new_road, temp=False)
 
     # Clear chargen data
     caller.attributes.remove('chargen')
 
     caller.msg("Your character has been fully created and is ready to play!")
 
+def _template_stats(caller, category, stat_type):
+    """The stats of one type available to the splat chosen so far."""
+    chargen_data = caller.db.chargen or {}
+    template = get_template(chargen_data.get('splat'), chargen_data.get('shifter_type'))
+    return template.stats_of(category, stat_type)
+
 # Menu nodes
 
 def node_start(caller):
@@ -242,9 +237,9 @@ def _set_splat(caller, raw_string, **kwargs):
 
 def node_vampire_clan(caller):
     text = "Choose your vampire clan:"
-    clans = Stat.objects.filter(category="identity", stat_type="lineage", name="Clan")
+    clans = get_template("Vampire").choices("Clan")
     options = [{"key": str(i+1), "desc": clan, "goto": (_set_clan, {"clan": clan})} 
-               for i, clan in enumerate(clans[0].values)]
+               for i, clan in enumerate(clans)]
     options.append({"key": "0", "desc": "Return to main menu", "goto": "node_start"})
     return text, options
 
@@ -356,13 +351,13 @@ def _set_mage_faction(caller, raw_string, **kwargs):
 
 def node_mage_tradition(caller):
     text = "Choose your mage tradition:"
-    traditions = Stat.objects.filter(category="identity", stat_type="lineage", name="Tradition")
-    if not traditions.exists():
+    traditions = get_template("Mage").choices("Tradition")
+    if not traditions:
         caller.msg("No traditions found in the database. Please contact an admin.")
         return "node_start"
     
     options = []
-    for i, tradition in enumerate(traditions.first().values):
+    for i, tradition in enumerate(traditions):
         options.append({
             "key": str(i+1),
             "desc": tradition,
@@ -384,13 +379,13 @@ def node_mage_subfaction(caller):
         return "node_start"
     
     text = f"Choose your subfaction within the {tradition}:"
-    subfactions = Stat.objects.filter(category="identity", stat_type="lineage", name="Tradition Subfaction")
-    if not subfactions.exists():
+    subfactions = get_template("Mage").choices("Tradition Subfaction")
+    if not subfactions:
         caller.msg("No subfactions found in the database. Please contact an admin.")
         return "node_start"
     
     options = []
-    for i, subfaction in enumerate(subfactions.first().values):
+    for i, subfaction in enumerate(subfactions):
         if subfaction.startswith(tradition):
             options.append({
                 "key": str(len(options) + 1),
@@ -408,13 +403,13 @@ def _set_subfaction(caller, raw_string, **kwargs):
 
 def node_mage_convention(caller):
     text = "Choose your Technocratic Convention:"
-    conventions = Stat.objects.filter(category="identity", stat_type="lineage", name="Convention")
-    if not conventions.exists():
+    conventions = get_template("Mage").choices("Convention")
+    if not conventions:
         caller.msg("No conventions found in the database. Please contact an admin.")
         return "node_start"
     
     options = []
-    for i, convention in enumerate(conventions.first().values):
+    for i, convention in enumerate(conventions):
         options.append({
             "key": str(i+1),
             "desc": convention,
@@ -436,13 +431,13 @@ def node_mage_methodology(caller):
         return "node_start"
     
     text = f"Choose your methodology within {convention}:"
-    methodologies = Stat.objects.filter(category="identity", stat_type="lineage", name="Methodology")
-    if not methodologies.exists():
+    methodologies = get_template("Mage").choices("Methodology")
+    if not methodologies:
         caller.msg("No methodologies found in the database. Please contact an admin.")
         return "node_start"
     
     options = []
-    for i, methodology in enumerate(methodologies.first().values):
+    for i, methodology in enumerate(methodologies):
         if methodology.startswith(convention):
             options.append({
                 "key": str(len(options) + 1),
@@ -460,13 +455,13 @@ def _set_methodology(caller, raw_string, **kwargs):
 
 def node_nephandi_faction(caller):
     text = "Choose your Nephandi faction:"
-    factions = Stat.objects.filter(category="identity", stat_type="lineage", name="Nephandi Faction")
-    if not factions.exists():
+    factions = get_template("Mage").choices("Nephandi Faction")
+    if not factions:
         caller.msg("No Nephandi factions found in the database. Please contact an admin.")
         return "node_start"
     
     options = []
-    for i, faction in enumerate(factions.first().values):
+    for i, faction in enumerate(factions):
         options.append({
             "key": str(i+1),
             "desc": faction,
@@ -483,9 +478,9 @@ def _set_nephandi_faction(caller, raw_string, **kwargs):
 
 def node_changeling_kith(caller):
     text = "Choose your changeling kith:"
-    kiths = Stat.objects.filter(category="identity", stat_type="lineage", name="Kith")
+    kiths = get_template("Changeling").choices("Kith")
     options = [{"key": str(i+1), "desc": kith, "goto": (_set_kith, {"kith": kith})} 
-               for i, kith in enumerate(kiths[0].values)]
+               for i, kith in enumerate(kiths)]
     options.append({"key": "0", "desc": "Return to main menu", "goto": "node_start"})
     return text, options
 
@@ -497,9 +492,9 @@ def _set_kith(caller, raw_string, **kwargs):
 
 def node_changeling_seeming(caller):
     text = "Choose your changeling seeming:"
-    seemings = Stat.objects.filter(category="identity", stat_type="lineage", name="Seeming")
+    seemings = get_template("Changeling").choices("Seeming")
     options = [{"key": str(i+1), "desc": seeming, "goto": (_set_seeming, {"seeming": seeming})} 
-               for i, seeming in enumerate(seemings[0].values)]
+               for i, seeming in enumerate(seemings)]
     options.append({"key": "0", "desc": "Return to main menu", "goto": "node_start"})
     return text, options
 
@@ -511,9 +506,9 @@ def _set_seeming(caller, raw_string, **kwargs):
 
 def node_changeling_house(caller):
     text = "Choose your changeling house (optional):"
-    houses = Stat.objects.filter(category="identity", stat_type="lineage", name="House")
+    houses = get_template("Changeling").choices("House")
     options = [{"key": str(i+1), "desc": house, "goto": (_set_house, {"house": house})} 
-               for i, house in enumerate(houses[0].values)]
+               for i, house in enumerate(houses)]
     options.append({"key": "0", "desc": "No house / Return to main menu", "goto": "node_start"})
     return text, options
 
@@ -850,7 +845,7 @@ def node_talents(caller):
         caller.db.chargen["abilities"] = {"talents": {}, "skills": {}, "knowledges": {}}
     
     text = "Assign points to Talents:"
-    talents = Stat.objects.filter(category="abilities", stat_type="talent")
+    talents = _template_stats(caller, 'abilities', 'talent')
     options = [{"key": str(i+1), "desc": talent.name, "goto": (_set_ability, {"category": "talents", "ability": talent.name})} 
                for i, talent in enumerate(talents)]
     options.append({"key": "0", "desc": "Return to abilities menu", "goto": "node_abilities"})
@@ -890,7 +885,7 @@ def node_skills(caller):
         caller.db.chargen["abilities"] = {"talents": {}, "skills": {}, "knowledges": {}}
     
     text = "Assign points to Skills:"
-    skills = Stat.objects.filter(category="abilities", stat_type="skill")
+    skills = _template_stats(caller, 'abilities', 'skill')
     options = [{"key": str(i+1), "desc": skill.name, "goto": (_set_ability, {"category": "skills", "ability": skill.name})} 
                for i, skill in enumerate(skills)]
     options.append({"key": "0", "desc": "Return to abilities menu", "goto": "node_abilities"})
@@ -901,7 +896,7 @@ def node_knowledges(caller):
         caller.db.chargen["abilities"] = {"talents": {}, "skills": {}, "knowledges": {}}
     
     text = "Assign points to Knowledges:"
-    knowledges = Stat.objects.filter(category="abilities", stat_type="knowledge")
+    knowledges = _template_stats(caller, 'abilities', 'knowledge')
     options = [{"key": str(i+1), "desc": knowledge.name, "goto": (_set_ability, {"category": "knowledges", "ability": knowledge.name})} 
                for i, knowledge in enumerate(knowledges)]
     options.append({"key": "0", "desc": "Return to abilities menu", "goto": "node_abilities"})
@@ -930,7 +925,7 @@ def node_disciplines(caller):
         caller.db.chargen["disciplines"] = {}
     
     text = "Assign points to Disciplines:"
-    disciplines = Stat.objects.filter(category="powers", stat_type="discipline")
+    disciplines = _template_stats(caller, 'powers', 'discipline')
     options = [{"key": str(i+1), "desc": discipline.name, "goto": (_set_power, {"category": "disciplines", "power": discipline.name})} 
                for i, discipline in enumerate(disciplines)]
     options.append({"key": "0", "desc": "Return to main menu", "goto": "node_start"})
@@ -972,7 +967,7 @@ def node_gifts(caller):
         caller.db.chargen["gifts"] = {}
     
     text = "Choose Gifts for your character:"
-    gifts = Stat.objects.filter(category="powers", stat_type="gift")
+    gifts = _template_stats(caller, 'powers', 'gift')
     options = [{"key": str(i+1), "desc": gift.name, "goto": (_set_power, {"category": "gifts", "power": gift.name})} 
                for i, gift in enumerate(gifts)]
     options.append({"key": "0", "desc": "Return to main menu", "goto": "node_start"})
@@ -983,7 +978,7 @@ def node_spheres(caller):
         caller.db.chargen["spheres"] = {}
     
     text = "Assign points to Spheres:"
-    spheres = Stat.objects.filter(category="powers", stat_type="sphere")
+    spheres = _template_stats(caller, 'powers', 'sphere')
     options = [{"key": str(i+1), "desc": sphere.name, "goto": (_set_power, {"category": "spheres", "power": sphere.name})} 
                for i, sphere in enumerate(spheres)]
     options.append({"key": "0", "desc": "Return to main menu", "goto": "node_start"})
@@ -994,7 +989,7 @@ def node_arts(caller):
         caller.db.chargen["arts"] = {}
     
     text = "Assign points to Arts:"
-    arts = Stat.objects.filter(category="powers", stat_type="art")
+    arts = _template_stats(caller, 'powers', 'art')
     options = [{"key": str(i+1), "desc": art.name, "goto": (_set_power, {"category": "arts", "power": art.name})} 
                for i, art in enumerate(arts)]
     options.append({"key": "0", "desc": "Return to main menu", "goto": "node_start"})
@@ -1005,7 +1000,7 @@ def node_backgrounds(caller):
         caller.db.chargen["backgrounds"] = {}
     
     text = "Assign points to Backgrounds:"
-    backgrounds = Stat.objects.filter(category="backgrounds", stat_type="background")
+    backgrounds = _template_stats(caller, 'backgrounds', 'background')
     options = [{"key": str(i+1), "desc": background.name, "goto": (_set_background, {"background": background.name})} 
                for i, background in enumerate(backgrounds)]
     options.append({"key": "0", "desc": "Return to main menu", "goto": "node_start"})
@@ -1037,7 +1032,7 @@ def node_virtues(caller):
         caller.db.chargen["virtues"] = {}
     
     text = "Assign points to Virtues:"
-    virtues = Stat.objects.filter(category="virtues", stat_type="moral")
+    virtues = _template_stats(caller, 'virtues', 'moral')
     options = [{"key": str(i+1), "desc": virtue.name, "goto": (_set_virtue, {"virtue": virtue.name})} 
                for i, virtue in enumerate(virtues)]
     options.append({"key": "0", "desc": "Return to main menu", "goto": "node_start"})
@@ -20,6 +20,8 @@ from commands.CmdShortDesc import CmdShortDesc
 from commands.CmdPose import CmdPose
 from commands.CmdSetStats import CmdStats, CmdSpecialty
 from commands.CmdSheet import CmdSheet
+from commands.CmdPowers import CmdPowers
+from commands.CmdCensus import CmdCensus
 from commands.CmdHurt import CmdHurt
 from commands.CmdHeal import CmdHeal
 from commands.CmdLanguage import CmdLanguage
@@ -79,6 +81,8 @@ class CharacterCmdSet(default_cmds.CharacterCmdSet):
 
         self.add(CmdSpecialty())
         self.add(CmdSheet())
+        self.add(CmdPowers())
+        self.add(CmdCensus())
         self.add(CmdHurt())
         self.add(CmdHeal())
         self.add(CmdEvents())
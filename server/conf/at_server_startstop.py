@@ -30,7 +30,28 @@ def at_server_start():
     This is called every time the server starts up, regardless of
     how it was shut down.
     """
-    pass
+    from world.wod20th.catalog import STAT_CATALOG
+    from world.wod20th.ledger import init_ledger_script
+    from world.wod20th.roll_log import init_roll_log_script
+    from world.wod20th.splat_templates import get_template
+    from world.wod20th.timers import init_modifier_scheduler
+    from world.wod20th.upkeep import init_upkeep_script
+    from world.wod20th.utils.dice_odds import precompute_odds
+
+    # Warm the stat catalog so the first commands don't pay for the load
+    STAT_CATALOG.reload()
+    # Compile the splat templates from the freshly loaded catalog
+    get_template('Mortal')
+    # Writes buffered stat ledger entries
+    init_ledger_script()
+    # Expires +pump boosts and timed forms, including any due during downtime
+    init_modifier_scheduler()
+    # Nightly pool regeneration
+    init_upkeep_script()
+    # Writes buffered rolls and prunes old ones
+    init_roll_log_script()
+    # The +roll/odds table for every pool up to 30 dice
+    precompute_odds()
 
 
 def at_server_stop():
@@ -38,7 +59,12 @@ def at_server_stop():
     This is called just before the server is shut down, regardless
     of it is for a reload, reset or shutdown.
     """
-    pass
+    from world.wod20th.ledger import LEDGER
+    from world.wod20th.roll_log import ROLL_LOG
+
+    # Don't lose stat changes still waiting in the ledger buffer
+    LEDGER.flush()
+    ROLL_LOG.flush()
 
 
 def at_server_reload_start():
@@ -64,6 +64,10 @@ LOCK_FUNC_MODULES = [
     "evennia.locks.lockfuncs",
     "world.wod20th.locks", 
 ]
+# Where character stats are stored: "attribute" keeps the single db.stats
+# Attribute, "table" stores one CharacterStat row per stat (see
+# world/wod20th/stat_store.py). Characters are copied over on first load.
+WOD20TH_STAT_BACKEND = "attribute"
   # Change 8001 to your desired websocket port
 ######################################################################
 # Settings given in secret_settings.py override those in this file.
@@ -1,9 +1,12 @@
 from evennia import DefaultCharacter
 print("DefaultCharacter:", DefaultCharacter)
 from evennia.utils.ansi import ANSIString
-from world.wod20th.models import Stat
+from world.wod20th.catalog import STAT_CATALOG
 from evennia.utils import lazy_property
 from world.wod20th.models import Note
+from world.wod20th.stat_store import STAT_CHANGE, StatDbHolder, StatHandler
+from world.wod20th.derived import DerivedStats
+from world.wod20th.overlays import StatOverlays
 from world.wod20th.utils.ansi_utils import wrap_ansi
 import re
 import random
@@ -14,6 +17,9 @@ print("DefaultCharacter:", DefaultCharacter)
 # If DefaultCharacter is None, use object as a fallback
 BaseCharacter = DefaultCharacter if DefaultCharacter is not None else object
 
+# Where the splat lives in the stats
+SPLAT_KEY = ('other', 'splat', 'Splat')
+
 class Character(BaseCharacter):
     """
     The Character typeclass.
@@ -374,28 +380,64 @@ class Character(BaseCharacter):
         # Send the emote to the emitter
         self.msg(msg_self or message)
 
+    @lazy_property
+    def stats(self):
+        handler = StatHandler(self)
+        handler.subscribe(self._clear_splat)
+        return handler
+
+    def _clear_splat(self, kind, key):
+        # Any change covering ('other', 'splat', 'Splat'), () included
+        if kind == STAT_CHANGE and tuple(key) == SPLAT_KEY[:len(key)]:
+            self.ndb.splat = None
+
+    @lazy_property
+    def derived(self):
+        return DerivedStats(self)
+
+    @lazy_property
+    def overlays(self):
+        return StatOverlays(self)
+
+    @property
+    def db(self):
+        """
+        Attribute access as usual, except that db.stats goes through the
+        stat handler so every stat change is tracked.
+        """
+        try:
+            return self._stat_db_holder
+        except AttributeError:
+            self._stat_db_holder = StatDbHolder(self, self.stats)
+            return self._stat_db_holder
+
+    @db.setter
+    def db(self, value):
+        raise Exception("Cannot assign directly to db object! Use db.attr=value instead.")
+
+    @db.deleter
+    def db(self):
+        raise Exception("Cannot delete the db object!")
+
     def get_stat(self, category, stat_type, stat_name, temp=False):
         """
         Retrieve the value of a stat, considering instances if applicable.
         """
-        if not hasattr(self.db, "stats") or not self.db.stats:
-            self.db.stats = {}
-
-        category_stats = self.db.stats.get(category, {})
-        type_stats = category_stats.get(stat_type, {})
+        stats = self.stats.all()
+        type_stats = stats.get(category, {}).get(stat_type, {})
 
         # Check for the stat in the current category and type
         if stat_name in type_stats:
             return type_stats[stat_name]['temp' if temp else 'perm']
 
         # If not found and the category is 'pools', check in 'dual' as well
-        if category == 'pools' and 'dual' in self.db.stats:
-            dual_stats = self.db.stats['dual']
+        if category == 'pools' and 'dual' in stats:
+            dual_stats = stats['dual']
             if stat_name in dual_stats:
                 return dual_stats[stat_name]['temp' if temp else 'perm']
 
-        # If still not found, check the Stat model
-        stat = Stat.objects.filter(name=stat_name, category=category, stat_type=stat_type).first()
+        # If still not found, fall back to the catalog default
+        stat = STAT_CATALOG.get(category, stat_type, stat_name)
         if stat:
             return stat.default
 
@@ -405,25 +447,24 @@ class Character(BaseCharacter):
         """
         Set the value of a stat, considering instances if applicable.
         """
-        if not hasattr(self.db, "stats") or not self.db.stats:
-            self.db.stats = {}
-        if category not in self.db.stats:
-            self.db.stats[category] = {}
-        if stat_type not in self.db.stats[category]:
-            self.db.stats[category][stat_type] = {}
-        if stat_name not in self.db.stats[category][stat_type]:
-            self.db.stats[category][stat_type][stat_name] = {'perm': 0, 'temp': 0}
-        if temp:
-            self.db.stats[category][stat_type][stat_name]['temp'] = value
-        else:
-            self.db.stats[category][stat_type][stat_name]['perm'] = value
+        self.stats.set(category, stat_type, stat_name, value, temp=temp)
+
+    def get_splat(self):
+        """
+        Return the character's splat. It is read from the stats once and
+        cached on ndb until a stat change covering the Splat clears it.
+        """
+        splat = self.ndb.splat
+        if splat is None:
+            splat = self.get_stat('other', 'splat', 'Splat') or ''
+            self.ndb.splat = splat
+        return splat
             
     def check_stat_value(self, category, stat_type, stat_name, value, temp=False):
         """
         Check if a value is valid for a stat, considering instances if applicable.
         """
-        from world.wod20th.models import Stat  
-        stat = Stat.objects.filter(name=stat_name, category=category, stat_type=stat_type).first()
+        stat = STAT_CATALOG.get(category, stat_type, stat_name)
         if stat:
             stat_values = stat.values
             return value in stat_values['temp'] if temp else value in stat_values['perm']
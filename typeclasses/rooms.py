@@ -4,8 +4,8 @@ from evennia.utils.ansi import ANSIString
 from evennia.utils.search import search_channel
 from world.wod20th.utils.ansi_utils import wrap_ansi
 from world.wod20th.utils.formatting import header, footer, divider
-from datetime import datetime
-import random
+from world.wod20th.roll_log import ROLL_LOG
+from world.wod20th.utils.dice_rolls import DICE
 
 class RoomParent(DefaultRoom):
 
@@ -208,9 +208,9 @@ class RoomParent(DefaultRoom):
         Allows a character to peek into the Umbra.
         """
         difficulty = self.get_gauntlet_difficulty() + 2
-        success = self.roll_gnosis(character, difficulty)
+        successes, _ = self.roll_gnosis(character, difficulty)
         
-        if success:
+        if successes > 0:
             if self.db.umbra_desc:
                 # Format the Umbra description
                 umbra_header = header("Umbra Vision", width=78, fillchar=ANSIString("|r-|n"))
@@ -333,28 +333,16 @@ class RoomParent(DefaultRoom):
             character.msg("Error: Gnosis attribute not found. Please contact an admin.")
             return 0, 0
         
+        # Pools are stored as ints (see world.wod20th.stat_schema)
         gnosis = stats['pools']['dual']['Gnosis']['perm']
         if gnosis is None:
             character.msg("Error: Permanent Gnosis value is None. Please contact an admin.")
             return 0, 0
-        
-        # Convert gnosis to an integer if it's stored as a string
-        if isinstance(gnosis, str):
-            try:
-                gnosis = int(gnosis)
-            except ValueError:
-                character.msg("Error: Invalid Gnosis value. Please contact an admin.")
-                return 0, 0
-        
-        successes = 0
-        ones = 0
-        for _ in range(gnosis):
-            roll = random.randint(1, 10)
-            if roll >= difficulty:
-                successes += 1
-            elif roll == 1:
-                ones += 1
-        
+
+        # Ones don't cancel successes on Gnosis rolls
+        roll = DICE.roll(gnosis, difficulty, botch_rule='no_cancel')
+        successes, ones = roll.successes, roll.ones
+
         character.msg(f"Gnosis Roll: {successes} successes against difficulty {difficulty}")
         return successes, ones
     
@@ -372,13 +360,8 @@ class RoomParent(DefaultRoom):
             self.db.resources = {}  # Empty dict for resources
             self.db.owners = []
             self.db.sub_locations = []
-            self.db.roll_log = []  # Initialize an empty list for roll logs
             self.db.initialized = True  # Mark this room as initialized
             self.save()  # Save immediately to avoid ID-related issues
-        else:
-            # Ensure roll_log exists even for previously initialized rooms
-            if not hasattr(self.db, 'roll_log'):
-                self.db.roll_log = []
 
     def at_object_creation(self):
         """
@@ -530,39 +513,20 @@ class RoomParent(DefaultRoom):
         for sub_loc in self.get_sub_locations():
             sub_loc.display_hierarchy(depth + 1)
 
-    def log_roll(self, roller, roll_description, result):
+    def log_roll(self, roller, roll_description, result, seed=None):
         """
-        Log a roll made in this room.
+        Log a roll made in this room. `roller` is the character who rolled,
+        or their name; `seed` is the dice engine's seed for the roll, so
+        staff can replay it. The roll goes to the RollLog table in the next
+        batched write; the room itself isn't touched.
         """
-        self.initialize()  # Ensure initialization
-        
-        # Ensure roll_log exists
-        if not hasattr(self.db, 'roll_log'):
-            self.db.roll_log = []
-        
-        # Use the game time if available, otherwise use the current system time
-        if hasattr(self.db, 'gametime') and self.db.gametime is not None and hasattr(self.db.gametime, 'time'):
-            timestamp = self.db.gametime.time()
-        else:
-            timestamp = datetime.now()
-
-        log_entry = {
-            "roller": roller,
-            "description": roll_description,
-            "result": result,
-            "timestamp": timestamp
-        }
-        self.db.roll_log.append(log_entry)
-        if len(self.db.roll_log) > 10:
-            self.db.roll_log.pop(0)  # Remove the oldest entry if we have more than 10
-        self.save()
+        ROLL_LOG.record(self, roller, roll_description, result, seed=seed)
 
     def get_roll_log(self):
         """
-        Return the roll log for this room.
+        Return the rolls made in this room, newest first, as RollLog rows.
         """
-        self.initialize()
-        return self.db.roll_log
+        return ROLL_LOG.for_room(self)
 
     def get_fae_description(self):
         """Get the fae description of the room."""
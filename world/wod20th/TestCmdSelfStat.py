@@ -26,7 +26,7 @@ class TestCmdSelfStat(EvenniaTest):
         expected = "|rUsage: +selfstat <stat>[(<instance>)]/[<category>]=[+-]<value>|n"
         self.assertEqual(self.character.msg.call_args[0][0], expected)
 
-    @patch('commands.CmdSelfStat.Stat.objects.filter')
+    @patch('commands.CmdSelfStat.find_stats')
     def test_func_stat_not_found(self, mock_filter):
         mock_filter.return_value = []
         self.cmd.args = "NonexistentStat/Physical=+1"
@@ -34,7 +34,7 @@ class TestCmdSelfStat(EvenniaTest):
         expected = "|rNo stats matching 'NonexistentStat' found in the database.|n"
         self.assertEqual(self.character.msg.call_args[0][0], expected)
 
-    @patch('commands.CmdSelfStat.Stat.objects.filter')
+    @patch('commands.CmdSelfStat.find_stats')
     def test_func_update_stat(self, mock_filter):
         mock_stat = MagicMock()
         mock_stat.name = "Strength"
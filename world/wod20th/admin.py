@@ -44,7 +44,7 @@ class ShapeshifterFormAdmin(admin.ModelAdmin):
             'fields': ('name', 'shifter_type', 'description', 'form_message')
         }),
         ('Stats', {
-            'fields': ('rage_cost', 'difficulty', 'stat_modifiers')
+            'fields': ('rage_cost', 'difficulty', 'duration', 'stat_modifiers')
         }),
         ('Advanced', {
             'fields': ('lock_string',),
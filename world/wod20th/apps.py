@@ -7,5 +7,9 @@ class Wod20thConfig(AppConfig):
 from django.apps import AppConfig
 
 class Wod20thConfig(AppConfig):
+    default = True
     name = 'world.wod20th'
     verbose_name = 'World of Darkness 20th Anniversary Edition'
+
+    def ready(self):
+        import world.wod20th.signals
@@ -0,0 +1,218 @@
+# world/wod20th/catalog.py
+"""
+In-memory catalog of every Stat definition.
+
+The Stat table is small and changes rarely, but it is consulted constantly
+(every get_stat miss, every sheet render, every stat command). The catalog
+loads all rows once per process and serves lookups from dicts. It is kept
+current by the post_save/post_delete signals in world.wod20th.signals and
+is reloaded wholesale by the load_wod20th_stats command.
+"""
+from collections import defaultdict
+from threading import RLock
+
+from evennia.utils import logger
+
+
+class StatCatalog:
+    """
+    Process-wide cache of Stat rows, indexed for the lookups the game uses.
+
+    Lookups:
+        get(category, stat_type, name) - exact natural key lookup
+        get_by_name(name)              - case-insensitive name lookup
+        by_splat(splat)                - all stats restricted to a splat
+        by_game_line(game_line)        - all stats of a game line
+        filter(...)                    - any combination of the above fields
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._loaded = False
+        self.version = 0
+        self._listeners = []
+        self._clear()
+
+    def _clear(self):
+        self._by_pk = {}
+        self._indexed_as = {}
+        self._by_key = {}
+        self._by_name = defaultdict(list)
+        self._by_type = defaultdict(list)
+        self._by_splat = defaultdict(list)
+        self._by_game_line = defaultdict(list)
+
+    # Loading and invalidation
+
+    def reload(self):
+        """
+        Load (or reload) every Stat row from the database.
+        """
+        from world.wod20th.models import Stat
+
+        with self._lock:
+            self._clear()
+            for stat in Stat.objects.all().order_by('pk'):
+                self._add(stat)
+            self._loaded = True
+            self.version += 1
+        logger.log_info(f"StatCatalog: loaded {len(self._by_pk)} stats.")
+        self._notify('reload', None)
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.reload()
+
+    def refresh(self, stat):
+        """
+        Replace the cached entry for a single saved Stat.
+        """
+        if not self._loaded:
+            # Nothing cached yet, the first lookup will load the new row.
+            return
+        with self._lock:
+            self._remove(stat.pk)
+            self._add(stat)
+            self.version += 1
+        self._notify('refresh', stat)
+
+    def discard(self, stat):
+        """
+        Drop a deleted Stat from the cache.
+        """
+        if not self._loaded:
+            return
+        with self._lock:
+            self._remove(stat.pk)
+            self.version += 1
+        self._notify('discard', stat)
+
+    def subscribe(self, callback):
+        """
+        Register callback(event, stat), called after every change. The event
+        is 'refresh' or 'discard' for a single stat, or 'reload' (stat None)
+        when everything was reloaded.
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def _notify(self, event, stat):
+        for callback in list(self._listeners):
+            try:
+                callback(event, stat)
+            except Exception:
+                logger.log_trace(f"StatCatalog: listener {callback} failed on {event}.")
+
+    def _add(self, stat):
+        self._by_pk[stat.pk] = stat
+        # Remember the indexed fields, the instance may be mutated in place later.
+        self._indexed_as[stat.pk] = (stat.category, stat.stat_type, stat.name, stat.splat, stat.game_line)
+        key = (stat.category, stat.stat_type, stat.name)
+        current = self._by_key.get(key)
+        # Mirror .first(): the lowest primary key wins for duplicated keys.
+        if current is None or (stat.pk or 0) < (current.pk or 0):
+            self._by_key[key] = stat
+        self._by_name[stat.name.lower()].append(stat)
+        self._by_type[(stat.category, stat.stat_type)].append(stat)
+        if stat.splat:
+            self._by_splat[stat.splat.lower()].append(stat)
+        if stat.game_line:
+            self._by_game_line[stat.game_line.lower()].append(stat)
+
+    def _remove(self, pk):
+        old = self._by_pk.pop(pk, None)
+        if old is None:
+            return
+        category, stat_type, name, splat, game_line = self._indexed_as.pop(pk)
+        key = (category, stat_type, name)
+        self._discard_from(self._by_name, name.lower(), old)
+        self._discard_from(self._by_type, (category, stat_type), old)
+        if splat:
+            self._discard_from(self._by_splat, splat.lower(), old)
+        if game_line:
+            self._discard_from(self._by_game_line, game_line.lower(), old)
+        if self._by_key.get(key) is old:
+            del self._by_key[key]
+            # Promote a remaining duplicate, if any, to keep the key resolvable.
+            for other in self._by_type.get((category, stat_type), ()):
+                if self._indexed_as[other.pk][2] == name:
+                    if key not in self._by_key or other.pk < self._by_key[key].pk:
+                        self._by_key[key] = other
+
+    @staticmethod
+    def _discard_from(index, key, stat):
+        entries = index.get(key)
+        if not entries:
+            return
+        entries[:] = [entry for entry in entries if entry is not stat]
+        if not entries:
+            del index[key]
+
+    # Lookups
+
+    def get(self, category, stat_type, name):
+        """
+        Return the Stat with the given natural key, or None.
+        """
+        self.ensure_loaded()
+        return self._by_key.get((category, stat_type, name))
+
+    def get_by_name(self, name):
+        """
+        Return all stats whose name matches case-insensitively.
+        """
+        self.ensure_loaded()
+        return list(self._by_name.get(name.strip().lower(), ()))
+
+    def by_type(self, category, stat_type):
+        self.ensure_loaded()
+        return list(self._by_type.get((category, stat_type), ()))
+
+    def by_splat(self, splat):
+        self.ensure_loaded()
+        return list(self._by_splat.get((splat or '').lower(), ()))
+
+    def by_game_line(self, game_line):
+        self.ensure_loaded()
+        return list(self._by_game_line.get((game_line or '').lower(), ()))
+
+    def filter(self, name=None, category=None, stat_type=None, splat=None, game_line=None):
+        """
+        Return all stats matching every given field. Name, splat and
+        game_line match case-insensitively.
+        """
+        self.ensure_loaded()
+        if name is not None:
+            candidates = self._by_name.get(name.strip().lower(), ())
+        elif category is not None and stat_type is not None:
+            candidates = self._by_type.get((category, stat_type), ())
+        elif splat is not None:
+            candidates = self._by_splat.get(splat.lower(), ())
+        elif game_line is not None:
+            candidates = self._by_game_line.get(game_line.lower(), ())
+        else:
+            candidates = self._by_pk.values()
+
+        results = []
+        for stat in candidates:
+            if category is not None and stat.category != category:
+                continue
+            if stat_type is not None and stat.stat_type != stat_type:
+                continue
+            if splat is not None and (stat.splat or '').lower() != splat.lower():
+                continue
+            if game_line is not None and (stat.game_line or '').lower() != game_line.lower():
+                continue
+            results.append(stat)
+        return results
+
+    def all(self):
+        self.ensure_loaded()
+        return list(self._by_pk.values())
+
+    def __len__(self):
+        self.ensure_loaded()
+        return len(self._by_pk)
+
+
+STAT_CATALOG = StatCatalog()
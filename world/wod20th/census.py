@@ -0,0 +1,310 @@
+# world/wod20th/census.py
+"""
+Population analytics over every character sheet, for +census.
+
+CENSUS reads all sheets once, straight from the database a chunk at a
+time, into columns: a NumPy matrix of characters by numeric stats (perm
+values, NaN where a character doesn't have the stat) and a coded column
+for each identity stat such as Splat, Clan or Tribe. Questions are then
+answered with vectorized masks and bincounts:
+
+    CENSUS.summary('Dexterity', by='tribe', where=[('splat', '=', 'Shifter')])
+    CENSUS.counts(by='clan', where=[('thaumaturgy', '>=', 3)])
+
+The columns are rebuilt when stats have been saved since they were read
+(see stat_generation) and they are older than CENSUS_TTL seconds.
+
+NumPy is optional for the game; without it +census reports that it is
+unavailable.
+"""
+import operator
+import time
+
+from django.conf import settings
+from evennia.typeclasses.attributes import Attribute
+from evennia.typeclasses.tags import Tag
+
+from world.wod20th.models import CharacterStat
+from world.wod20th.stat_store import TABLE_BACKEND, stat_generation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Seconds a census may be reused after stats have changed
+CENSUS_TTL = 60
+# Characters read per query while building
+CHUNK_SIZE = 1000
+
+OPERATORS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '<': operator.lt,
+    '=': operator.eq,
+}
+
+
+class CensusError(Exception):
+    """
+    Raised for a census question that can't be answered, with a message
+    for the player.
+    """
+
+
+class Census:
+    """
+    The columnar copy of every sheet. Use the module's CENSUS instance.
+    """
+
+    def __init__(self):
+        self.built_at = None
+        self.generation = None
+        self.ids = None
+        self.names = []
+        self.values = None
+        # (category, stat_type, name) -> column of self.values
+        self.columns = {}
+        # lowercased stat name -> column, for lookups by name
+        self._by_name = {}
+        # lowercased identity stat name -> (codes array, labels); -1 means unset
+        self.groups = {}
+        self.approved = None
+
+    @property
+    def available(self):
+        return np is not None
+
+    def __len__(self):
+        return len(self.names)
+
+    # Building
+
+    def ensure_current(self, refresh=False):
+        """
+        Build the census if it is missing or stale. Returns True if it was
+        rebuilt.
+        """
+        if not self.available:
+            raise CensusError("+census needs NumPy, which isn't installed on this server.")
+        stale = (
+            self.built_at is None
+            or (self.generation != stat_generation() and time.time() - self.built_at > CENSUS_TTL)
+        )
+        if stale or refresh:
+            self.build()
+            return True
+        return False
+
+    def build(self):
+        """
+        Read every character's stats into columns.
+        """
+        from typeclasses.characters import Character
+
+        generation = stat_generation()
+        characters = list(Character.objects.all_family().order_by('id').values_list('id', 'db_key'))
+        rows = {character_id: row for row, (character_id, _) in enumerate(characters)}
+
+        columns = {}
+        labels = {}
+        numeric_cells = ([], [], [])
+        group_cells = {}
+        approved = []
+
+        def add(row, category, stat_type, name, value):
+            if type(value) is int:
+                column = columns.setdefault((category, stat_type, name), len(columns))
+                numeric_cells[0].append(row)
+                numeric_cells[1].append(column)
+                numeric_cells[2].append(value)
+            elif category == 'identity' or name == 'Splat':
+                if isinstance(value, str) and value:
+                    field = name.lower()
+                    codes = labels.setdefault(field, {})
+                    code = codes.setdefault(value, len(codes))
+                    group_cells.setdefault(field, []).append((row, code))
+
+        ids = [character_id for character_id, _ in characters]
+        for start in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[start:start + CHUNK_SIZE]
+            for row in self._read_chunk(chunk):
+                kind, character_id = row[0], row[1]
+                if kind == 'approved':
+                    if row[2]:
+                        approved.append(rows[character_id])
+                else:
+                    add(rows[character_id], *row[2:])
+
+        count = len(characters)
+        values = np.full((count, len(columns)), np.nan, dtype=np.float32)
+        if numeric_cells[0]:
+            values[numeric_cells[0], numeric_cells[1]] = numeric_cells[2]
+        groups = {}
+        for field, cells in group_cells.items():
+            codes = np.full(count, -1, dtype=np.int32)
+            cell_rows, cell_codes = zip(*cells)
+            codes[list(cell_rows)] = cell_codes
+            groups[field] = (codes, list(labels[field]))
+        approved_column = np.zeros(count, dtype=bool)
+        approved_column[approved] = True
+
+        by_name = {}
+        for key, column in columns.items():
+            by_name.setdefault(key[2].lower(), column)
+
+        self.ids = np.array(ids, dtype=np.int64)
+        self.names = [name for _, name in characters]
+        self.values = values
+        self.columns = columns
+        self._by_name = by_name
+        self.groups = groups
+        self.approved = approved_column
+        self.generation = generation
+        self.built_at = time.time()
+
+    def _read_chunk(self, ids):
+        """
+        Yield ('stat', character id, category, stat_type, name, perm) and
+        ('approved', character id, value) for a chunk of characters, read
+        without loading the characters themselves. A character is approved
+        by the approval tag +approve sets, or by the older approved Attribute.
+        """
+        tagged = Tag.objects.filter(
+            db_key='approved', db_category='approval', objectdb__id__in=ids
+        ).values_list('objectdb__id', flat=True)
+        for character_id in tagged:
+            yield ('approved', character_id, True)
+        table = getattr(settings, 'WOD20TH_STAT_BACKEND', 'attribute') == TABLE_BACKEND
+        keys = ['approved'] if table else ['approved', 'stats']
+        attributes = Attribute.objects.filter(
+            db_key__in=keys, db_category__isnull=True, objectdb__id__in=ids
+        ).values_list('objectdb__id', 'db_key', 'db_value')
+        for character_id, key, value in attributes.iterator():
+            if key == 'approved':
+                yield ('approved', character_id, bool(value))
+                continue
+            if not isinstance(value, dict):
+                continue
+            for category, types in value.items():
+                if not isinstance(types, dict):
+                    continue
+                for stat_type, names in types.items():
+                    if not isinstance(names, dict):
+                        continue
+                    for name, leaf in names.items():
+                        perm = leaf.get('perm') if isinstance(leaf, dict) else leaf
+                        yield ('stat', character_id, category, stat_type, name, perm)
+        if table:
+            stats = CharacterStat.objects.filter(character_id__in=ids).values_list(
+                'character_id', 'category', 'stat_type', 'name', 'perm'
+            )
+            for character_id, category, stat_type, name, perm in stats.iterator():
+                yield ('stat', character_id, category, stat_type, name, perm)
+
+    # Questions
+
+    def column(self, name):
+        """
+        Return the values column of a numeric stat, by name.
+        """
+        key = name.strip().lower()
+        column = self._by_name.get(key)
+        if column is None:
+            matches = [stat for stat in self._by_name if stat.startswith(key)]
+            if len(matches) != 1:
+                raise CensusError(f"No single stat on any sheet matches '{name}'.")
+            column = self._by_name[matches[0]]
+        return self.values[:, column]
+
+    def group(self, field):
+        """
+        Return (codes, labels) for an identity stat such as 'clan'.
+        """
+        try:
+            return self.groups[field.strip().lower()]
+        except KeyError:
+            known = ', '.join(sorted(self.groups))
+            raise CensusError(f"Can't group by '{field}'. Try one of: {known}.")
+
+    def mask(self, where=(), approved=False):
+        """
+        Return a boolean array of the characters matching every condition.
+        Conditions are (field, op, value): identity stats compare by name,
+        numeric stats by value.
+        """
+        mask = self.approved.copy() if approved else np.ones(len(self), dtype=bool)
+        for field, op, value in where:
+            if op not in OPERATORS:
+                raise CensusError(f"Unknown comparison '{op}'.")
+            if field.strip().lower() in self.groups:
+                if op not in ('=', '!='):
+                    raise CensusError(f"{field} can only be compared with = or !=.")
+                codes, labels = self.group(field)
+                lowered = [label.lower() for label in labels]
+                code = lowered.index(str(value).lower()) if str(value).lower() in lowered else -2
+                mask &= OPERATORS[op](codes, code)
+            else:
+                try:
+                    number = float(value)
+                except (TypeError, ValueError):
+                    raise CensusError(f"{field} is compared with a number, not '{value}'.")
+                column = self.column(field)
+                # NaN (stat not on the sheet) never matches, except for !=
+                mask &= np.nan_to_num(column, nan=0.0) != number if op == '!=' else OPERATORS[op](column, number)
+        return mask
+
+    def _grouped(self, field, mask):
+        if field is None:
+            return np.zeros(int(mask.sum()), dtype=np.int64), ['All']
+        codes, labels = self.group(field)
+        # Shift so unset (-1) becomes its own group, 0
+        return codes[mask].astype(np.int64) + 1, ['(none)'] + labels
+
+    def counts(self, by=None, where=(), approved=False):
+        """
+        Return [(group, characters)] for the matching characters.
+        """
+        mask = self.mask(where, approved)
+        codes, labels = self._grouped(by, mask)
+        totals = np.bincount(codes, minlength=len(labels))
+        return [(labels[code], int(total)) for code, total in enumerate(totals) if total]
+
+    def summary(self, stat, by=None, where=(), approved=False):
+        """
+        Return [(group, characters with the stat, mean, min, max)] for a
+        numeric stat over the matching characters.
+        """
+        column = self.column(stat)
+        mask = self.mask(where, approved) & ~np.isnan(column)
+        codes, labels = self._grouped(by, mask)
+        values = column[mask].astype(np.float64)
+        counts = np.bincount(codes, minlength=len(labels))
+        sums = np.bincount(codes, weights=values, minlength=len(labels))
+        lows = np.full(len(labels), np.inf)
+        highs = np.full(len(labels), -np.inf)
+        np.minimum.at(lows, codes, values)
+        np.maximum.at(highs, codes, values)
+        return [
+            (labels[code], int(counts[code]), sums[code] / counts[code], lows[code], highs[code])
+            for code in range(len(labels)) if counts[code]
+        ]
+
+    def histogram(self, stat, where=(), approved=False):
+        """
+        Return [(value, characters)] for a numeric stat over the matching
+        characters.
+        """
+        column = self.column(stat)
+        mask = self.mask(where, approved) & ~np.isnan(column)
+        values = column[mask].astype(np.int64)
+        if not len(values):
+            return []
+        low = int(values.min())
+        totals = np.bincount(values - low)
+        return [(low + offset, int(total)) for offset, total in enumerate(totals) if total]
+
+
+CENSUS = Census()
@@ -0,0 +1,156 @@
+# world/wod20th/derived.py
+"""
+Derived stats: values computed from other stats, such as Willpower from
+the virtues or the injury level from damage and health levels.
+
+Each derived stat declares its inputs when it is registered:
+
+    "virtues/moral"                     every stat of that category/type
+    "identity/personal/Enlightenment"   a single stat
+    "db.agg"                            an Attribute set through db
+    "health_levels"                     another derived stat
+
+character.derived memoizes the computed values. The character's stat
+handler reports every change, and only the derived stats depending on what
+changed (and, in turn, their dependents) are dropped, so reads are a dict
+lookup and never stale:
+
+    willpower = character.derived['willpower']
+"""
+from collections import namedtuple
+
+from world.wod20th.models import calculate_road, calculate_willpower
+from world.wod20th.stat_store import ATTRIBUTE_CHANGE
+from world.wod20th.utils.damage import calculate_injury_level
+
+DerivedStat = namedtuple('DerivedStat', ['name', 'compute', 'paths', 'attributes', 'derived'])
+
+DERIVED_STATS = {}
+_dependents = {}
+
+
+def derived_stat(name, *inputs):
+    """
+    Register the decorated function as the derived stat `name`. The
+    function takes the character and returns the value.
+    """
+    paths = []
+    attributes = []
+    derived = []
+    for spec in inputs:
+        if spec.startswith('db.'):
+            attributes.append(spec[3:])
+        elif '/' in spec:
+            paths.append(tuple(spec.split('/')))
+        else:
+            derived.append(spec)
+
+    def decorator(func):
+        DERIVED_STATS[name] = DerivedStat(name, func, tuple(paths), tuple(attributes), tuple(derived))
+        _dependents.clear()
+        return func
+    return decorator
+
+
+def dependents(name):
+    """
+    Return the derived stats computed from `name`, directly or indirectly.
+    """
+    if not _dependents:
+        direct = {}
+        for stat in DERIVED_STATS.values():
+            for source in stat.derived:
+                direct.setdefault(source, []).append(stat.name)
+        for source in DERIVED_STATS:
+            found = []
+            pending = list(direct.get(source, ()))
+            while pending:
+                dependent = pending.pop()
+                if dependent not in found:
+                    found.append(dependent)
+                    pending.extend(direct.get(dependent, ()))
+            _dependents[source] = tuple(found)
+    return _dependents.get(name, ())
+
+
+def _overlaps(changed, path):
+    # A change to a whole category touches every stat in it, and a change
+    # to one stat touches inputs covering its category or type.
+    depth = min(len(changed), len(path))
+    return changed[:depth] == path[:depth]
+
+
+class DerivedStats:
+    """
+    character.derived: the memoized derived stats of one character.
+    """
+
+    def __init__(self, character):
+        self.character = character
+        self._values = {}
+        character.stats.subscribe(self._on_change)
+
+    def __getitem__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            value = DERIVED_STATS[name].compute(self.character)
+            self._values[name] = value
+            return value
+
+    def get(self, name, default=None):
+        if name not in DERIVED_STATS:
+            return default
+        return self[name]
+
+    def invalidate(self, name=None):
+        """
+        Drop a derived stat and everything computed from it, or everything
+        if no name is given.
+        """
+        if name is None:
+            self._values.clear()
+            return
+        self._values.pop(name, None)
+        for dependent in dependents(name):
+            self._values.pop(dependent, None)
+
+    def _on_change(self, kind, key):
+        if not self._values:
+            return
+        for stat in DERIVED_STATS.values():
+            if stat.name not in self._values:
+                continue
+            if kind == ATTRIBUTE_CHANGE:
+                hit = key in stat.attributes
+            else:
+                hit = any(_overlaps(key, path) for path in stat.paths)
+            if hit:
+                self.invalidate(stat.name)
+
+
+@derived_stat('willpower', 'virtues/moral')
+def _willpower(character):
+    return calculate_willpower(character)
+
+
+@derived_stat('road', 'identity/personal/Enlightenment', 'virtues/moral')
+def _road(character):
+    return calculate_road(character)
+
+
+@derived_stat('health_levels', 'other/other/Health')
+def _health_levels(character):
+    return character.get_stat('other', 'other', 'Health') or 7
+
+
+@derived_stat('injury_level', 'health_levels', 'db.bashing', 'db.lethal', 'db.agg', 'db.char_type')
+def _injury_level(character):
+    db = character.db
+    bashing, lethal, agg = db.bashing or 0, db.lethal or 0, db.agg or 0
+    return calculate_injury_level(
+        bashing + lethal + agg,
+        character.derived['health_levels'],
+        agg,
+        db.char_type or "mortal",
+    )
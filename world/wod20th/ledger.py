@@ -0,0 +1,275 @@
+# world/wod20th/ledger.py
+"""
+The stat ledger: an append-only log of every stat change, with periodic
+snapshots of whole sheets.
+
+The stat handler reports each change when it saves, together with who made
+it and why (see StatHandler.batch). Entries are buffered in memory and
+written with one bulk insert, either when the buffer fills or when the
+StatLedgerScript ticks, so a busy scene costs no extra queries per stat.
+If the insert fails, only the entries that can't be written (say, for a
+character deleted meanwhile) are dropped.
+
+Every SNAPSHOT_EVERY entries a character gets a StatSnapshot of the whole
+sheet. Reconstructing a sheet at some past time starts from the nearest
+snapshot and replays (or undoes) only the entries in between:
+
+    LEDGER.history(character, 'pools', 'dual', 'Willpower')
+    LEDGER.state_at(character, when)
+"""
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+from evennia import DefaultScript, create_script
+from evennia.scripts.models import ScriptDB
+from evennia.utils import logger
+
+from world.wod20th.models import StatLedgerEntry, StatSnapshot
+from world.wod20th.utils.bulk_insert import bulk_insert
+
+# Write the buffer once it holds this many entries
+FLUSH_SIZE = 200
+# Snapshot a character's sheet after this many entries
+SNAPSHOT_EVERY = 200
+# Snapshots older than this are thinned to one per character per day
+SNAPSHOT_KEEP_DAYS = 7
+
+# Damage isn't kept in the stats dict; it's logged under these keys
+DAMAGE_KEYS = {
+    'bashing': ('health', 'damage', 'Bashing'),
+    'lethal': ('health', 'damage', 'Lethal'),
+    'agg': ('health', 'damage', 'Aggravated'),
+}
+
+
+def _value(perm, temp):
+    if perm is None and temp is None:
+        return None
+    value = {}
+    if perm is not None:
+        value['perm'] = perm
+    if temp is not None:
+        value['temp'] = temp
+    return value
+
+
+def _apply(state, key, value):
+    category, stat_type, name = key
+    if value is None:
+        state.get(category, {}).get(stat_type, {}).pop(name, None)
+    else:
+        state.setdefault(category, {}).setdefault(stat_type, {})[name] = dict(value)
+
+
+def current_state(character):
+    """
+    Return a detached copy of the character's stats with damage filled in
+    under DAMAGE_KEYS, the form snapshots are stored in.
+    """
+    state = character.stats.all().copy()
+    for attribute, key in DAMAGE_KEYS.items():
+        _apply(state, key, _value(character.attributes.get(attribute) or 0, None))
+    return state
+
+
+class StatLedger:
+    """
+    The buffered writer and the queries over the ledger. Use the module's
+    LEDGER instance.
+    """
+
+    def __init__(self):
+        self._pending = []
+        # character id -> (character, entries since its last snapshot)
+        self._counts = {}
+        self._snapshotted = set()
+
+    def record(self, character, changes, actor=None, reason=''):
+        """
+        Buffer changes to one character. Each change is
+        ((category, stat_type, name), old_perm, old_temp, new_perm, new_temp),
+        with None for a value that wasn't set.
+        """
+        if not changes or not character.id:
+            return
+        now = timezone.now()
+        actor = getattr(actor, 'key', actor) or ''
+        for key, old_perm, old_temp, new_perm, new_temp in changes:
+            self._pending.append(StatLedgerEntry(
+                character_id=character.id,
+                timestamp=now,
+                category=key[0],
+                stat_type=key[1],
+                name=key[2],
+                old_value=_value(old_perm, old_temp),
+                new_value=_value(new_perm, new_temp),
+                actor=str(actor)[:255],
+                reason=(reason or '')[:255],
+            ))
+        _, count = self._counts.get(character.id, (character, 0))
+        self._counts[character.id] = (character, count + len(changes))
+        if len(self._pending) >= FLUSH_SIZE:
+            self.flush()
+
+    def record_damage(self, character, old, new, actor=None, reason=''):
+        """
+        Log a change to damage; `old` and `new` map 'bashing', 'lethal' and
+        'agg' to levels.
+        """
+        changes = [
+            (key, old.get(attribute, 0), None, new.get(attribute, 0), None)
+            for attribute, key in DAMAGE_KEYS.items()
+            if old.get(attribute, 0) != new.get(attribute, 0)
+        ]
+        self.record(character, changes, actor=actor, reason=reason)
+
+    def flush(self):
+        """
+        Write the buffered entries, then snapshot any character that is due.
+        """
+        if self._pending:
+            pending, self._pending = self._pending, []
+            failed = bulk_insert(StatLedgerEntry, pending, foreign_keys=('character',))
+            if failed:
+                # Usually characters deleted since their changes were recorded
+                lost = {entry.character_id for entry in failed}
+                logger.log_err(f"Could not write {len(failed)} of {len(pending)} stat ledger entries "
+                               f"(characters {', '.join(f'#{pk}' for pk in sorted(lost))}).")
+                for character_id in lost:
+                    self._counts.pop(character_id, None)
+        self._snapshot_due()
+
+    def _snapshot_due(self):
+        for character_id, (character, count) in list(self._counts.items()):
+            if count < SNAPSHOT_EVERY and character_id in self._snapshotted:
+                continue
+            if count < SNAPSHOT_EVERY and StatSnapshot.objects.filter(character_id=character_id).exists():
+                self._snapshotted.add(character_id)
+                continue
+            if character.stats.in_batch:
+                # Its mirror holds changes that aren't in the ledger yet
+                continue
+            self.snapshot(character)
+
+    def snapshot(self, character):
+        """
+        Store the character's whole sheet as of its latest ledger entry.
+        """
+        latest = StatLedgerEntry.objects.filter(character_id=character.id).aggregate(Max('id'))['id__max']
+        StatSnapshot.objects.create(
+            character_id=character.id,
+            timestamp=timezone.now(),
+            entry_id=latest or 0,
+            stats=current_state(character),
+        )
+        self._counts.pop(character.id, None)
+        self._snapshotted.add(character.id)
+
+    def history(self, character, category=None, stat_type=None, name=None):
+        """
+        Return the character's ledger entries, newest first, optionally
+        narrowed to a category, stat type or single stat.
+        """
+        self.flush()
+        entries = StatLedgerEntry.objects.filter(character_id=character.id)
+        if category:
+            entries = entries.filter(category=category)
+        if stat_type:
+            entries = entries.filter(stat_type=stat_type)
+        if name:
+            entries = entries.filter(name=name)
+        return entries.order_by('-timestamp', '-id')
+
+    def state_at(self, character, when):
+        """
+        Return the character's stats (and damage) as they were at `when`.
+        """
+        self.flush()
+        entries = StatLedgerEntry.objects.filter(character_id=character.id)
+        snapshots = StatSnapshot.objects.filter(character_id=character.id)
+
+        before = snapshots.filter(timestamp__lte=when).order_by('-timestamp', '-id').first()
+        if before:
+            state = before.stats
+            replay = entries.filter(id__gt=before.entry_id, timestamp__lte=when).order_by('id')
+            for entry in replay.iterator():
+                _apply(state, entry.key, entry.new_value)
+            return state
+
+        # Nothing earlier: walk back from the next snapshot, or from now
+        after = snapshots.filter(timestamp__gt=when).order_by('timestamp', 'id').first()
+        if after:
+            state = after.stats
+            undo = entries.filter(id__lte=after.entry_id, timestamp__gt=when)
+        else:
+            state = current_state(character)
+            undo = entries.filter(timestamp__gt=when)
+        for entry in undo.order_by('-id').iterator():
+            _apply(state, entry.key, entry.old_value)
+        return state
+
+    def compact_snapshots(self, keep_days=SNAPSHOT_KEEP_DAYS):
+        """
+        Keep only the last snapshot of each day for each character once
+        snapshots are older than `keep_days`. Entries are never removed.
+        """
+        cutoff = timezone.now() - timedelta(days=keep_days)
+        old = StatSnapshot.objects.filter(timestamp__lt=cutoff).order_by(
+            'character_id', '-timestamp', '-id'
+        ).values_list('id', 'character_id', 'timestamp')
+        seen = set()
+        stale = []
+        for pk, character_id, timestamp in old.iterator():
+            day = (character_id, timestamp.date())
+            if day in seen:
+                stale.append(pk)
+            else:
+                seen.add(day)
+        for start in range(0, len(stale), 500):
+            StatSnapshot.objects.filter(id__in=stale[start:start + 500]).delete()
+        return len(stale)
+
+
+LEDGER = StatLedger()
+
+
+class StatLedgerScript(DefaultScript):
+    """
+    Writes the ledger buffer every minute and thins old snapshots daily.
+    """
+
+    def at_script_creation(self):
+        self.key = "StatLedger"
+        self.desc = "Writes buffered stat ledger entries"
+        self.interval = 60
+        self.persistent = True
+
+    def at_repeat(self):
+        LEDGER.flush()
+        now = timezone.now()
+        last = self.db.last_compacted
+        if not last or now - last > timedelta(days=1):
+            removed = LEDGER.compact_snapshots()
+            self.db.last_compacted = now
+            if removed:
+                logger.log_info(f"Stat ledger: removed {removed} old snapshots.")
+
+    def at_stop(self):
+        LEDGER.flush()
+
+
+def init_ledger_script():
+    try:
+        script = ScriptDB.objects.get(db_key="StatLedger")
+    except ScriptDB.DoesNotExist:
+        script = create_script(StatLedgerScript, key="StatLedger")
+    except ScriptDB.MultipleObjectsReturned:
+        scripts = ScriptDB.objects.filter(db_key="StatLedger")
+        script = scripts.first()
+        for extra in scripts[1:]:
+            extra.delete()
+
+    if script and not script.is_active:
+        script.start()
+    return script
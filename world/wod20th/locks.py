@@ -1,17 +1,28 @@
 # mygame/locks.py
+#
+# Every public callable in this module is registered as a lockfunc, so
+# helpers are imported under private names.
 
+from world.wod20th.utils.name_index import find_stats as _find_stats
 
-from world.wod20th.models import Stat
+
+def _splat(obj):
+    # Characters cache their splat; anything else reads it from the stats.
+    if hasattr(obj, 'get_splat'):
+        return obj.get_splat()
+    if hasattr(obj, 'get_stat'):
+        return obj.get_stat('other', 'splat', 'Splat')
+    return None
 
 
 def is_splat(accessing_obj, accessed_obj, *args, **kwargs):
     """
     Check if the accessing_obj has the same splat as the accessed_obj.
     """
-    splat = args[0]
-    
+    splat = args[0] if args else None
+
     if splat:
-        return accessing_obj.get_stat('other', 'splat', 'Splat') == splat
+        return _splat(accessing_obj) == splat
     return False
 
 
@@ -19,14 +30,16 @@ def has_stat(accessing_obj, accessed_obj, *args, **kwargs):
     """
     Check if the accessing_obj has a specified stat.
         has_stat(<stat_name>, <stat_value>)
-      """
-    
-   # We're going ot use the Stat db for this one to look  up the stat
-   # Going to use args to pass in the stat name and value
-
-    stat_name = args[0]
-    stat_value = args[1]
-    stat = Stat.objects.get(name_icontains=stat_name)
-    
-    
-    return accessing_obj.get_stat(stat.category, stat.stat_type, stat.name) == stat_value
\ No newline at end of file
+    """
+    # The stat definition comes from the in-memory catalog, so evaluating
+    # this lock never touches the database.
+    if len(args) < 2 or not hasattr(accessing_obj, 'get_stat'):
+        return False
+
+    stat_name, stat_value = args[0], args[1]
+    matches = _find_stats(stat_name)
+    if not matches:
+        return False
+    stat = matches[0]
+
+    return str(accessing_obj.get_stat(stat.category, stat.stat_type, stat.name)) == str(stat_value)
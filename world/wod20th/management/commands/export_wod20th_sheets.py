@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+# Import Evennia and initialize it
+import evennia
+evennia._init()
+
+# Ensure Django settings are configured
+import django
+django.setup()
+
+from world.wod20th.sheet_export import CHUNK_SIZE, SheetExport
+
+
+class Command(BaseCommand):
+    help = 'Write every character sheet to a gzipped JSON Lines file, one record per character'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=None,
+                            help='File to write (default: server/exports/sheets-<timestamp>.jsonl.gz)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Number of characters loaded at a time')
+
+    def handle(self, *args, **kwargs):
+        export = SheetExport(kwargs['path'], chunk_size=kwargs['chunk_size'], flush=True)
+        export.begin()
+        self.stdout.write(f"Exporting {len(export.ids)} characters to {export.path}...")
+        while export.write_chunk():
+            self.stdout.write(f"  {export.position}/{len(export.ids)}")
+        export.finish()
+        style = self.style.WARNING if export.errors else self.style.SUCCESS
+        self.stdout.write(style(export.summary()))
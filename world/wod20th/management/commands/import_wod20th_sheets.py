@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+# Import Evennia and initialize it
+import evennia
+evennia._init()
+
+# Ensure Django settings are configured
+import django
+django.setup()
+
+import os
+
+from world.wod20th.sheet_export import CHUNK_SIZE, SheetImport, read_progress
+
+
+class Command(BaseCommand):
+    help = ('Apply a sheet export made by export_wod20th_sheets. Interrupted imports resume '
+            'after the last finished chunk when run again')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The .jsonl.gz file to import')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Number of records applied at a time')
+        parser.add_argument('--match', choices=['id', 'key'], default='id',
+                            help='Match records to characters by id (default) or by name')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the saved progress and start from the first record')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be applied without writing anything')
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['path']
+        if not os.path.exists(path):
+            raise CommandError(f"No such file: {path}")
+
+        importer = SheetImport(
+            path,
+            chunk_size=kwargs['chunk_size'],
+            actor='import_wod20th_sheets',
+            match=kwargs['match'],
+            resume=not kwargs['restart'],
+            dry_run=kwargs['dry_run'],
+            flush=True,
+        )
+        done = read_progress(path) if importer.resume else 0
+        if done:
+            self.stdout.write(f"Resuming after line {done}.")
+        importer.run(on_chunk=lambda lines: self.stdout.write(f"  line {lines}"))
+
+        verb = 'Would apply' if importer.dry_run else 'Applied'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {importer.applied} sheets."))
+        if importer.missing:
+            shown = ', '.join(str(name) for name in importer.missing[:20])
+            more = f" and {len(importer.missing) - 20} more" if len(importer.missing) > 20 else ''
+            self.stdout.write(self.style.WARNING(
+                f"{len(importer.missing)} records matched no character: {shown}{more}"))
+        if importer.errors:
+            self.stdout.write(self.style.WARNING(f"{importer.errors} records failed; see the server log."))
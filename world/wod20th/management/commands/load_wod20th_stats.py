@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 from django.core.management.base import BaseCommand
@@ -13,13 +14,45 @@ import django
 django.setup()
 
 # Import the Stat model
-from world.wod20th.models import Stat, CATEGORIES, STAT_TYPES
+from world.wod20th.models import Stat, CATEGORIES, STAT_TYPES, normalize_stat_name
+from world.wod20th.catalog import STAT_CATALOG
+from evennia.server.models import ServerConfig
+
+# Accepted JSON shape for a stat entry in --bulk mode: field -> allowed types.
+STAT_SCHEMA = {
+    'name': (str,),
+    'description': (str,),
+    'game_line': (str,),
+    'category': (str,),
+    'stat_type': (str,),
+    'values': (list, dict),
+    'lock_string': (str, type(None)),
+    'default': (str, int, type(None)),
+    'instanced': (bool, type(None)),
+    'splat': (str, type(None)),
+    'hidden': (bool,),
+    'locked': (bool,),
+}
+REQUIRED_FIELDS = ('name', 'game_line')
+
+# Fields written by the bulk loader, compared when diffing against the table.
+STAT_FIELDS = ('description', 'values', 'lock_string', 'default', 'instanced', 'splat', 'hidden', 'locked')
+
+# ServerConfig key holding {filename: {'sha256': ..., 'keys': [...]}} from the last bulk import.
+CHECKSUM_CONFIG_KEY = 'wod20th_stat_checksums'
+
 
 class Command(BaseCommand):
     help = 'Load or update WoD20th stats from a folder containing JSON files'
 
     def add_arguments(self, parser):
         parser.add_argument('json_folder', type=str, help='Path to the folder containing JSON files with stats')
+        parser.add_argument('--bulk', action='store_true',
+                            help='Validate and diff all files in memory, then apply the changes in one transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='With --bulk: print the diff without writing anything (implies --bulk)')
+        parser.add_argument('--force', action='store_true',
+                            help='With --bulk: reload files even if their checksum has not changed')
 
     def handle(self, *args, **kwargs):
         json_folder = kwargs['json_folder']
@@ -28,6 +61,10 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'Folder {json_folder} not found.'))
             return
 
+        if kwargs.get('bulk') or kwargs.get('dry_run'):
+            self.handle_bulk(json_folder, dry_run=kwargs.get('dry_run'), force=kwargs.get('force'))
+            return
+
         self.stdout.write(self.style.NOTICE(f'Starting to process files in folder: {json_folder}'))
 
         for filename in os.listdir(json_folder):
@@ -45,6 +82,9 @@ class Command(BaseCommand):
                 for stat_data in stats_data:
                     self.process_stat(stat_data)
 
+        # Refresh the in-memory catalog in one pass rather than per saved row
+        STAT_CATALOG.reload()
+
         self.stdout.write(self.style.SUCCESS('Finished processing all files.'))
 
     def process_stat(self, stat_data):
@@ -79,10 +119,10 @@ class Command(BaseCommand):
         stat, created = Stat.objects.get_or_create(
             name=name,
             game_line=game_line,
+            category=category,
+            stat_type=stat_type,
             defaults={
                 'description': description,
-                'category': category,
-                'stat_type': stat_type,
                 'values': values,
                 'lock_string': lock_string,
                 'default': default,
@@ -111,6 +151,196 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(self.style.NOTICE(f'No changes for existing stat: {name}'))
 
+    # Bulk mode
+
+    def handle_bulk(self, json_folder, dry_run=False, force=False):
+        """
+        Load every changed file, validate it, diff it against the Stat table
+        and apply the result with bulk_create/bulk_update/delete in a single
+        transaction. Stats are keyed on (name, game_line, category, stat_type).
+        """
+        checksums = ServerConfig.objects.conf(CHECKSUM_CONFIG_KEY, default={}) or {}
+        new_checksums = {}
+        incoming = {}
+        errors = []
+        warnings = []
+        skipped = 0
+
+        for filename in sorted(os.listdir(json_folder)):
+            if not filename.endswith('.json'):
+                continue
+            file_path = os.path.join(json_folder, filename)
+            try:
+                with open(file_path, 'rb') as file:
+                    raw = file.read()
+                digest = hashlib.sha256(raw).hexdigest()
+                if not force and checksums.get(filename, {}).get('sha256') == digest:
+                    new_checksums[filename] = checksums[filename]
+                    skipped += 1
+                    continue
+                stats_data = json.loads(raw.decode('utf-8'))
+            except (OSError, json.JSONDecodeError, UnicodeDecodeError) as e:
+                errors.append(f'{filename}: could not read file: {e}')
+                continue
+
+            if not isinstance(stats_data, list):
+                errors.append(f'{filename}: expected a list of stats.')
+                continue
+
+            keys = []
+            for position, entry in enumerate(stats_data):
+                row, problems, notes = self.validate_entry(entry)
+                location = f'{filename}[{position}]'
+                errors.extend(f'{location}: {problem}' for problem in problems)
+                warnings.extend(f'{location}: {note}' for note in notes)
+                if problems:
+                    continue
+                key = (row['name'], row['game_line'], row['category'], row['stat_type'])
+                if key in incoming:
+                    # e.g. a gift listed at different ranks for different tribes
+                    warnings.append(f'{location}: duplicate of {incoming[key][0]}, values merged.')
+                    row['values'] = self.merge_values(incoming[key][1]['values'], row['values'])
+                incoming[key] = (location, row)
+                keys.append(list(key))
+            new_checksums[filename] = {'sha256': digest, 'keys': keys}
+
+        for warning in warnings:
+            self.stdout.write(self.style.WARNING(warning))
+        if errors:
+            for error in errors:
+                self.stdout.write(self.style.ERROR(error))
+            self.stdout.write(self.style.ERROR(f'{len(errors)} invalid entries, nothing was written.'))
+            return
+
+        to_create, to_update, to_delete = self.diff_stats(incoming, checksums, new_checksums)
+
+        self.stdout.write(self.style.NOTICE(
+            f'{len(incoming)} stats in changed files, {skipped} unchanged files skipped.'
+        ))
+        for stat in to_create:
+            self.stdout.write(self.style.SUCCESS(f'+ {stat.name} ({stat.game_line}, {stat.category}/{stat.stat_type})'))
+        for stat, fields in to_update:
+            self.stdout.write(self.style.NOTICE(f'~ {stat.name} ({stat.game_line}): {", ".join(fields)}'))
+        for stat in to_delete:
+            self.stdout.write(self.style.WARNING(f'- {stat.name} ({stat.game_line}, {stat.category}/{stat.stat_type})'))
+        self.stdout.write(self.style.NOTICE(
+            f'{len(to_create)} to create, {len(to_update)} to update, {len(to_delete)} to remove.'
+        ))
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS('Dry run, nothing was written.'))
+            return
+
+        with transaction.atomic():
+            if to_delete:
+                Stat.objects.filter(pk__in=[stat.pk for stat in to_delete]).delete()
+            if to_create:
+                Stat.objects.bulk_create(to_create, batch_size=500)
+            if to_update:
+                Stat.objects.bulk_update([stat for stat, _ in to_update], STAT_FIELDS, batch_size=500)
+            ServerConfig.objects.conf(CHECKSUM_CONFIG_KEY, value=new_checksums)
+
+        # bulk_* bypasses the save/delete signals, so reload the catalog once
+        STAT_CATALOG.reload()
+        self.stdout.write(self.style.SUCCESS('Finished bulk import.'))
+
+    def validate_entry(self, entry):
+        """
+        Check one JSON entry against STAT_SCHEMA.
+
+        Returns:
+            tuple: (row, errors, warnings) where row holds the normalized
+                field values ready to be written.
+        """
+        if not isinstance(entry, dict):
+            return None, ['entry is not an object'], []
+
+        errors = []
+        warnings = []
+        for field in REQUIRED_FIELDS:
+            if not entry.get(field):
+                errors.append(f"missing '{field}'")
+        for field, value in entry.items():
+            if field not in STAT_SCHEMA:
+                warnings.append(f"unknown field '{field}' ignored")
+            elif not isinstance(value, STAT_SCHEMA[field]):
+                errors.append(f"'{field}' should be {' or '.join(t.__name__ for t in STAT_SCHEMA[field])}")
+        if errors:
+            return None, errors, warnings
+
+        # Same defaults and coercions as the row-by-row loader
+        category = entry.get('category', 'other')
+        stat_type = entry.get('stat_type', 'other')
+        if category not in dict(CATEGORIES):
+            warnings.append(f"unknown category '{category}' stored as 'other'")
+            category = 'other'
+        if stat_type not in dict(STAT_TYPES):
+            warnings.append(f"unknown stat_type '{stat_type}' stored as 'other'")
+            stat_type = 'other'
+
+        default = entry.get('default', '')
+        row = {
+            'name': entry['name'],
+            'game_line': entry['game_line'],
+            'category': category,
+            'stat_type': stat_type,
+            'description': entry.get('description', ''),
+            'values': self.process_values(entry.get('values', [])),
+            'lock_string': entry.get('lock_string', ''),
+            'default': str(default) if default is not None else None,
+            'instanced': entry.get('instanced', False),
+            'splat': entry.get('splat'),
+            'hidden': entry.get('hidden', False),
+            'locked': entry.get('locked', False),
+        }
+        return row, errors, warnings
+
+    def diff_stats(self, incoming, old_checksums, new_checksums):
+        """
+        Compare the validated rows against the Stat table.
+
+        Rows are removed only if an earlier bulk import loaded them from a
+        file that no longer contains them, so hand-made stats are never
+        touched.
+        """
+        existing = {}
+        duplicates = []
+        for stat in Stat.objects.all().order_by('pk'):
+            key = (stat.name, stat.game_line, stat.category, stat.stat_type)
+            if key in existing:
+                duplicates.append(stat)
+            else:
+                existing[key] = stat
+
+        to_create = []
+        to_update = []
+        for key, (_, row) in incoming.items():
+            stat = existing.get(key)
+            if stat is None:
+                to_create.append(Stat(name_normalized=normalize_stat_name(row['name']), **row))
+                continue
+            changed = [field for field in STAT_FIELDS if getattr(stat, field) != row[field]]
+            if changed:
+                for field in changed:
+                    setattr(stat, field, row[field])
+                to_update.append((stat, changed))
+
+        current_keys = {tuple(key) for entry in new_checksums.values() for key in entry['keys']}
+        previous_keys = {tuple(key) for entry in old_checksums.values() for key in entry.get('keys', ())}
+        to_delete = [existing[key] for key in previous_keys - current_keys if key in existing]
+        if duplicates:
+            self.stdout.write(self.style.WARNING(
+                f'{len(duplicates)} duplicate rows share a key with an older row and were left alone.'
+            ))
+        return to_create, to_update, to_delete
+
+    def merge_values(self, first, second):
+        merged = list(first)
+        merged.extend(value for value in second if value not in merged)
+        if all(isinstance(value, int) for value in merged):
+            merged.sort()
+        return merged
+
     def process_values(self, values):
         if isinstance(values, dict):
             values_list = []
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+# Import Evennia and initialize it
+import evennia
+evennia._init()
+
+# Ensure Django settings are configured
+import django
+django.setup()
+
+from evennia.utils.idmapper.models import flush_cache
+from typeclasses.characters import Character
+from world.wod20th.ledger import LEDGER
+from world.wod20th.stat_schema import normalize_character
+
+
+class Command(BaseCommand):
+    help = 'Convert numeric character stats stored as strings to ints and report values that cannot be converted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Number of characters loaded at a time')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without writing anything')
+
+    def handle(self, *args, **kwargs):
+        chunk_size = max(kwargs['chunk_size'], 1)
+        dry_run = kwargs['dry_run']
+
+        # Only ids are held for the whole run; characters are loaded a chunk at a time
+        ids = list(Character.objects.all_family().order_by('id').values_list('id', flat=True))
+        self.stdout.write(f"Checking {len(ids)} characters{' (dry run)' if dry_run else ''}...")
+
+        characters = converted = anomalies = 0
+        for start in range(0, len(ids), chunk_size):
+            chunk = Character.objects.all_family().filter(id__in=ids[start:start + chunk_size])
+            for character in chunk:
+                count, problems = normalize_character(character, write=not dry_run)
+                characters += 1 if count else 0
+                converted += count
+                anomalies += len(problems)
+                for problem in problems:
+                    self.stdout.write(self.style.WARNING(f"{character.key} (#{character.id}): {problem}"))
+            if not dry_run:
+                LEDGER.flush()
+            # Let the loaded characters go before the next chunk
+            flush_cache()
+            self.stdout.write(f"  {min(start + chunk_size, len(ids))}/{len(ids)}")
+
+        verb = 'Would convert' if dry_run else 'Converted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {converted} values on {characters} characters. {anomalies} anomalies reported."
+        ))
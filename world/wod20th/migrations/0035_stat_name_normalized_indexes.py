@@ -0,0 +1,81 @@
+from django.db import migrations, models
+
+
+def _merge_values(first, second):
+    merged = list(first or [])
+    for value in second or []:
+        if value not in merged:
+            merged.append(value)
+    if all(isinstance(value, int) for value in merged):
+        merged.sort()
+    return merged
+
+
+def merge_duplicate_stats(apps, schema_editor):
+    """
+    Fill name_normalized and collapse rows sharing (name, game_line,
+    category, stat_type) into the oldest one before the unique constraint
+    is added. The same gift listed at different ranks for different tribes
+    ends up as one row carrying every rank.
+    """
+    Stat = apps.get_model("wod20th", "Stat")
+
+    keepers = {}
+    to_delete = []
+    for stat in Stat.objects.all().order_by("pk"):
+        stat.name_normalized = (stat.name or "").strip().lower()
+        key = (stat.name, stat.game_line, stat.category, stat.stat_type)
+        keeper = keepers.get(key)
+        if keeper is None:
+            keepers[key] = stat
+            continue
+
+        keeper.values = _merge_values(keeper.values, stat.values)
+        if len(stat.description or "") > len(keeper.description or ""):
+            keeper.description = stat.description
+        for field in ("lock_string", "splat", "default", "instanced"):
+            if getattr(keeper, field) in (None, "") and getattr(stat, field) not in (None, ""):
+                setattr(keeper, field, getattr(stat, field))
+        keeper.hidden = keeper.hidden or stat.hidden
+        keeper.locked = keeper.locked or stat.locked
+        to_delete.append(stat.pk)
+
+    Stat.objects.bulk_update(
+        list(keepers.values()),
+        ["name_normalized", "values", "description", "lock_string", "splat", "default",
+         "instanced", "hidden", "locked"],
+        batch_size=500,
+    )
+    if to_delete:
+        Stat.objects.filter(pk__in=to_delete).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wod20th", "0034_stat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stat",
+            name="name_normalized",
+            field=models.CharField(db_index=True, default="", editable=False, max_length=100),
+        ),
+        migrations.RunPython(merge_duplicate_stats, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="stat",
+            index=models.Index(fields=["category", "stat_type", "name"], name="wod20th_stat_type_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="stat",
+            index=models.Index(fields=["game_line", "splat"], name="wod20th_stat_line_splat_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="stat",
+            constraint=models.UniqueConstraint(
+                fields=("name", "game_line", "category", "stat_type"),
+                name="wod20th_stat_natural_key",
+            ),
+        ),
+    ]
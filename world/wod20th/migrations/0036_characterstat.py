@@ -0,0 +1,55 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("objects", "0015_crisis_outcome_task"),
+        ("wod20th", "0035_stat_name_normalized_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CharacterStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("category", models.CharField(max_length=100)),
+                ("stat_type", models.CharField(max_length=100)),
+                ("name", models.CharField(max_length=100)),
+                ("perm", models.JSONField(blank=True, default=None, null=True)),
+                ("temp", models.JSONField(blank=True, default=None, null=True)),
+                (
+                    "character",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="character_stats",
+                        to="objects.objectdb",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["category", "stat_type", "name"],
+                        name="wod20th_charstat_stat_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="characterstat",
+            constraint=models.UniqueConstraint(
+                fields=("character", "category", "stat_type", "name"),
+                name="wod20th_charstat_key",
+            ),
+        ),
+    ]
@@ -0,0 +1,88 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("objects", "0015_crisis_outcome_task"),
+        ("wod20th", "0036_characterstat"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StatLedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("timestamp", models.DateTimeField()),
+                ("category", models.CharField(max_length=100)),
+                ("stat_type", models.CharField(max_length=100)),
+                ("name", models.CharField(max_length=100)),
+                ("old_value", models.JSONField(blank=True, default=None, null=True)),
+                ("new_value", models.JSONField(blank=True, default=None, null=True)),
+                ("actor", models.CharField(blank=True, default="", max_length=255)),
+                ("reason", models.CharField(blank=True, default="", max_length=255)),
+                (
+                    "character",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stat_ledger",
+                        to="objects.objectdb",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["character", "timestamp"],
+                        name="wod20th_ledger_time_idx",
+                    ),
+                    models.Index(
+                        fields=["character", "category", "stat_type", "name", "timestamp"],
+                        name="wod20th_ledger_stat_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="StatSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("timestamp", models.DateTimeField()),
+                ("entry_id", models.BigIntegerField(default=0)),
+                ("stats", models.JSONField(default=dict)),
+                (
+                    "character",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stat_snapshots",
+                        to="objects.objectdb",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["character", "timestamp"],
+                        name="wod20th_snapshot_time_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wod20th", "0037_statledgerentry_statsnapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shapeshifterform",
+            name="duration",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Seconds the form lasts before reverting; 0 lasts until the next shift.",
+            ),
+        ),
+    ]
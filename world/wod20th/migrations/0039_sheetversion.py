@@ -0,0 +1,45 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("objects", "0015_crisis_outcome_task"),
+        ("wod20th", "0038_shapeshifterform_duration"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SheetVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveIntegerField()),
+                ("timestamp", models.DateTimeField()),
+                ("base_version", models.PositiveIntegerField(blank=True, default=None, null=True)),
+                ("approval", models.BooleanField(default=False)),
+                ("stats", models.JSONField(default=dict)),
+                ("actor", models.CharField(blank=True, default="", max_length=255)),
+                ("reason", models.CharField(blank=True, default="", max_length=255)),
+                (
+                    "character",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sheet_versions",
+                        to="objects.objectdb",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("character", "version")},
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("objects", "0015_crisis_outcome_task"),
+        ("wod20th", "0039_sheetversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("roller_name", models.CharField(blank=True, default="", max_length=255)),
+                ("timestamp", models.DateTimeField()),
+                ("description", models.TextField(blank=True, default="")),
+                ("result", models.TextField(blank=True, default="")),
+                ("seed", models.BigIntegerField(blank=True, default=None, null=True)),
+                (
+                    "room",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="roll_logs",
+                        to="objects.objectdb",
+                    ),
+                ),
+                (
+                    "roller",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="rolls",
+                        to="objects.objectdb",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["room", "timestamp"], name="wod20th_rolllog_room_idx"),
+                    models.Index(fields=["roller", "timestamp"], name="wod20th_rolllog_roller_idx"),
+                ],
+            },
+        ),
+    ]
@@ -3,7 +3,7 @@ import re
 from django.db import models
 from django.db.models import JSONField  # Use the built-in JSONField
 from django.forms import ValidationError
-from evennia.locks.lockhandler import LockHandler
+from world.wod20th.utils.lock_cache import check_lock
 from django.conf import settings
 from evennia.accounts.models import AccountDB
 from evennia.objects.models import ObjectDB
@@ -85,8 +85,16 @@ STAT_TYPES = [
     ('unseelie-legacy', 'Unseelie Legacy')
 ]
 
+def normalize_stat_name(name):
+    """
+    The form stored in Stat.name_normalized, used for case-insensitive lookups.
+    """
+    return (name or '').strip().lower()
+
 class Stat(models.Model):
     name = models.CharField(max_length=100)
+    # Lowercased copy of name, kept in sync by save(), so iexact lookups can use an index
+    name_normalized = models.CharField(max_length=100, default='', db_index=True, editable=False)
     description = models.TextField(default='')  # Changed to non-nullable with default empty string
     game_line = models.CharField(max_length=100)
     category = models.CharField(max_length=100, choices=CATEGORIES)
@@ -100,9 +108,30 @@ class Stat(models.Model):
     # add a field for the default value of the stat
     default = models.CharField(max_length=100, blank=True, null=True, default=None)
 
+    class Meta:
+        app_label = 'wod20th'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'game_line', 'category', 'stat_type'],
+                name='wod20th_stat_natural_key',
+            ),
+        ]
+        indexes = [
+            # by_type lists and (category, stat_type, name) lookups from chargen and get_stat
+            models.Index(fields=['category', 'stat_type', 'name'], name='wod20th_stat_type_name_idx'),
+            models.Index(fields=['game_line', 'splat'], name='wod20th_stat_line_splat_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_stat_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'name_normalized'}
+        super().save(*args, **kwargs)
+
     @property
     def lock_storage(self):
         """
@@ -114,14 +143,8 @@ class Stat(models.Model):
         """
         Check if the accessing_obj can access this Stat based on the lock_string.
         """
-        # Create a temporary lock handler to handle the lock check
-        temp_lock_handler = LockHandler(self)
-        
-        # Perform the access check
-        return temp_lock_handler.check(accessing_obj, access_type)
-
-    class Meta:
-        app_label = 'wod20th'
+        # Lockstrings are parsed once and shared by every Stat that uses them
+        return check_lock(accessing_obj, self.lock_string, access_type, accessed_obj=self)
 
 class CharacterSheet(SharedMemoryModel):
     account = models.OneToOneField(AccountDB, related_name='character_sheet', on_delete=models.CASCADE, null=True)
@@ -131,6 +154,140 @@ class CharacterSheet(SharedMemoryModel):
     class Meta:
         app_label = 'wod20th'
 
+class CharacterStat(models.Model):
+    """
+    One stat on one character, used when WOD20TH_STAT_BACKEND is "table".
+    See world.wod20th.stat_store for the in-memory mirror that reads and
+    writes these rows.
+    """
+    character = models.ForeignKey("objects.ObjectDB", related_name="character_stats", on_delete=models.CASCADE)
+    category = models.CharField(max_length=100)
+    stat_type = models.CharField(max_length=100)
+    name = models.CharField(max_length=100)
+    # None means the key is absent from the stat's {'perm', 'temp'} dict
+    perm = JSONField(blank=True, null=True, default=None)
+    temp = JSONField(blank=True, null=True, default=None)
+
+    class Meta:
+        app_label = 'wod20th'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['character', 'category', 'stat_type', 'name'],
+                name='wod20th_charstat_key',
+            ),
+        ]
+        indexes = [
+            # Cross-character lookups, e.g. everyone with a given background
+            models.Index(fields=['category', 'stat_type', 'name'], name='wod20th_charstat_stat_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.character_id}: {self.category}/{self.stat_type}/{self.name}"
+
+class StatLedgerEntry(models.Model):
+    """
+    One change to one stat, appended by world.wod20th.ledger. Values are
+    the stat's {'perm', 'temp'} dict before and after, None if it wasn't set.
+    """
+    character = models.ForeignKey("objects.ObjectDB", related_name="stat_ledger", on_delete=models.CASCADE)
+    timestamp = models.DateTimeField()
+    category = models.CharField(max_length=100)
+    stat_type = models.CharField(max_length=100)
+    name = models.CharField(max_length=100)
+    old_value = JSONField(blank=True, null=True, default=None)
+    new_value = JSONField(blank=True, null=True, default=None)
+    actor = models.CharField(max_length=255, blank=True, default='')
+    reason = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        app_label = 'wod20th'
+        indexes = [
+            models.Index(fields=['character', 'timestamp'], name='wod20th_ledger_time_idx'),
+            models.Index(
+                fields=['character', 'category', 'stat_type', 'name', 'timestamp'],
+                name='wod20th_ledger_stat_idx',
+            ),
+        ]
+
+    @property
+    def key(self):
+        return (self.category, self.stat_type, self.name)
+
+    def __str__(self):
+        return f"{self.character_id}: {self.category}/{self.stat_type}/{self.name} at {self.timestamp}"
+
+class StatSnapshot(models.Model):
+    """
+    A character's whole sheet as of ledger entry `entry_id`.
+    """
+    character = models.ForeignKey("objects.ObjectDB", related_name="stat_snapshots", on_delete=models.CASCADE)
+    timestamp = models.DateTimeField()
+    entry_id = models.BigIntegerField(default=0)
+    stats = JSONField(default=dict)
+
+    class Meta:
+        app_label = 'wod20th'
+        indexes = [
+            models.Index(fields=['character', 'timestamp'], name='wod20th_snapshot_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.character_id}: snapshot at {self.timestamp}"
+
+
+class SheetVersion(models.Model):
+    """
+    One saved version of a character's sheet, kept by
+    world.wod20th.sheet_versions. A base version (base_version is None)
+    holds the whole sheet; any other holds only the stats that differ from
+    its base.
+    """
+    character = models.ForeignKey("objects.ObjectDB", related_name="sheet_versions", on_delete=models.CASCADE)
+    version = models.PositiveIntegerField()
+    timestamp = models.DateTimeField()
+    base_version = models.PositiveIntegerField(blank=True, null=True, default=None)
+    approval = models.BooleanField(default=False)
+    stats = JSONField(default=dict)
+    actor = models.CharField(max_length=255, blank=True, default='')
+    reason = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        app_label = 'wod20th'
+        unique_together = ('character', 'version')
+
+    @property
+    def is_base(self):
+        return self.base_version is None
+
+    def __str__(self):
+        return f"{self.character_id}: sheet version {self.version}"
+
+
+class RollLog(models.Model):
+    """
+    One dice roll made in a room, written in batches by
+    world.wod20th.roll_log. `roller` is kept as a name too, so the entry
+    still reads after the character is deleted.
+    """
+    room = models.ForeignKey("objects.ObjectDB", related_name="roll_logs", on_delete=models.CASCADE)
+    roller = models.ForeignKey("objects.ObjectDB", related_name="rolls", blank=True, null=True,
+                               on_delete=models.SET_NULL)
+    roller_name = models.CharField(max_length=255, blank=True, default='')
+    timestamp = models.DateTimeField()
+    description = models.TextField(blank=True, default='')
+    result = models.TextField(blank=True, default='')
+    seed = models.BigIntegerField(blank=True, null=True, default=None)
+
+    class Meta:
+        app_label = 'wod20th'
+        indexes = [
+            models.Index(fields=['room', 'timestamp'], name='wod20th_rolllog_room_idx'),
+            models.Index(fields=['roller', 'timestamp'], name='wod20th_rolllog_roller_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.roller_name} in {self.room_id} at {self.timestamp}"
+
 
 from django.db import models
 from evennia.utils.idmapper.models import SharedMemoryModel
@@ -214,6 +371,7 @@ class ShapeshifterForm(models.Model):
     difficulty = models.PositiveIntegerField(default=6)
     lock_string = models.CharField(max_length=255, blank=True)
     form_message = models.TextField(blank=True, help_text="Message to display when this form is assumed.")
+    duration = models.PositiveIntegerField(default=0, help_text="Seconds the form lasts before reverting; 0 lasts until the next shift.")
 
     class Meta:
         verbose_name = "Shapeshifter Form"
@@ -0,0 +1,171 @@
+# world/wod20th/overlays.py
+"""
+Stat overlays: named layers of modifiers on top of a character's stats.
+
+Rather than writing boosts into a stat's temp value, systems put them in a
+layer of their own: a shapeshifted form in 'form', blood boosts in 'pump',
+gear in 'equipment'. The effective value of a stat is its base value plus
+the modifiers of every layer:
+
+    character.overlays.set_layer('form', {('attributes', 'physical', 'Strength'): 4})
+    character.overlays.effective('attributes', 'physical', 'Strength')
+    character.overlays.remove_layer('form')
+
+Adding or removing a layer only touches the stats in it. Effective values
+are memoized per stat until one of its layers or the stat itself changes.
+The layers are saved in the `stat_overlays` Attribute.
+"""
+from world.wod20th.stat_store import STAT_CHANGE
+
+FORM_LAYER = 'form'
+PUMP_LAYER = 'pump'
+EQUIPMENT_LAYER = 'equipment'
+
+
+def base_value(character, category, stat_type, name):
+    """
+    The value a stat has before overlays: its temp value if that is set
+    and non-zero, otherwise its perm value.
+    """
+    stats = character.stats
+    value = stats.get(category, stat_type, name, temp=True)
+    if value in (None, 0):
+        value = stats.get(category, stat_type, name)
+    return value
+
+
+class StatOverlays:
+    """
+    character.overlays: the modifier layers of one character.
+    """
+
+    def __init__(self, character):
+        self.character = character
+        self._layers = None
+        # (category, stat_type, name) -> sum of that stat's modifiers
+        self._totals = None
+        self._effective = {}
+        character.stats.subscribe(self._on_change)
+
+    def _load(self):
+        if self._layers is None:
+            stored = self.character.attributes.get('stat_overlays') or {}
+            self._layers = {
+                layer: {tuple(key): delta for key, delta in modifiers.items()}
+                for layer, modifiers in stored.items()
+            }
+            self._totals = {}
+            for modifiers in self._layers.values():
+                self._add_totals(modifiers, 1)
+        return self._layers
+
+    def _save(self):
+        if self._layers:
+            self.character.attributes.add('stat_overlays', {
+                layer: dict(modifiers) for layer, modifiers in self._layers.items()
+            })
+        else:
+            self.character.attributes.remove('stat_overlays')
+        self.character.stats.attribute_changed('stat_overlays')
+
+    def _add_totals(self, modifiers, sign):
+        for key, delta in modifiers.items():
+            total = self._totals.get(key, 0) + sign * delta
+            if total:
+                self._totals[key] = total
+            else:
+                self._totals.pop(key, None)
+            self._effective.pop(key, None)
+
+    # Layers
+
+    def layers(self):
+        """
+        Return the names of the active layers.
+        """
+        return list(self._load())
+
+    def layer(self, layer):
+        """
+        Return a copy of one layer's {(category, stat_type, name): modifier}.
+        """
+        return dict(self._load().get(layer, {}))
+
+    def set_layer(self, layer, modifiers):
+        """
+        Replace a layer with {(category, stat_type, name): modifier}.
+        """
+        layers = self._load()
+        old = layers.pop(layer, None)
+        if old:
+            self._add_totals(old, -1)
+        modifiers = {tuple(key): delta for key, delta in modifiers.items() if delta}
+        if modifiers:
+            layers[layer] = modifiers
+            self._add_totals(modifiers, 1)
+        self._save()
+
+    def remove_layer(self, layer):
+        """
+        Drop a layer. Returns True if it was active.
+        """
+        layers = self._load()
+        old = layers.pop(layer, None)
+        if old is None:
+            return False
+        self._add_totals(old, -1)
+        self._save()
+        return True
+
+    def adjust(self, layer, key, delta):
+        """
+        Add `delta` to one stat's modifier in a layer, e.g. to stack or
+        expire a single boost.
+        """
+        layers = self._load()
+        key = tuple(key)
+        modifiers = layers.setdefault(layer, {})
+        value = modifiers.get(key, 0) + delta
+        if value:
+            modifiers[key] = value
+        else:
+            modifiers.pop(key, None)
+        if not modifiers:
+            del layers[layer]
+        self._add_totals({key: delta}, 1)
+        self._save()
+
+    # Values
+
+    def modifier(self, category, stat_type, name):
+        """
+        Return the sum of every layer's modifier to a stat.
+        """
+        self._load()
+        return self._totals.get((category, stat_type, name), 0)
+
+    def effective(self, category, stat_type, name):
+        """
+        Return a stat's base value plus its modifiers.
+        """
+        key = (category, stat_type, name)
+        try:
+            return self._effective[key]
+        except KeyError:
+            pass
+        value = base_value(self.character, category, stat_type, name)
+        modifier = self.modifier(category, stat_type, name)
+        if modifier and (value is None or type(value) is int):
+            value = (value or 0) + modifier
+        self._effective[key] = value
+        return value
+
+    def _on_change(self, kind, key):
+        if kind != STAT_CHANGE or not self._effective:
+            return
+        if not key:
+            self._effective.clear()
+            return
+        depth = len(key)
+        for stat in [stat for stat in self._effective if stat[:depth] == tuple(key)]:
+            del self._effective[stat]
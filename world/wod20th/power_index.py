@@ -0,0 +1,213 @@
+# world/wod20th/power_index.py
+"""
+Full-text search over powers: gifts, disciplines, spheres, arts, realms,
+and the mortal+ sorcery, psychic and true faith powers.
+
+POWER_INDEX is an inverted index from name and description tokens to Stat
+primary keys. It is built from the stat catalog on first use and kept
+current through the catalog's change notifications, so a single stat edit
+only re-indexes that stat.
+"""
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from threading import RLock
+
+from world.wod20th.catalog import STAT_CATALOG
+from world.wod20th.splat_templates import GAME_LINES
+
+# Stat types indexed even when a row was loaded outside the 'powers' category
+POWER_STAT_TYPES = {
+    'discipline', 'gift', 'sphere', 'art', 'realm', 'rote', 'sorcery', 'psychic', 'true_faith',
+}
+
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+PREFIX_FACTOR = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'for', 'from', 'has', 'in', 'is',
+    'it', 'its', 'of', 'on', 'or', 'that', 'the', 'their', 'them', 'this', 'to', 'with',
+}
+
+
+def tokenize(text):
+    """
+    Lowercase `text` and split it into searchable tokens.
+    """
+    text = (text or '').lower().replace("'", '').replace('’', '')
+    return [token for token in _TOKEN_RE.findall(text) if token not in _STOPWORDS]
+
+
+def is_power(stat):
+    return stat.category == 'powers' or stat.stat_type in POWER_STAT_TYPES
+
+
+class PowerIndex:
+    """
+    Inverted index over power names and descriptions.
+    """
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+        self._lock = RLock()
+        self._built = False
+        self._docs = {}
+        self._postings = defaultdict(dict)
+        self._vocabulary = []
+        catalog.subscribe(self._on_catalog_change)
+
+    # Building and incremental updates
+
+    def _on_catalog_change(self, event, stat):
+        with self._lock:
+            if event == 'reload':
+                self._built = False
+            elif not self._built:
+                return
+            elif event == 'discard':
+                self._remove(stat.pk)
+                self._vocabulary = sorted(self._postings)
+            else:
+                self._remove(stat.pk)
+                if is_power(stat):
+                    self._add(stat)
+                self._vocabulary = sorted(self._postings)
+
+    def build(self):
+        with self._lock:
+            self._docs = {}
+            self._postings = defaultdict(dict)
+            for stat in self._catalog.all():
+                if is_power(stat):
+                    self._add(stat)
+            self._vocabulary = sorted(self._postings)
+            self._built = True
+
+    def ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def _add(self, stat):
+        weights = defaultdict(float)
+        for token in tokenize(stat.name):
+            weights[token] += NAME_WEIGHT
+        for token in tokenize(stat.description):
+            weights[token] += DESCRIPTION_WEIGHT
+        for token, weight in weights.items():
+            self._postings[token][stat.pk] = weight
+        self._docs[stat.pk] = (stat, tuple(weights))
+
+    def _remove(self, pk):
+        doc = self._docs.pop(pk, None)
+        if doc is None:
+            return
+        for token in doc[1]:
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(pk, None)
+                if not postings:
+                    del self._postings[token]
+
+    # Searching
+
+    def _expand(self, token):
+        """
+        Yield (term, factor) for every indexed term matching `token`: the
+        exact term at full weight and longer terms it prefixes at a discount.
+        """
+        if token in self._postings:
+            yield token, 1.0
+        position = bisect_left(self._vocabulary, token)
+        while position < len(self._vocabulary):
+            term = self._vocabulary[position]
+            if not term.startswith(token):
+                break
+            if term != token:
+                yield term, PREFIX_FACTOR
+            position += 1
+
+    def search(self, query='', game_line=None, splat=None, stat_type=None):
+        """
+        Return matching powers, best first.
+
+        Every query token must match a name or description token, either
+        exactly or as a prefix. Results are scored by token weight times
+        inverse document frequency, with a bonus for matches on the name.
+        An empty query lists every power passing the filters, by name.
+
+        Args:
+            query (str): Free text to search for.
+            game_line (str, optional): Case-insensitive substring of the
+                game line, e.g. 'werewolf'.
+            splat (str, optional): Splat the power belongs to, by its splat
+                field or else its game line.
+            stat_type (str, optional): e.g. 'gift', 'discipline'.
+
+        Returns:
+            list: (Stat, score) tuples.
+        """
+        with self._lock:
+            self.ensure_built()
+            candidates = None
+            scores = defaultdict(float)
+            total = max(len(self._docs), 1)
+            for token in dict.fromkeys(tokenize(query)):
+                matched = defaultdict(float)
+                for term, factor in self._expand(token):
+                    postings = self._postings[term]
+                    idf = math.log(1 + total / len(postings))
+                    for pk, weight in postings.items():
+                        matched[pk] = max(matched[pk], weight * idf * factor)
+                if candidates is None:
+                    candidates = set(matched)
+                else:
+                    candidates &= set(matched)
+                if not candidates:
+                    return []
+                for pk, score in matched.items():
+                    scores[pk] += score
+            if candidates is None:
+                candidates = set(self._docs)
+            docs = [self._docs[pk][0] for pk in candidates]
+
+        query_text = ' '.join(tokenize(query))
+        results = []
+        for stat in docs:
+            if game_line and game_line.lower() not in (stat.game_line or '').lower():
+                continue
+            if splat and not self._matches_splat(stat, splat):
+                continue
+            if stat_type and stat.stat_type.lower() != stat_type.lower():
+                continue
+            score = scores.get(stat.pk, 0.0)
+            if query_text:
+                name_text = ' '.join(tokenize(stat.name))
+                if name_text == query_text:
+                    score += 100
+                elif name_text.startswith(query_text):
+                    score += 10
+            results.append((stat, score))
+
+        results.sort(key=lambda result: (-result[1], result[0].name.lower()))
+        return results
+
+    @staticmethod
+    def _matches_splat(stat, splat):
+        # Most powers only carry their game line, so fall back to that
+        if stat.splat:
+            return stat.splat.lower() == splat.lower()
+        return stat.game_line == GAME_LINES.get(splat.strip().title())
+
+    def stat_types(self):
+        """
+        Return the indexed stat types, for help output.
+        """
+        with self._lock:
+            self.ensure_built()
+            return sorted({doc[0].stat_type for doc in self._docs.values()})
+
+
+POWER_INDEX = PowerIndex(STAT_CATALOG)
@@ -0,0 +1,153 @@
+# world/wod20th/roll_log.py
+"""
+The roll log: every dice roll made in a room, kept in the RollLog table.
+
+Rooms report rolls with Room.log_roll, which buffers them here; the buffer
+is written with one bulk insert when it fills, when the RollLogScript
+ticks, or before anything reads the log. Logging a roll therefore never
+saves the room. A room or roller deleted before the write costs only its
+own rolls (or, for a roller, the link to them), not the whole buffer.
+The script also prunes rolls older than KEEP_DAYS once a day.
+
+    ROLL_LOG.for_room(room)[:10]
+    ROLL_LOG.for_roller(character)
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+from evennia import DefaultScript, create_script
+from evennia.objects.models import ObjectDB
+from evennia.scripts.models import ScriptDB
+from evennia.utils import logger
+
+from world.wod20th.models import RollLog
+from world.wod20th.utils.bulk_insert import bulk_insert
+
+SCRIPT_KEY = "RollLog"
+# Write the buffer once it holds this many rolls
+FLUSH_SIZE = 50
+# Rolls older than this are pruned
+KEEP_DAYS = 90
+# Rows deleted per query when pruning
+PRUNE_CHUNK = 1000
+
+
+class RollLogWriter:
+    """
+    The buffered writer and the queries over the roll log. Use the
+    module's ROLL_LOG instance.
+    """
+
+    def __init__(self):
+        self._pending = []
+
+    def record(self, room, roller, description, result, seed=None):
+        """
+        Buffer one roll made in `room`. `roller` is the character who rolled,
+        or just their name.
+        """
+        if not room.id:
+            return
+        roller_id = getattr(roller, 'id', None)
+        self._pending.append(RollLog(
+            room_id=room.id,
+            roller_id=roller_id,
+            roller_name=str(getattr(roller, 'key', roller) or '')[:255],
+            timestamp=timezone.now(),
+            description=str(description or ''),
+            result=str(result or ''),
+            seed=seed,
+        ))
+        if len(self._pending) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered rolls.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        # A roller deleted meanwhile keeps their roll, by name only
+        rollers = {entry.roller_id for entry in pending} - {None}
+        if rollers:
+            live = set(ObjectDB.objects.filter(id__in=rollers).values_list('id', flat=True))
+            for entry in pending:
+                if entry.roller_id not in live:
+                    entry.roller_id = None
+        # A deleted room's rolls are dropped, and only those
+        failed = bulk_insert(RollLog, pending, foreign_keys=('room',))
+        if failed:
+            logger.log_err(f"Could not write {len(failed)} of {len(pending)} roll log entries.")
+
+    def for_room(self, room):
+        """
+        Return the rolls made in `room`, newest first.
+        """
+        self.flush()
+        return RollLog.objects.filter(room_id=room.id).order_by('-timestamp', '-id')
+
+    def for_roller(self, character):
+        """
+        Return the rolls `character` made anywhere, newest first.
+        """
+        self.flush()
+        return RollLog.objects.filter(roller_id=character.id).order_by('-timestamp', '-id')
+
+    def prune(self, keep_days=KEEP_DAYS):
+        """
+        Delete rolls older than `keep_days`. Returns how many were removed.
+        """
+        self.flush()
+        cutoff = timezone.now() - timedelta(days=keep_days)
+        removed = 0
+        while True:
+            stale = list(RollLog.objects.filter(timestamp__lt=cutoff).values_list('id', flat=True)[:PRUNE_CHUNK])
+            if not stale:
+                return removed
+            RollLog.objects.filter(id__in=stale).delete()
+            removed += len(stale)
+
+
+ROLL_LOG = RollLogWriter()
+
+
+class RollLogScript(DefaultScript):
+    """
+    Writes buffered rolls every few seconds and prunes old ones daily.
+    """
+
+    def at_script_creation(self):
+        self.key = SCRIPT_KEY
+        self.desc = "Writes buffered roll log entries"
+        self.interval = 10
+        self.persistent = True
+
+    def at_repeat(self):
+        ROLL_LOG.flush()
+        now = timezone.now()
+        last = self.db.last_pruned
+        if not last or now - last > timedelta(days=1):
+            removed = ROLL_LOG.prune()
+            self.db.last_pruned = now
+            if removed:
+                logger.log_info(f"Roll log: removed {removed} rolls older than {KEEP_DAYS} days.")
+
+    def at_stop(self):
+        ROLL_LOG.flush()
+
+
+def init_roll_log_script():
+    try:
+        script = ScriptDB.objects.get(db_key=SCRIPT_KEY)
+    except ScriptDB.DoesNotExist:
+        script = create_script(RollLogScript, key=SCRIPT_KEY)
+    except ScriptDB.MultipleObjectsReturned:
+        scripts = ScriptDB.objects.filter(db_key=SCRIPT_KEY)
+        script = scripts.first()
+        for extra in scripts[1:]:
+            extra.delete()
+
+    if script and not script.is_active:
+        script.start()
+    return script
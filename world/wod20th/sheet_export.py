@@ -0,0 +1,292 @@
+# world/wod20th/sheet_export.py
+"""
+Bulk export and import of character sheets as gzipped JSON Lines.
+
+An export is one record per character:
+
+    {"id": 12, "key": "Bob", "stats": {...}, "specialties": {...}}
+
+Characters are read CHUNK_SIZE at a time (their stats loaded together with
+load_many) and each record is written as soon as it is built, so memory use
+doesn't grow with the number of characters. The file is written under a
+.part name and renamed when complete.
+
+An import reads the file line by line and applies each chunk of records in
+one bulk write, every character's changes in a stat batch so they reach the
+ledger. Progress is saved to <file>.progress after each chunk; running the
+same import again resumes after the last finished chunk.
+
+Both run to completion from the management commands (export_wod20th_sheets,
+import_wod20th_sheets); +sheet/export runs an export in game, yielding to
+the server between chunks. The management commands pass flush=True to
+empty the idmapper cache after each chunk; the game never does, since
+scripts and buffers there hold characters that must stay the instances
+everyone else uses.
+"""
+import gzip
+import json
+import os
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from evennia.utils import logger
+from evennia.utils.idmapper.models import flush_cache
+from evennia.utils.utils import delay
+
+from world.wod20th.ledger import LEDGER
+from world.wod20th.stat_store import bulk_write, load_many
+
+# Characters read or written at a time
+CHUNK_SIZE = 500
+EXPORT_DIR = os.path.join(getattr(settings, 'GAME_DIR', '.'), 'server', 'exports')
+
+
+def default_export_path():
+    """
+    Return a timestamped path in EXPORT_DIR for a new export.
+    """
+    return os.path.join(EXPORT_DIR, f"sheets-{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz")
+
+
+def sheet_record(character):
+    """
+    Return the export record of one character.
+    """
+    return {
+        'id': character.id,
+        'key': character.key,
+        'stats': character.stats.all().copy(),
+        'specialties': character.attributes.get('specialties') or {},
+    }
+
+
+class SheetExport:
+    """
+    One export of every character's sheet to `path`. Call run() to export
+    in one go, start() to export a chunk per reactor turn, or begin(),
+    write_chunk() until it returns False, then finish(). With `flush`, the
+    idmapper cache is emptied after each chunk; only use it outside the
+    running game.
+    """
+
+    def __init__(self, path=None, chunk_size=CHUNK_SIZE, on_finish=None, flush=False):
+        self.path = path or default_export_path()
+        self.chunk_size = max(chunk_size, 1)
+        self.on_finish = on_finish
+        self.flush = flush
+        self.ids = []
+        self.position = 0
+        self.written = 0
+        self.errors = 0
+        self.started = None
+        self._file = None
+
+    def begin(self):
+        """
+        List the characters to export and open the output file.
+        """
+        from typeclasses.characters import Character
+
+        self.started = time.time()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.ids = list(Character.objects.all_family().order_by('id').values_list('id', flat=True))
+        self._file = gzip.open(self.path + '.part', 'wt', encoding='utf-8')
+
+    def run(self):
+        """
+        Export every character now. Returns the finished file's path.
+        """
+        self.begin()
+        try:
+            while self.write_chunk():
+                pass
+        except Exception:
+            self._file.close()
+            raise
+        return self.finish()
+
+    def start(self):
+        """
+        Export a chunk at a time, giving the server a turn between chunks.
+        """
+        self.begin()
+        self._next_chunk()
+
+    def _next_chunk(self):
+        try:
+            more = self.write_chunk()
+        except Exception:
+            logger.log_trace(f"Sheet export to {self.path} failed.")
+            self._file.close()
+            return
+        if more:
+            delay(0, self._next_chunk)
+        else:
+            self.finish()
+
+    def write_chunk(self):
+        """
+        Write the next chunk of characters. Returns False when none are left.
+        """
+        from typeclasses.characters import Character
+
+        chunk = self.ids[self.position:self.position + self.chunk_size]
+        if not chunk:
+            return False
+        self.position += len(chunk)
+        characters = list(Character.objects.all_family().filter(id__in=chunk).order_by('id'))
+        load_many(characters)
+        for character in characters:
+            try:
+                line = json.dumps(sheet_record(character), separators=(',', ':'), default=str)
+            except Exception:
+                self.errors += 1
+                logger.log_trace(f"Sheet export: could not write {character} (#{character.id}).")
+                continue
+            self._file.write(line + '\n')
+            self.written += 1
+        if self.flush:
+            # Let the chunk's characters go before loading the next
+            flush_cache()
+        return True
+
+    def finish(self):
+        """
+        Close the file and move it into place. Returns its path.
+        """
+        self._file.close()
+        os.replace(self.path + '.part', self.path)
+        if self.on_finish:
+            self.on_finish(self)
+        return self.path
+
+    def summary(self):
+        elapsed = time.time() - (self.started or time.time())
+        text = f"Exported {self.written} sheets to {self.path} in {elapsed:.1f}s."
+        if self.errors:
+            text += f" {self.errors} could not be written; see the server log."
+        return text
+
+
+def _progress_path(path):
+    return path + '.progress'
+
+
+def read_progress(path):
+    """
+    Return how many lines of `path` a previous import finished, or 0.
+    """
+    try:
+        with open(_progress_path(path)) as handle:
+            return int(json.load(handle).get('lines', 0))
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _save_progress(path, lines):
+    with open(_progress_path(path), 'w') as handle:
+        json.dump({'lines': lines, 'updated': timezone.now().isoformat()}, handle)
+
+
+class SheetImport:
+    """
+    One import of an export file. Records are matched to characters by id,
+    or by exact key when `match` is 'key'. `flush` is as for SheetExport.
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE, actor=None, match='id', resume=True, dry_run=False,
+                 flush=False):
+        self.path = path
+        self.chunk_size = max(chunk_size, 1)
+        self.flush = flush
+        self.actor = actor
+        self.match = match
+        self.resume = resume
+        self.dry_run = dry_run
+        self.skipped = 0
+        self.applied = 0
+        self.missing = []
+        self.errors = 0
+
+    def records(self, start=0):
+        """
+        Yield (line number, record) for every line after `start`.
+        """
+        with gzip.open(self.path, 'rt', encoding='utf-8') as handle:
+            for number, line in enumerate(handle, 1):
+                if number <= start or not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    self.errors += 1
+                    logger.log_err(f"Sheet import: line {number} of {self.path} isn't valid JSON.")
+
+    def run(self, on_chunk=None):
+        """
+        Apply every record not applied by an earlier run. `on_chunk(lines)`
+        is called after each chunk with the last line number finished.
+        """
+        start = read_progress(self.path) if self.resume else 0
+        self.skipped = start
+        chunk = []
+        last = start
+        for number, record in self.records(start):
+            chunk.append(record)
+            last = number
+            if len(chunk) >= self.chunk_size:
+                self.apply_chunk(chunk)
+                self._finished(last, on_chunk)
+                chunk = []
+        if chunk:
+            self.apply_chunk(chunk)
+            self._finished(last, on_chunk)
+        return self.applied
+
+    def _finished(self, lines, on_chunk):
+        if not self.dry_run:
+            LEDGER.flush()
+            _save_progress(self.path, lines)
+        if self.flush:
+            flush_cache()
+        if on_chunk:
+            on_chunk(lines)
+
+    def _characters(self, records):
+        from typeclasses.characters import Character
+
+        characters = Character.objects.all_family()
+        if self.match == 'key':
+            found = {}
+            for character in characters.filter(db_key__in=[record.get('key') for record in records]):
+                # Ambiguous names aren't matched
+                found[character.key] = None if character.key in found else character
+            return {record.get('key'): found.get(record.get('key')) for record in records}
+        found = {character.id: character for character in
+                 characters.filter(id__in=[record.get('id') for record in records])}
+        return {record.get('id'): found.get(record.get('id')) for record in records}
+
+    def apply_chunk(self, records):
+        matched = self._characters(records)
+        load_many([character for character in matched.values() if character])
+        reason = f"sheet import from {os.path.basename(self.path)}"
+        with bulk_write():
+            for record in records:
+                character = matched.get(record.get(self.match))
+                if not character:
+                    self.missing.append(record.get('key') or record.get('id'))
+                    continue
+                if self.dry_run:
+                    self.applied += 1
+                    continue
+                try:
+                    with character.stats.batch(actor=self.actor, reason=reason):
+                        character.stats.replace(record.get('stats') or {})
+                    if 'specialties' in record:
+                        character.db.specialties = record['specialties']
+                except Exception:
+                    self.errors += 1
+                    logger.log_trace(f"Sheet import: could not apply the record for {character}.")
+                    continue
+                self.applied += 1
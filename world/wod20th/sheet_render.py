@@ -0,0 +1,385 @@
+# world/wod20th/sheet_render.py
+"""
+The +sheet renderer.
+
+Rendering starts by taking one SheetSnapshot of the character: the stats
+dict flattened to {(category, stat_type, name): (perm, temp)} plus the few
+Attributes the sheet shows (damage, specialties, approval). Everything
+after that reads the snapshot, never the character. What to show for a
+splat (the identity rows and where each value comes from, the ability
+columns, the power sections, the pools) is worked out once per SplatTemplate
+into a SheetLayout and reused by every render with that template.
+
+    render_sheet(take_snapshot(character, viewer))
+"""
+from functools import lru_cache
+from types import MappingProxyType
+
+from world.wod20th.splat_templates import ATTRIBUTE_TYPES, template_for
+from world.wod20th.utils.damage import format_health_levels
+from world.wod20th.utils.formatting import format_stat, header, footer, divider
+from world.wod20th.utils.lock_cache import check_lock
+
+SHEET_WIDTH = 78
+COLUMN_WIDTH = 25
+
+MAGE_SPHERES = (
+    'Correspondence', 'Entropy', 'Forces', 'Life', 'Matter', 'Mind', 'Prime', 'Spirit', 'Time', 'Data',
+    'Primal Utility', 'Dimensional Science',
+)
+
+# Where an identity field's value is looked for, first non-empty wins
+IDENTITY_SOURCES = (('identity', 'personal'), ('identity', 'lineage'), ('identity', 'other'))
+IDENTITY_OVERRIDES = {
+    'Nature': (('archetype', 'personal', 'Nature Archetype'),),
+    'Demeanor': (('archetype', 'personal', 'Demeanor Archetype'),),
+}
+SPLAT_KEY = ('other', 'splat', 'Splat')
+VIRTUE_NAMES = ('Conscience', 'Self-Control', 'Courage')
+
+
+class SheetSnapshot:
+    """
+    An immutable, flattened copy of everything the sheet shows about one
+    character, taken at the start of a render.
+    """
+
+    __slots__ = ('template', 'display_name', 'values', 'groups', 'effective', 'specialties',
+                 'health_levels', 'damage', 'approved', '_visible', '_frozen')
+
+    def __init__(self, template, display_name, stats, effective, specialties, health_levels, damage,
+                 approved, visible):
+        self.template = template
+        self.display_name = display_name
+        values = {}
+        groups = {}
+        for category, types in stats.items():
+            if not isinstance(types, dict):
+                continue
+            for stat_type, names in types.items():
+                if not isinstance(names, dict):
+                    continue
+                group = groups.setdefault((category, stat_type), [])
+                for name, leaf in names.items():
+                    if isinstance(leaf, dict):
+                        value = (leaf.get('perm'), leaf.get('temp'))
+                    else:
+                        value = (leaf, None)
+                    values[(category, stat_type, name)] = value
+                    group.append((name,) + value)
+        self.values = MappingProxyType(values)
+        self.groups = MappingProxyType({key: tuple(group) for key, group in groups.items()})
+        self.effective = MappingProxyType(effective)
+        self.specialties = MappingProxyType({
+            name: tuple(entries) for name, entries in (specialties or {}).items()
+        })
+        self.health_levels = health_levels
+        self.damage = damage
+        self.approved = approved
+        self._visible = visible
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError("SheetSnapshot is immutable")
+        object.__setattr__(self, name, value)
+
+    def has(self, key):
+        return key in self.values
+
+    def perm(self, key, default=None):
+        value = self.values.get(key)
+        return default if value is None else value[0]
+
+    def temp(self, key, default=None):
+        value = self.values.get(key)
+        return default if value is None else value[1]
+
+    def group(self, category, stat_type):
+        """
+        Return ((name, perm, temp), ...) for one stat type, in sheet order.
+        """
+        return self.groups.get((category, stat_type), ())
+
+    def category(self, category):
+        """
+        Return the (name, perm, temp) entries of every type in a category.
+        """
+        return tuple(entry for (group_category, _), group in self.groups.items()
+                     if group_category == category for entry in group)
+
+    @property
+    def splat(self):
+        return self.perm(SPLAT_KEY, '') or ''
+
+    def visible(self, spec):
+        return self._visible(spec)
+
+
+def take_snapshot(character, viewer):
+    """
+    Read everything the sheet needs from `character` once.
+    """
+    template = template_for(character)
+    stats = character.stats.all()
+    overlays = character.overlays
+
+    effective = {}
+    for stat_type, names in ATTRIBUTE_TYPES.items():
+        for name in names:
+            key = ('attributes', stat_type, name)
+            leaf = stats.get('attributes', {}).get(stat_type, {}).get(name)
+            perm, temp = (leaf.get('perm'), leaf.get('temp')) if isinstance(leaf, dict) else (None, None)
+            value = temp if temp not in (None, 0) else perm
+            modifier = overlays.modifier(*key)
+            if modifier and (value is None or type(value) is int):
+                value = (value or 0) + modifier
+            effective[key] = value
+
+    def visible(spec):
+        stat = spec.stat
+        return not (stat and stat.lock_string) or check_lock(character, stat.lock_string, 'view',
+                                                              accessed_obj=stat, default=True)
+
+    attributes = character.attributes
+    return SheetSnapshot(
+        template=template,
+        display_name=character.get_display_name(viewer),
+        stats=stats,
+        effective=effective,
+        specialties=attributes.get('specialties'),
+        health_levels=character.derived['health_levels'],
+        damage=(attributes.get('agg') or 0, attributes.get('lethal') or 0, attributes.get('bashing') or 0),
+        approved=attributes.get('approved'),
+        visible=visible,
+    )
+
+
+class SheetLayout:
+    """
+    The parts of the sheet fixed by a template, worked out once.
+    """
+
+    __slots__ = ('identity', 'attributes', 'abilities', 'secondary', 'renown', 'pools')
+
+    def __init__(self, template):
+        # (field, label, keys to look in)
+        identity = []
+        for field in list(template.identity) + ['Splat']:
+            label = 'Subfaction' if field == 'Traditions Subfaction' else field
+            keys = IDENTITY_OVERRIDES.get(field) or tuple(
+                source + (field,) for source in IDENTITY_SOURCES
+            ) + ((SPLAT_KEY,) if field == 'Splat' else ())
+            identity.append((field, label, keys))
+        self.identity = tuple(identity)
+        # Rows of (physical, social, mental) attribute keys
+        self.attributes = tuple(zip(*(
+            tuple(('attributes', stat_type, name) for name in ATTRIBUTE_TYPES[stat_type])
+            for stat_type in ('physical', 'social', 'mental')
+        )))
+        self.abilities = tuple(
+            (stat_type, template.stats_of('abilities', stat_type))
+            for stat_type in ('talent', 'skill', 'knowledge')
+        )
+        self.secondary = tuple(
+            (stat_type, template.stats_of('secondary_abilities', stat_type))
+            for stat_type in ('secondary_talent', 'secondary_skill', 'secondary_knowledge')
+        )
+        self.renown = tuple(template.renown)
+        self.pools = template.pool_names
+
+
+@lru_cache(maxsize=128)
+def sheet_layout(template):
+    """
+    Return the SheetLayout for a template. Templates are rebuilt when the
+    catalog changes, so a new template gets a new layout.
+    """
+    return SheetLayout(template)
+
+
+def _dotted(label, value, width=38):
+    stat_str = f" {label}"
+    value_str = f"{value}"
+    dots = "." * (width - len(stat_str) - len(value_str) - 1)
+    return f"{stat_str}{dots}{value_str}"
+
+
+def _column(formatted, last):
+    # The last of three columns is indented one space and narrower
+    return " " + formatted.ljust(22) if last else formatted.ljust(COLUMN_WIDTH)
+
+
+def _section_columns(titles):
+    return (" " + divider(titles[0], width=COLUMN_WIDTH, fillchar=" ") + " "
+            + divider(titles[1], width=COLUMN_WIDTH, fillchar=" ") + " "
+            + divider(titles[2], width=COLUMN_WIDTH, fillchar=" ") + "\n")
+
+
+def _rows(columns):
+    depth = max(len(column) for column in columns)
+    return [column + [""] * (depth - len(column)) for column in columns]
+
+
+def _render_identity(snapshot, layout):
+    fields = []
+    for field, label, keys in layout.identity:
+        if field == 'Traditions Subfaction' and not snapshot.perm(('identity', 'lineage', 'Tradition'), ''):
+            # The subfaction only applies once a tradition has been chosen
+            continue
+        value = ''
+        for key in keys:
+            value = snapshot.perm(key, '')
+            if value:
+                break
+        fields.append(_dotted(label, value))
+    lines = []
+    for i in range(0, len(fields), 2):
+        lines.append("  ".join(fields[i:i + 2]) + "\n")
+    return ''.join(lines)
+
+
+def _render_attributes(snapshot, layout):
+    lines = []
+    for row in layout.attributes:
+        cells = []
+        for position, key in enumerate(row):
+            perm = snapshot.perm(key) if snapshot.has(key) else snapshot.template.defaults.get(key)
+            formatted = format_stat(key[2], perm, default=1, tempvalue=snapshot.effective.get(key))
+            cells.append(" " + formatted.ljust(22) if position == 2 else formatted + " ")
+        lines.append(''.join(cells) + "\n")
+    return ''.join(lines)
+
+
+def _ability_value(snapshot, spec, category):
+    key = (category, spec.stat_type, spec.name)
+    return snapshot.perm(key) if snapshot.has(key) else spec.default
+
+
+def _render_abilities(snapshot, layout):
+    columns = []
+    for position, (stat_type, specs) in enumerate(layout.abilities):
+        last = position == 2
+        column = []
+        shown = [spec for spec in specs if snapshot.visible(spec)]
+        for spec in shown:
+            column.append(_column(format_stat(spec.name, _ability_value(snapshot, spec, 'abilities'), default=0), last))
+        for spec in shown:
+            for specialty in snapshot.specialties.get(spec.name, ()):
+                column.append(_column(format_stat(f"`{specialty}", None, default=0), last))
+        columns.append(column)
+    return ''.join(f"{talent}{skill}{knowledge}\n" for talent, skill, knowledge in zip(*_rows(columns)))
+
+
+def _render_secondary(snapshot, layout):
+    columns = []
+    for position, (stat_type, specs) in enumerate(layout.secondary):
+        columns.append([
+            _column(format_stat(spec.name, _ability_value(snapshot, spec, 'secondary_abilities'), default=0),
+                    position == 2)
+            for spec in specs
+        ])
+    return ''.join(f"{talent}{skill}{knowledge}\n" for talent, skill, knowledge in zip(*_rows(columns)))
+
+
+def _group_lines(snapshot, category, stat_type):
+    return [format_stat(name, 0 if perm is None else perm, default=0, width=COLUMN_WIDTH)
+            for name, perm, _ in snapshot.group(category, stat_type)]
+
+
+def _render_powers(snapshot, layout):
+    splat = snapshot.splat
+    powers = []
+    if splat == 'Mage':
+        powers.append(divider("Spheres", width=COLUMN_WIDTH, color="|b"))
+        for sphere in MAGE_SPHERES:
+            value = snapshot.perm(('powers', 'sphere', sphere), 0)
+            powers.append(format_stat(sphere, value, default=0, width=COLUMN_WIDTH))
+    elif splat == 'Vampire':
+        powers.append(divider("Disciplines", width=COLUMN_WIDTH, color="|b"))
+        powers += _group_lines(snapshot, 'powers', 'discipline')
+    elif splat == 'Changeling':
+        powers.append(divider("Arts", width=COLUMN_WIDTH, color="|b"))
+        powers += _group_lines(snapshot, 'powers', 'art')
+        powers.append(divider("Realms", width=COLUMN_WIDTH, color="|b"))
+        powers += _group_lines(snapshot, 'powers', 'realm')
+    elif splat == 'Shifter':
+        powers.append(divider("Gifts", width=COLUMN_WIDTH, color="|b"))
+        powers += _group_lines(snapshot, 'powers', 'gift')
+        powers.append(divider("Renown", width=COLUMN_WIDTH, color="|b"))
+        for renown in layout.renown:
+            value = snapshot.perm(('advantages', 'renown', renown), 0)
+            powers.append(format_stat(renown, value, default=0, width=COLUMN_WIDTH))
+    return powers
+
+
+def _render_advantages(snapshot, layout):
+    advantages = [divider("Backgrounds", width=COLUMN_WIDTH, color="|b")]
+    advantages += _group_lines(snapshot, 'backgrounds', 'background')
+
+    advantages.append(divider("Merits & Flaws", width=COLUMN_WIDTH, color="|b"))
+    for category in ('merits', 'flaws'):
+        for name, perm, _ in snapshot.category(category):
+            advantages.append(format_stat(name, perm, width=COLUMN_WIDTH))
+
+    advantages.append(divider("Pools", width=COLUMN_WIDTH, color="|b"))
+    pools = list(layout.pools)
+    if snapshot.splat.lower() in ('vampire', 'mortal'):
+        pools += [name for name, _, _ in snapshot.group('virtues', 'moral')]
+    for pool in pools:
+        if pool == 'Arete':
+            advantages.append(format_stat(pool, snapshot.perm(('other', 'advantage', 'Arete'), 0), width=COLUMN_WIDTH))
+        elif pool == 'Paradox':
+            temp = snapshot.temp(('pools', 'dual', 'Paradox'), 0)
+            advantages.append(format_stat(pool, temp, width=COLUMN_WIDTH, default=0))
+        elif pool in VIRTUE_NAMES:
+            advantages.append(format_stat(pool, snapshot.perm(('virtues', 'moral', pool), 0), width=COLUMN_WIDTH))
+        else:
+            key = ('pools', 'dual', pool)
+            perm = snapshot.perm(key, 0)
+            temp = snapshot.temp(key, perm) if snapshot.has(key) else perm
+            value = f"{perm}({temp})" if perm != temp else perm
+            advantages.append(format_stat(pool, value, width=COLUMN_WIDTH))
+    return advantages
+
+
+def _render_status(snapshot):
+    status = [divider("Health & Status", width=COLUMN_WIDTH, color="|b")]
+    agg, lethal, bashing = snapshot.damage
+    health = format_health_levels(
+        snapshot.health_levels, snapshot.perm(('other', 'other', 'Splat')), agg, lethal, bashing
+    )
+    status.extend((" " * 3 + line).ljust(COLUMN_WIDTH).strip() for line in health)
+    return status
+
+
+def render_sheet(snapshot):
+    """
+    Return the sheet text for a snapshot.
+    """
+    layout = sheet_layout(snapshot.template)
+    parts = [
+        header(f"Character Sheet for:|n {snapshot.display_name}"),
+        header("Identity", width=SHEET_WIDTH, color="|y"),
+        _render_identity(snapshot, layout),
+        header("Attributes", width=SHEET_WIDTH, color="|y"),
+        _section_columns(("Physical", "Social", "Mental")),
+        _render_attributes(snapshot, layout),
+        header("Abilities", width=SHEET_WIDTH, color="|y"),
+        _section_columns(("Talents", "Skills", "Knowledges")),
+        _render_abilities(snapshot, layout),
+        header("Secondary Abilities", width=SHEET_WIDTH, color="|y"),
+        _section_columns(("Talents", "Skills", "Knowledges")),
+        _render_secondary(snapshot, layout),
+        header("Advantages", width=SHEET_WIDTH, color="|y"),
+    ]
+    columns = _rows([_render_powers(snapshot, layout), _render_advantages(snapshot, layout),
+                     _render_status(snapshot)])
+    for power, advantage, status in zip(*columns):
+        parts.append(f"{power.strip().ljust(COLUMN_WIDTH)} {advantage.strip().ljust(COLUMN_WIDTH)} "
+                     f"{status.strip().ljust(COLUMN_WIDTH)}\n")
+    if not snapshot.approved:
+        parts.append(footer())
+        parts.append(header("Unapproved Character", width=SHEET_WIDTH, color="|y"))
+    parts.append(footer())
+    return ''.join(str(part) for part in parts)
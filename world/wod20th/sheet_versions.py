@@ -0,0 +1,155 @@
+# world/wod20th/sheet_versions.py
+"""
+Versioned sheets: a numbered copy of a character's sheet each time staff
+approve or edit it, kept small by storing diffs.
+
+Approval stores the whole sheet as a base version. Every later version
+stores only the stats that differ from its base, as a nested
+{category: {stat_type: {name: leaf}}} dict where a leaf of None means the
+stat was removed. Any version is therefore rebuilt from two rows, however
+many edits came before it. Once a version's diff would hold more than
+REBASE_FRACTION of the sheet, a fresh base is stored instead.
+
+    record_version(character, actor=caller, reason="+stats")
+    sheet_at(character, 12)
+    diff_sheets(sheet_at(character, approval_version(character)), current_sheet(character))
+"""
+import copy
+
+from django.db.models import Max
+from django.utils import timezone
+
+from world.wod20th.models import SheetVersion
+
+# Store a new base once a diff covers this much of the sheet
+REBASE_FRACTION = 0.5
+
+
+def current_sheet(character):
+    """
+    Return a detached deep copy of the character's stats; changing it
+    doesn't touch the stat handler's mirror.
+    """
+    return copy.deepcopy(character.stats.all())
+
+
+def _count(sheet):
+    return sum(
+        len(names) for types in sheet.values() if isinstance(types, dict)
+        for names in types.values() if isinstance(names, dict)
+    )
+
+
+def diff_sheets(old, new):
+    """
+    Return the stats of `new` that differ from `old`, as a nested dict with
+    None for stats `new` doesn't have.
+    """
+    diff = {}
+    for category in old.keys() | new.keys():
+        old_types, new_types = old.get(category) or {}, new.get(category) or {}
+        for stat_type in old_types.keys() | new_types.keys():
+            old_names, new_names = old_types.get(stat_type) or {}, new_types.get(stat_type) or {}
+            if old_names == new_names:
+                continue
+            for name in old_names.keys() | new_names.keys():
+                leaf = new_names.get(name)
+                if old_names.get(name) != leaf:
+                    diff.setdefault(category, {}).setdefault(stat_type, {})[name] = leaf
+    return diff
+
+
+def apply_diff(sheet, diff):
+    """
+    Return a copy of `sheet` with `diff` applied.
+    """
+    result = {category: {stat_type: dict(names) for stat_type, names in types.items()}
+              for category, types in sheet.items()}
+    for category, types in diff.items():
+        for stat_type, names in types.items():
+            for name, leaf in names.items():
+                if leaf is None:
+                    result.get(category, {}).get(stat_type, {}).pop(name, None)
+                else:
+                    result.setdefault(category, {}).setdefault(stat_type, {})[name] = leaf
+    return result
+
+
+def _base(character, version):
+    return SheetVersion.objects.get(character_id=character.id, version=version)
+
+
+def sheet_at(character, version):
+    """
+    Return the character's sheet as of `version`, or None if there is no
+    such version.
+    """
+    try:
+        row = SheetVersion.objects.get(character_id=character.id, version=version)
+    except SheetVersion.DoesNotExist:
+        return None
+    if row.is_base:
+        return row.stats
+    return apply_diff(_base(character, row.base_version).stats, row.stats)
+
+
+def versions(character):
+    """
+    Return the character's versions, newest first.
+    """
+    return SheetVersion.objects.filter(character_id=character.id).order_by('-version')
+
+
+def approval_version(character):
+    """
+    Return the number of the version stored when the character was last
+    approved, or None.
+    """
+    return SheetVersion.objects.filter(character_id=character.id, approval=True).aggregate(
+        Max('version'))['version__max']
+
+
+def record_version(character, actor=None, reason='', approval=False):
+    """
+    Store the character's current sheet as a new version, unless it is the
+    same as the latest one. Characters get versions from their first
+    approval on; before that, only approval=True stores anything. Returns
+    the new SheetVersion or None.
+    """
+    latest = versions(character).first()
+    if latest is None and not approval:
+        return None
+
+    sheet = current_sheet(character)
+    fields = dict(
+        character_id=character.id,
+        version=(latest.version + 1) if latest else 1,
+        timestamp=timezone.now(),
+        approval=approval,
+        actor=str(actor or ''),
+        reason=reason or '',
+    )
+    if latest is not None:
+        base_version = latest.version if latest.is_base else latest.base_version
+        base = latest.stats if latest.is_base else _base(character, base_version).stats
+        diff = diff_sheets(base, sheet)
+        if not approval and diff == ({} if latest.is_base else latest.stats):
+            return None
+        if not approval and _count(diff) <= REBASE_FRACTION * max(_count(sheet), 1):
+            return SheetVersion.objects.create(base_version=base_version, stats=diff, **fields)
+    return SheetVersion.objects.create(stats=sheet, **fields)
+
+
+def restore_version(character, version, actor=None):
+    """
+    Put the character's stats back as they were at `version` and record
+    that as a new version. Returns False if there is no such version.
+    """
+    sheet = sheet_at(character, version)
+    if sheet is None:
+        return False
+    reason = f"restored sheet version {version}"
+    with character.stats.batch(actor=actor, reason=reason):
+        character.stats.replace(sheet)
+    record_version(character, actor=actor, reason=reason)
+    return True
@@ -0,0 +1,22 @@
+# world/wod20th/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .catalog import STAT_CATALOG
+from .models import Stat
+
+
+@receiver(post_save, sender=Stat)
+def refresh_stat_catalog(sender, instance, **kwargs):
+    """
+    Keep the in-memory catalog in step with saved Stat rows.
+    """
+    STAT_CATALOG.refresh(instance)
+
+
+@receiver(post_delete, sender=Stat)
+def discard_from_stat_catalog(sender, instance, **kwargs):
+    """
+    Drop deleted Stat rows from the in-memory catalog.
+    """
+    STAT_CATALOG.discard(instance)
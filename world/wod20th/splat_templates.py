@@ -0,0 +1,297 @@
+# world/wod20th/splat_templates.py
+"""
+Precompiled character templates, one per splat and subtype.
+
+Which stats, pools and identity fields apply to a character used to be worked
+out on every call by chargen, the sheet and +stats, each with its own copy of
+the rules. compile_templates() folds sheet_defaults, the shifter tables in
+models.py and the stat catalog into immutable SplatTemplate objects once;
+they are rebuilt only when the catalog version changes.
+
+    template = template_for(character)
+    template.identity          # ordered identity fields for the sheet
+    template.pools             # PoolSpec tuple, defaults included
+    template.stats_of('powers', 'discipline')
+"""
+from collections import namedtuple
+from threading import RLock
+from types import MappingProxyType
+
+from world.wod20th.catalog import STAT_CATALOG
+from world.wod20th.models import SHIFTER_IDENTITY_STATS, SHIFTER_RENOWN, CLAN, MAGE_FACTION, KITH
+from world.wod20th.sheet_defaults import ATTRIBUTES
+
+StatSpec = namedtuple('StatSpec', ['name', 'category', 'stat_type', 'default', 'values', 'stat'])
+PoolSpec = namedtuple('PoolSpec', ['category', 'stat_type', 'name', 'perm', 'temp'])
+
+SPLATS = ('Mortal', 'Vampire', 'Shifter', 'Mage', 'Changeling')
+
+GAME_LINES = {
+    'Vampire': 'Vampire: The Masquerade',
+    'Shifter': 'Werewolf: The Apocalypse',
+    'Mage': 'Mage: The Ascension',
+    'Changeling': 'Changeling: The Dreaming',
+}
+
+# The identity stat holding each splat's subtype, and the subtypes we compile
+SUBTYPE_STATS = {
+    'Vampire': ('Clan', CLAN),
+    'Shifter': ('Type', SHIFTER_IDENTITY_STATS.keys()),
+    'Mage': ('Mage Faction', MAGE_FACTION),
+    'Changeling': ('Kith', KITH),
+}
+
+COMMON_IDENTITY = ('Full Name', 'Date of Birth', 'Concept')
+
+SPLAT_IDENTITY = {
+    'Vampire': ('Clan', 'Date of Embrace', 'Generation', 'Sire', 'Enlightenment'),
+    'Shifter': ('Type',),
+    'Mage': ('Essence', 'Mage Faction'),
+    'Changeling': ('Kith', 'Seeming', 'House'),
+}
+
+MAGE_FACTION_IDENTITY = {
+    'Traditions': ('Tradition', 'Traditions Subfaction'),
+    'Technocracy': ('Convention', 'Methodology'),
+    'Nephandi': ('Nephandi Faction',),
+}
+
+POWER_TYPES = {
+    'Vampire': (('powers', 'discipline'),),
+    'Shifter': (('powers', 'gift'),),
+    'Mage': (('powers', 'sphere'),),
+    'Changeling': (('powers', 'art'), ('powers', 'realm')),
+}
+
+ATTRIBUTE_TYPES = {
+    'physical': ('Strength', 'Dexterity', 'Stamina'),
+    'social': ('Charisma', 'Manipulation', 'Appearance'),
+    'mental': ('Perception', 'Intelligence', 'Wits'),
+}
+
+WILLPOWER = PoolSpec('pools', 'dual', 'Willpower', 1, 1)
+
+SPLAT_POOLS = {
+    'Vampire': (
+        PoolSpec('pools', 'dual', 'Blood', 10, 10),
+        PoolSpec('pools', 'moral', 'Road', 1, None),
+    ),
+    'Shifter': (
+        PoolSpec('pools', 'dual', 'Rage', 1, 1),
+        PoolSpec('pools', 'dual', 'Gnosis', 1, 1),
+    ),
+    'Mage': (
+        PoolSpec('other', 'advantage', 'Arete', 1, None),
+        PoolSpec('pools', 'dual', 'Quintessence', 1, 1),
+        PoolSpec('pools', 'dual', 'Paradox', 0, 0),
+    ),
+    'Changeling': (
+        PoolSpec('pools', 'dual', 'Glamour', 1, 1),
+        PoolSpec('pools', 'dual', 'Banality', 5, 5),
+    ),
+}
+
+# Subtypes whose pools differ from their splat's
+SUBTYPE_POOLS = {
+    ('Shifter', 'Ananasi'): (
+        PoolSpec('pools', 'dual', 'Gnosis', 1, 1),
+        PoolSpec('pools', 'dual', 'Blood', 10, 10),
+    ),
+}
+
+# Stat groups every splat uses, in sheet order
+COMMON_STAT_TYPES = (
+    ('attributes', 'physical'), ('attributes', 'social'), ('attributes', 'mental'),
+    ('abilities', 'talent'), ('abilities', 'skill'), ('abilities', 'knowledge'),
+    ('secondary_abilities', 'secondary_talent'),
+    ('secondary_abilities', 'secondary_skill'),
+    ('secondary_abilities', 'secondary_knowledge'),
+    ('backgrounds', 'background'),
+    ('virtues', 'moral'),
+    ('identity', 'lineage'),
+)
+
+
+class SplatTemplate:
+    """
+    Everything that is fixed by a character's splat and subtype. Instances
+    are immutable and shared; never modify the returned tuples or mappings.
+    """
+
+    __slots__ = ('splat', 'subtype', 'identity', 'pools', 'renown', 'power_types',
+                 'stats', 'defaults', 'values', '_by_type', '_names')
+
+    def __init__(self, splat, subtype, identity, pools, renown, power_types, stats):
+        self.splat = splat
+        self.subtype = subtype
+        self.identity = tuple(identity)
+        self.pools = tuple(pools)
+        self.renown = tuple(renown)
+        self.power_types = tuple(power_types)
+        self.stats = tuple(stats)
+
+        by_type = {}
+        for spec in self.stats:
+            by_type.setdefault((spec.category, spec.stat_type), []).append(spec)
+        self._by_type = MappingProxyType({key: tuple(specs) for key, specs in by_type.items()})
+        self.defaults = MappingProxyType(
+            {(spec.category, spec.stat_type, spec.name): spec.default for spec in self.stats}
+        )
+        self.values = MappingProxyType(
+            {(spec.category, spec.stat_type, spec.name): spec.values for spec in self.stats}
+        )
+        # Set last: once present, __setattr__ refuses further changes
+        self._names = frozenset(self.defaults)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, '_names'):
+            raise AttributeError("SplatTemplate is immutable")
+        object.__setattr__(self, name, value)
+
+    def __repr__(self):
+        return f"<SplatTemplate {self.splat}{'/' + self.subtype if self.subtype else ''}>"
+
+    @property
+    def pool_names(self):
+        return tuple(['Willpower'] + [pool.name for pool in self.pools])
+
+    def stats_of(self, category, stat_type):
+        """
+        Return the StatSpecs of one (category, stat_type), in sheet order.
+        """
+        return self._by_type.get((category, stat_type), ())
+
+    def powers(self):
+        """
+        Return the StatSpecs of every power type this splat uses.
+        """
+        return tuple(spec for key in self.power_types for spec in self.stats_of(*key))
+
+    def choices(self, name):
+        """
+        Return the allowed values of an identity stat, e.g. choices('Clan').
+        """
+        for spec in self.stats_of('identity', 'lineage'):
+            if spec.name == name:
+                return spec.values if isinstance(spec.values, tuple) else ()
+        return ()
+
+    def has_stat(self, category, stat_type, name):
+        return (category, stat_type, name) in self._names
+
+
+def _spec(stat):
+    values = stat.values
+    if isinstance(values, list):
+        values = tuple(values)
+    return StatSpec(stat.name, stat.category, stat.stat_type, stat.default, values, stat)
+
+
+def _stats_for(splat, category, stat_type):
+    """
+    Catalog stats of one type that apply to `splat`: everything not limited
+    to another splat, and for backgrounds, not from another game line.
+    """
+    game_line = GAME_LINES.get(splat)
+    specs = []
+    for stat in STAT_CATALOG.by_type(category, stat_type):
+        if stat.splat and stat.splat != splat:
+            continue
+        if (category == 'backgrounds' and stat.game_line in GAME_LINES.values()
+                and stat.game_line != game_line):
+            continue
+        specs.append(_spec(stat))
+    if category == 'attributes' and not specs:
+        # Fresh databases may not have the attribute rows yet
+        specs = [
+            StatSpec(name, category, stat_type, default, tuple(range(1, 6)), None)
+            for name, default in ATTRIBUTES.items()
+            if name in ATTRIBUTE_TYPES[stat_type]
+        ]
+    return specs
+
+
+def _compile(splat, subtype, common_specs):
+    identity = list(COMMON_IDENTITY)
+    identity += ['Seelie Legacy', 'Unseelie Legacy'] if splat == 'Changeling' else ['Nature', 'Demeanor']
+    identity += SPLAT_IDENTITY.get(splat, ())
+    renown = ()
+    if splat == 'Shifter' and subtype:
+        identity += SHIFTER_IDENTITY_STATS.get(subtype, [])
+        renown = SHIFTER_RENOWN.get(subtype, [])
+    elif splat == 'Mage' and subtype:
+        identity += MAGE_FACTION_IDENTITY.get(subtype, ())
+
+    stats = list(common_specs)
+    for category, stat_type in POWER_TYPES.get(splat, ()):
+        stats += _stats_for(splat, category, stat_type)
+
+    return SplatTemplate(
+        splat=splat,
+        subtype=subtype,
+        identity=identity,
+        pools=SUBTYPE_POOLS.get((splat, subtype), SPLAT_POOLS.get(splat, ())),
+        renown=renown,
+        power_types=POWER_TYPES.get(splat, ()),
+        stats=stats,
+    )
+
+
+def compile_templates():
+    """
+    Build every template from the current catalog.
+
+    Returns:
+        dict: {(splat, subtype or None): SplatTemplate}
+    """
+    templates = {}
+    for splat in SPLATS:
+        common_specs = [
+            spec for key in COMMON_STAT_TYPES for spec in _stats_for(splat, *key)
+        ]
+        templates[(splat, None)] = _compile(splat, None, common_specs)
+        _, subtypes = SUBTYPE_STATS.get(splat, (None, ()))
+        for subtype in sorted(subtypes):
+            templates[(splat, subtype)] = _compile(splat, subtype, common_specs)
+    return templates
+
+
+_lock = RLock()
+_templates = {}
+_templates_version = None
+
+
+def get_template(splat, subtype=None):
+    """
+    Return the template for a splat and optional subtype, falling back to
+    the splat's base template for unknown subtypes and to Mortal for
+    unknown splats.
+    """
+    global _templates, _templates_version
+    STAT_CATALOG.ensure_loaded()
+    if _templates_version != STAT_CATALOG.version:
+        with _lock:
+            if _templates_version != STAT_CATALOG.version:
+                _templates = compile_templates()
+                _templates_version = STAT_CATALOG.version
+
+    splat = (splat or '').strip().title() or 'Mortal'
+    return (_templates.get((splat, subtype))
+            or _templates.get((splat, None))
+            or _templates[('Mortal', None)])
+
+
+def template_for(character):
+    """
+    Return the template matching a character's current splat and subtype.
+    """
+    stats = character.db.stats or {}
+    if hasattr(character, 'get_splat'):
+        splat = character.get_splat()
+    else:
+        splat = stats.get('other', {}).get('splat', {}).get('Splat', {}).get('perm', '')
+    subtype_stat, _ = SUBTYPE_STATS.get((splat or '').title(), (None, ()))
+    subtype = None
+    if subtype_stat:
+        subtype = stats.get('identity', {}).get('lineage', {}).get(subtype_stat, {}).get('perm') or None
+    return get_template(splat, subtype)
@@ -0,0 +1,130 @@
+# world/wod20th/stat_schema.py
+"""
+Value types for character stats.
+
+A stat is numeric when the catalog lists whole numbers as its values, or,
+for stats missing from the catalog, when its category only holds ratings
+(attributes, abilities, pools, ...). Numeric stats are stored as ints:
+the stat handler converts numeric strings such as "3" when they are
+written, and refuses values that aren't numbers at all with
+StatValueError, whether they come through StatHandler.set or db.stats.
+Readers can rely on that instead of converting on every call.
+
+normalize_character converts what was stored before this was enforced;
+see the normalize_wod20th_stats management command.
+"""
+from collections.abc import Mapping
+from contextlib import nullcontext
+
+from world.wod20th.catalog import STAT_CATALOG
+
+# Categories whose stats are ratings when the catalog doesn't say otherwise
+NUMERIC_CATEGORIES = frozenset({
+    'attributes', 'abilities', 'secondary_abilities', 'advantages', 'backgrounds',
+    'powers', 'merits', 'flaws', 'virtues', 'pools',
+})
+
+_numeric = {}
+
+
+class StatValueError(ValueError):
+    """
+    Raised when a value can't be stored in a stat of its type.
+    """
+
+
+def _clear_cache(event, stat):
+    _numeric.clear()
+
+
+STAT_CATALOG.subscribe(_clear_cache)
+
+
+def _all_ints(values):
+    if isinstance(values, Mapping):
+        values = [value for options in values.values() if isinstance(options, list) for value in options]
+    return bool(values) and isinstance(values, list) and all(
+        isinstance(value, int) and not isinstance(value, bool) for value in values
+    )
+
+
+def is_numeric(category, stat_type, name):
+    """
+    Return True if the stat holds a whole-number rating.
+    """
+    key = (category, stat_type, name)
+    try:
+        return _numeric[key]
+    except KeyError:
+        pass
+    # Instanced stats are listed under their base name, e.g. Status
+    stat = STAT_CATALOG.get(category, stat_type, name.split('(', 1)[0].strip())
+    if stat and stat.values:
+        numeric = _all_ints(stat.values)
+    else:
+        numeric = category in NUMERIC_CATEGORIES
+    _numeric[key] = numeric
+    return numeric
+
+
+def coerce_stat_value(category, stat_type, name, value):
+    """
+    Return `value` as the stat's type: an int for numeric stats, unchanged
+    otherwise. None is left alone. Raises StatValueError for values a
+    numeric stat can't hold.
+    """
+    if value is None or type(value) is int or not is_numeric(category, stat_type, name):
+        return value
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise StatValueError(f"{name} must be a whole number, not {value!r}.")
+
+
+def normalize_character(character, write=True):
+    """
+    Convert a character's numeric stats stored as strings or floats to
+    ints. Returns (number of values converted, list of anomalies), where
+    anomalies are values that couldn't be converted or entries that aren't
+    stats at all. With write=False nothing is changed.
+    """
+    converted = 0
+    anomalies = []
+    stats = character.stats
+    # A dry run reads what is stored without loading it, which under the
+    # table backend could copy the old stats Attribute into the table
+    sheet = stats.all() if write else stats.stored()
+
+    with stats.batch(reason="stat normalization") if write else nullcontext():
+        for category, types in list(sheet.items()):
+            if not isinstance(types, Mapping):
+                anomalies.append(f"{category}: not a dict of stat types ({types!r})")
+                continue
+            for stat_type, names in list(types.items()):
+                if not isinstance(names, Mapping):
+                    anomalies.append(f"{category}/{stat_type}: not a dict of stats ({names!r})")
+                    continue
+                for name, leaf in list(names.items()):
+                    if not isinstance(leaf, Mapping):
+                        anomalies.append(f"{category}/{stat_type}/{name}: not a perm/temp dict ({leaf!r})")
+                        continue
+                    typed = {}
+                    for field in ('perm', 'temp'):
+                        value = leaf.get(field)
+                        try:
+                            new_value = coerce_stat_value(category, stat_type, name, value)
+                        except StatValueError:
+                            anomalies.append(f"{category}/{stat_type}/{name} {field}: {value!r}")
+                            continue
+                        if new_value is not value:
+                            typed[field] = new_value
+                    converted += len(typed)
+                    if typed and write:
+                        leaf.update(typed)
+    return converted, anomalies
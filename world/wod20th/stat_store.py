@@ -0,0 +1,773 @@
+# world/wod20th/stat_store.py
+"""
+Character stat storage.
+
+Stats have always lived in one pickled Attribute, db.stats, shaped
+
+    {category: {stat_type: {name: {'perm': ..., 'temp': ...}}}}
+
+so changing a single pool re-pickles and rewrites the whole sheet. Setting
+
+    WOD20TH_STAT_BACKEND = "table"
+
+stores every stat as its own CharacterStat row instead. A loaded character
+keeps a mirror of its rows, remembers which ones changed and writes only
+those. Under either backend character.db.stats returns the mirror as
+ordinary nested dicts; changes made through them are tracked and saved
+like set_stat's.
+
+Game code should prefer character.stats (a StatHandler), or get_stat and
+set_stat, over walking db.stats by hand.
+"""
+from collections.abc import Mapping, MutableSequence
+
+from django.conf import settings
+from django.db import transaction
+from evennia.typeclasses.attributes import DbHolder
+from evennia.utils import logger
+
+from world.wod20th.ledger import LEDGER
+from world.wod20th.models import CharacterStat
+from world.wod20th.stat_schema import StatValueError, coerce_stat_value
+
+ATTRIBUTE_BACKEND = "attribute"
+TABLE_BACKEND = "table"
+
+# category, stat_type, name
+LEAF_DEPTH = 3
+
+# Set on a character once its stats live in CharacterStat rows, so the old
+# stats Attribute is never copied in again, e.g. after a reset empties them
+TABLE_MARKER = "stats_in_table"
+
+STAT_CHANGE = "stat"
+ATTRIBUTE_CHANGE = "attribute"
+
+_GA = object.__getattribute__
+_SA = object.__setattr__
+
+
+def stat_backend():
+    """
+    Return the configured backend, "attribute" unless the settings say
+    otherwise.
+    """
+    backend = getattr(settings, "WOD20TH_STAT_BACKEND", ATTRIBUTE_BACKEND)
+    if backend not in (ATTRIBUTE_BACKEND, TABLE_BACKEND):
+        logger.log_err(f"Unknown WOD20TH_STAT_BACKEND '{backend}', using '{ATTRIBUTE_BACKEND}'.")
+        return ATTRIBUTE_BACKEND
+    return backend
+
+
+class StatRow:
+    """
+    In-memory copy of one CharacterStat row. pk is None until inserted.
+    """
+
+    __slots__ = ("pk", "perm", "temp")
+
+    def __init__(self, pk, perm, temp):
+        self.pk = pk
+        self.perm = perm
+        self.temp = temp
+
+
+def _split(leaf):
+    """
+    Return the (perm, temp) stored for a stat's value.
+    """
+    if isinstance(leaf, Mapping):
+        return leaf.get("perm"), leaf.get("temp")
+    return leaf, None
+
+
+def _leaf(perm, temp):
+    leaf = {}
+    if perm is not None:
+        leaf["perm"] = perm
+    if temp is not None:
+        leaf["temp"] = temp
+    return leaf
+
+
+def _plain(value):
+    """
+    Deep copy nested dicts into plain dicts, e.g. to detach them from the
+    mirror or from an Attribute's _SaverDict.
+    """
+    if isinstance(value, Mapping):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, MutableSequence):
+        return [_plain(item) for item in value]
+    return value
+
+
+class TrackedDict(dict):
+    """
+    A dict in the stat mirror. Mutations are reported to the owning handler
+    with the path of what changed, so it can update just those rows.
+
+    Assigned dicts are copied in, as Evennia does for Attributes: change a
+    stat by indexing from db.stats again rather than keeping the dict you
+    assigned.
+    """
+
+    __slots__ = ("_handler", "_path")
+
+    def __init__(self, handler, path, data=()):
+        super().__init__()
+        self._handler = handler
+        self._path = path
+        for key, value in dict(data).items():
+            dict.__setitem__(self, key, self._wrap(key, value))
+
+    def _wrap(self, key, value):
+        if isinstance(value, Mapping) and len(self._path) < LEAF_DEPTH:
+            return TrackedDict(self._handler, self._path + (key,), value)
+        return value
+
+    def _changed(self, key=None):
+        # Inside a stat's value dict every change touches that one stat
+        if key is None or len(self._path) >= LEAF_DEPTH:
+            self._handler._sync(self._path)
+        else:
+            self._handler._sync(self._path + (key,))
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, self._wrap(key, value))
+        self._changed(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed(key)
+
+    def pop(self, key, *default):
+        had_key = key in self
+        value = dict.pop(self, key, *default)
+        if had_key:
+            self._changed(key)
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._changed(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        with self._handler._hold():
+            for key, value in dict(*args, **kwargs).items():
+                self[key] = value
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def copy(self):
+        return _plain(self)
+
+    def __deepcopy__(self, memo):
+        return _plain(self)
+
+    def __reduce__(self):
+        # Pickle as a plain dict, e.g. when copied into another Attribute
+        return (dict, (_plain(self),))
+
+
+class _Hold:
+    def __init__(self, handler):
+        self.handler = handler
+
+    def __enter__(self):
+        self.handler._holds += 1
+
+    def __exit__(self, *exc):
+        self.handler._holds -= 1
+        if not self.handler._holds:
+            self.handler.flush()
+        return False
+
+
+class _Batch:
+    def __init__(self, handler, actor=None, reason=None):
+        self.handler = handler
+        self.actor = actor
+        self.reason = reason
+        self.previous = None
+
+    def __enter__(self):
+        handler = self.handler
+        if not handler._batch_depth:
+            handler._begin_batch()
+        handler._batch_depth += 1
+        self.previous = (handler._actor, handler._reason)
+        if self.actor is not None and handler._actor is None:
+            handler._actor = self.actor
+        if self.reason and not handler._reason:
+            handler._reason = self.reason
+        return handler
+
+    def __exit__(self, exc_type, exc, tb):
+        handler = self.handler
+        handler._batch_depth -= 1
+        if not handler._batch_depth:
+            if exc_type is None:
+                handler._commit_batch()
+            else:
+                handler._rollback_batch()
+        handler._actor, handler._reason = self.previous
+        return False
+
+
+class StatHandler:
+    """
+    character.stats: reads and writes a character's stats through the
+    configured backend.
+
+    Both backends keep the stats in a mirror of TrackedDicts, so every
+    change, whether made with set_stat or through db.stats, is seen here
+    and passed on to subscribers such as the derived stat cache.
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.backend = stat_backend()
+        self._mirror = None
+        self._rows = None
+        self._dirty = set()
+        self._deleted = []
+        self._attribute_dirty = False
+        self._changes = []
+        self._actor = None
+        self._reason = ''
+        self._holds = 0
+        self._batch_depth = 0
+        self._snapshot = None
+        self._listeners = []
+        # Bumped on every change, so caches can tell when to rebuild
+        self.version = 0
+
+    @property
+    def in_batch(self):
+        return self._batch_depth > 0
+
+    def subscribe(self, callback):
+        """
+        Call `callback(kind, key)` on every change. For stats, kind is
+        STAT_CHANGE and key the (category, stat_type, name) prefix that
+        changed, () meaning all of them. For other Attributes set through
+        db, kind is ATTRIBUTE_CHANGE and key the Attribute name.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, path, kind=None):
+        self.version += 1
+        for callback in self._listeners:
+            try:
+                callback(kind or STAT_CHANGE, path)
+            except Exception:
+                logger.log_trace(f"Error notifying change {path} on {self.obj}.")
+
+    def attribute_changed(self, name):
+        self._notify(name, ATTRIBUTE_CHANGE)
+
+    # Reading
+
+    def all(self):
+        """
+        Return the nested stats dict, the same object db.stats returns.
+        """
+        if self._mirror is None:
+            self._load()
+        return self._mirror
+
+    def stored(self):
+        """
+        Return a plain copy of the stats as saved, without loading them or
+        writing anything: under the table backend, a character not loaded
+        yet gets the old stats Attribute its first load would copy in.
+        """
+        if self._mirror is not None:
+            return _plain(self._mirror)
+        if self.backend != TABLE_BACKEND:
+            return _plain(self.obj.attributes.get("stats") or {})
+        tree = {}
+        for category, stat_type, name, perm, temp in CharacterStat.objects.filter(
+            character_id=self.obj.id
+        ).values_list("category", "stat_type", "name", "perm", "temp"):
+            tree.setdefault(category, {}).setdefault(stat_type, {})[name] = _leaf(perm, temp)
+        if not tree and not self.obj.attributes.has(TABLE_MARKER):
+            return _plain(self.obj.attributes.get("stats") or {})
+        return tree
+
+    def get(self, category, stat_type, name, temp=False, default=None):
+        """
+        Return a stat's perm or temp value, or `default` if it isn't set.
+        """
+        leaf = self.all().get(category, {}).get(stat_type, {}).get(name)
+        if leaf is None:
+            return default
+        if not isinstance(leaf, Mapping):
+            return default if temp else leaf
+        return leaf.get("temp" if temp else "perm", default)
+
+    # Writing
+
+    def set(self, category, stat_type, name, value, temp=False):
+        """
+        Set a stat's perm or temp value, creating the stat at 0/0 first if
+        the character doesn't have it. Raises StatValueError if a numeric
+        stat is given something that isn't a number.
+        """
+        value = coerce_stat_value(category, stat_type, name, value)
+        with self._hold():
+            stats = self.all()
+            leaf = stats.setdefault(category, {}).setdefault(stat_type, {}).setdefault(
+                name, {"perm": 0, "temp": 0}
+            )
+            leaf["temp" if temp else "perm"] = value
+
+    def remove(self, category, stat_type, name):
+        """
+        Remove a stat from the character. Returns True if it was present.
+        """
+        names = self.all().get(category, {}).get(stat_type, {})
+        if name not in names:
+            return False
+        del names[name]
+        return True
+
+    def replace(self, stats):
+        """
+        Replace every stat at once, as assigning db.stats does.
+        """
+        if self._mirror is None:
+            self._load(import_legacy=False)
+        self._mirror = TrackedDict(self, (), _plain(stats or {}))
+        self._sync(())
+
+    # Batches
+
+    def batch(self, actor=None, reason=None):
+        """
+        Buffer every stat change made in a block and save them together
+        when it exits, discarding them all if the block raises:
+
+            with character.stats.batch(actor=caller, reason="+spend"):
+                character.set_stat('attributes', 'physical', 'Strength', 3)
+                character.db.stats['pools']['dual']['Blood']['temp'] = 5
+
+        The attribute backend saves the Attribute once; the table backend
+        writes the changed rows in one transaction. Nested batches join the
+        outermost one. `actor` and `reason` are recorded in the stat ledger
+        for every change in the block.
+        """
+        return _Batch(self, actor=actor, reason=reason)
+
+    def _begin_batch(self):
+        mirror = self.all()
+        rows = {key: (row.pk, row.perm, row.temp) for key, row in self._rows.items()}
+        self._snapshot = (
+            _plain(mirror), rows, set(self._dirty), list(self._deleted), self._attribute_dirty,
+            len(self._changes),
+        )
+        self._holds += 1
+
+    def _commit_batch(self):
+        self._snapshot = None
+        self._holds -= 1
+        if not self._holds:
+            self.flush()
+
+    def _rollback_batch(self):
+        tree, rows, dirty, deleted, attribute_dirty, changes = self._snapshot
+        self._snapshot = None
+        self._rows = {key: StatRow(*values) for key, values in rows.items()}
+        del self._changes[changes:]
+        self._dirty = dirty
+        self._deleted = deleted
+        self._attribute_dirty = attribute_dirty
+        self._mirror = TrackedDict(self, (), tree)
+        self._holds -= 1
+        self._notify(())
+
+    # Storage internals
+
+    def _hold(self):
+        """
+        Context manager deferring flushes until the outermost hold exits.
+        """
+        return _Hold(self)
+
+    def _load(self, import_legacy=True, values=None):
+        if self.backend != TABLE_BACKEND:
+            # Rows without pks: only used to tell what changed
+            self._mirror = TrackedDict(self, (), _plain(self.obj.attributes.get("stats") or {}))
+            self._rows = {
+                key: StatRow(None, *_split(leaf)) for key, leaf in self._leaves(()).items()
+            }
+            return
+
+        if values is None:
+            values = CharacterStat.objects.filter(character_id=self.obj.id).values_list(
+                "pk", "category", "stat_type", "name", "perm", "temp"
+            )
+        rows = {}
+        tree = {}
+        for pk, category, stat_type, name, perm, temp in values:
+            rows[(category, stat_type, name)] = StatRow(pk, perm, temp)
+            tree.setdefault(category, {}).setdefault(stat_type, {})[name] = _leaf(perm, temp)
+        self._rows = rows
+        self._dirty = set()
+        self._deleted = []
+        self._mirror = TrackedDict(self, (), tree)
+
+        if import_legacy and not rows and not self.obj.attributes.has(TABLE_MARKER):
+            # First load under the table backend: copy the old Attribute in.
+            # The Attribute is left alone so the switch can be undone.
+            legacy = self.obj.attributes.get("stats")
+            if legacy:
+                with self._hold():
+                    self._mirror = TrackedDict(self, (), _plain(legacy))
+                    # Copied as stored; normalize_wod20th_stats fixes bad values
+                    self._sync((), strict=False)
+                    # Copying isn't a change worth recording in the ledger
+                    del self._changes[:]
+            self._mark_table()
+
+    def _mark_table(self):
+        if not self.obj.attributes.has(TABLE_MARKER):
+            self.obj.attributes.add(TABLE_MARKER, True)
+
+    def _leaves(self, path):
+        """
+        Return {(category, stat_type, name): leaf} for everything in the
+        mirror under `path`.
+        """
+        node = self._mirror
+        for key in path:
+            node = node.get(key) if isinstance(node, dict) else None
+            if node is None:
+                return {}
+        if len(path) == LEAF_DEPTH:
+            return {path: node}
+
+        leaves = {}
+        stack = [(path, node)]
+        while stack:
+            prefix, node = stack.pop()
+            if not isinstance(node, dict):
+                # Values above stat level can't be stored as rows
+                continue
+            for key, value in node.items():
+                key_path = prefix + (key,)
+                if len(key_path) == LEAF_DEPTH:
+                    leaves[key_path] = value
+                else:
+                    stack.append((key_path, value))
+        return leaves
+
+    def _sync(self, path, strict=True):
+        """
+        Record that the mirror changed under `path`: mark the affected rows
+        (or the whole Attribute) dirty, tell subscribers, then flush unless
+        a hold is active. Values a numeric stat can't hold are put back as
+        they were and, unless `strict` is False, StatValueError is raised
+        once the rest of the change is saved.
+        """
+        if self._mirror is None:
+            return
+        errors = self._sync_rows(path, strict)
+        if self.backend != TABLE_BACKEND:
+            self._attribute_dirty = True
+        self._notify(path)
+        if not self._holds:
+            self.flush()
+        if errors:
+            raise StatValueError(" ".join(errors))
+
+    def _sync_rows(self, path, strict=True):
+        leaves = self._leaves(path)
+        if len(path) == LEAF_DEPTH:
+            stale = [] if leaves or path not in self._rows else [path]
+        else:
+            depth = len(path)
+            stale = [key for key in self._rows if key[:depth] == path and key not in leaves]
+
+        for key in stale:
+            row = self._rows.pop(key)
+            self._dirty.discard(key)
+            if row.pk is not None:
+                self._deleted.append(row.pk)
+            self._changes.append((key, row.perm, row.temp, None, None))
+
+        errors = []
+        for key, leaf in leaves.items():
+            row = self._rows.get(key)
+            rejected = self._typed(key, leaf, row, strict)
+            if rejected:
+                errors.extend(rejected)
+                if row is None and not leaf:
+                    # Nothing valid was written to a new stat
+                    dict.__delitem__(self._mirror[key[0]][key[1]], key[2])
+                    continue
+            perm, temp = _split(leaf)
+            if row is None:
+                self._rows[key] = StatRow(None, perm, temp)
+                self._dirty.add(key)
+                self._changes.append((key, None, None, perm, temp))
+            elif row.perm != perm or row.temp != temp:
+                self._changes.append((key, row.perm, row.temp, perm, temp))
+                row.perm, row.temp = perm, temp
+                self._dirty.add(key)
+        return errors
+
+    def _typed(self, key, leaf, row, strict=True):
+        """
+        Store numeric stats written as strings through db.stats as ints.
+        Returns the errors for new values that aren't numbers at all, after
+        putting those back to what `row` holds so they are never saved.
+        """
+        if not isinstance(leaf, Mapping):
+            return []
+        errors = []
+        for field in ("perm", "temp"):
+            value = leaf.get(field)
+            if value is None or type(value) is int:
+                continue
+            try:
+                typed = coerce_stat_value(*key, value)
+            except StatValueError as error:
+                old = getattr(row, field, None)
+                if not strict or old == value:
+                    # Stored before values were checked
+                    logger.log_warn(f"{self.obj}: {error}")
+                    continue
+                if old is None:
+                    dict.pop(leaf, field, None)
+                else:
+                    dict.__setitem__(leaf, field, old)
+                errors.append(str(error))
+                continue
+            if typed is not value:
+                dict.__setitem__(leaf, field, typed)
+        return errors
+
+    def flush(self):
+        """
+        Save pending changes. The attribute backend re-saves db.stats; the
+        table backend writes only dirty rows, one UPDATE for a single
+        changed stat and bulk statements otherwise. What changed is handed
+        to the stat ledger.
+        """
+        self._record_changes()
+        if _bulk_handlers is not None:
+            # Written together when the bulk_write() block exits
+            _bulk_handlers[id(self)] = self
+            return
+        if self.backend != TABLE_BACKEND:
+            self._save_attribute()
+            return
+        _write_rows([self])
+
+    def _save_attribute(self):
+        self._dirty = set()
+        if self._attribute_dirty:
+            self._attribute_dirty = False
+            self.obj.attributes.add("stats", _plain(self._mirror))
+
+    def _record_changes(self):
+        global _generation
+        if not self._changes:
+            return
+        _generation += 1
+        # One entry per stat: from its first old value to its last new one
+        merged = {}
+        for key, old_perm, old_temp, new_perm, new_temp in self._changes:
+            if key in merged:
+                old_perm, old_temp = merged[key][1:3]
+            merged[key] = (key, old_perm, old_temp, new_perm, new_temp)
+        self._changes = []
+        changes = [change for change in merged.values() if change[1:3] != change[3:5]]
+        LEDGER.record(self.obj, changes, actor=self._actor, reason=self._reason)
+
+    def _fetch_pks(self, created):
+        pks = {
+            (category, stat_type, name): pk
+            for pk, category, stat_type, name in CharacterStat.objects.filter(
+                character_id=self.obj.id
+            ).values_list("pk", "category", "stat_type", "name")
+        }
+        for key, row in created:
+            row.pk = pks.get(key)
+
+
+def _write_rows(handlers):
+    """
+    Write the dirty rows of table-backend handlers in one transaction: one
+    UPDATE for a single changed stat, bulk statements otherwise.
+    """
+    deleted = []
+    created = []
+    updated = []
+    for handler in handlers:
+        if handler._deleted:
+            # Rows going away mustn't let the old Attribute back in
+            handler._mark_table()
+        deleted.extend(handler._deleted)
+        for key in handler._dirty:
+            row = handler._rows[key]
+            if row.pk is None:
+                created.append((handler, key, row))
+            else:
+                updated.append(row)
+        handler._dirty = set()
+        handler._deleted = []
+    if not (deleted or created or updated):
+        return
+
+    with transaction.atomic():
+        if deleted:
+            CharacterStat.objects.filter(pk__in=deleted).delete()
+        if created:
+            objs = CharacterStat.objects.bulk_create([
+                CharacterStat(
+                    character_id=handler.obj.id, category=key[0], stat_type=key[1], name=key[2],
+                    perm=row.perm, temp=row.temp,
+                )
+                for handler, key, row in created
+            ], batch_size=500)
+            for (handler, key, row), obj in zip(created, objs):
+                row.pk = obj.pk
+            # Databases that don't return ids from bulk inserts
+            missing = {}
+            for handler, key, row in created:
+                if row.pk is None:
+                    missing.setdefault(handler, []).append((key, row))
+            for handler, rows in missing.items():
+                handler._fetch_pks(rows)
+        if len(updated) == 1:
+            row = updated[0]
+            CharacterStat.objects.filter(pk=row.pk).update(perm=row.perm, temp=row.temp)
+        elif updated:
+            CharacterStat.objects.bulk_update(
+                [CharacterStat(pk=row.pk, perm=row.perm, temp=row.temp) for row in updated],
+                ["perm", "temp"],
+                batch_size=500,
+            )
+
+
+# id(handler) -> handler whose saves are deferred, while bulk_write() is active
+_bulk_handlers = None
+# Counts saves that changed any character's stats
+_generation = 0
+
+
+def stat_generation():
+    """
+    Return a number that changes whenever any character's stats are saved
+    with changes, e.g. to tell whether a cache over many sheets is stale.
+    """
+    return _generation
+
+
+class _BulkWrite:
+    def __enter__(self):
+        global _bulk_handlers
+        self.outermost = _bulk_handlers is None
+        if self.outermost:
+            _bulk_handlers = {}
+
+    def __exit__(self, exc_type, exc, tb):
+        global _bulk_handlers
+        if not self.outermost:
+            return False
+        handlers, _bulk_handlers = list(_bulk_handlers.values()), None
+        # Whatever reached the mirrors is saved, even if the block raised
+        with transaction.atomic():
+            for handler in handlers:
+                if handler.backend != TABLE_BACKEND:
+                    handler._save_attribute()
+            _write_rows([handler for handler in handlers if handler.backend == TABLE_BACKEND])
+        return False
+
+
+def bulk_write():
+    """
+    Defer the saves of every character's stats changed in a block and
+    write them together when it exits, for jobs touching many characters:
+
+        with bulk_write():
+            for character in characters:
+                with character.stats.batch():
+                    ...
+
+    The table backend writes all the rows in one set of bulk statements;
+    the attribute backend saves each character's Attribute in one
+    transaction.
+    """
+    return _BulkWrite()
+
+
+def load_many(characters):
+    """
+    Load the stats of many characters at once: one query for the table
+    backend instead of one per character.
+    """
+    handlers = [character.stats for character in characters]
+    pending = {
+        handler.obj.id: handler for handler in handlers
+        if handler._mirror is None and handler.backend == TABLE_BACKEND
+    }
+    if pending:
+        values = {character_id: [] for character_id in pending}
+        for row in CharacterStat.objects.filter(character_id__in=list(pending)).values_list(
+            "character_id", "pk", "category", "stat_type", "name", "perm", "temp"
+        ):
+            values[row[0]].append(row[1:])
+        # Characters without rows yet import their Attribute; save those together
+        with bulk_write():
+            for character_id, handler in pending.items():
+                handler._load(values=values[character_id])
+    for handler in handlers:
+        handler.all()
+
+
+class StatDbHolder(DbHolder):
+    """
+    The character's db holder: db.stats goes to the StatHandler and every
+    other Attribute behaves as usual, except that writes are reported to
+    the handler's subscribers, e.g. so derived stats that read db.agg are
+    recomputed.
+    """
+
+    def __init__(self, obj, handler):
+        super().__init__(obj, "attributes")
+        _SA(self, "_stat_handler", handler)
+
+    def __getattribute__(self, attrname):
+        if attrname == "stats":
+            return _GA(self, "_stat_handler").all()
+        return DbHolder.__getattribute__(self, attrname)
+
+    def __setattr__(self, attrname, value):
+        if attrname == "stats":
+            _GA(self, "_stat_handler").replace(value)
+        else:
+            DbHolder.__setattr__(self, attrname, value)
+            _GA(self, "_stat_handler").attribute_changed(attrname)
+
+    def __delattr__(self, attrname):
+        if attrname == "stats":
+            _GA(self, "_stat_handler").replace({})
+        else:
+            DbHolder.__delattr__(self, attrname)
+            _GA(self, "_stat_handler").attribute_changed(attrname)
@@ -0,0 +1,53 @@
+from itertools import product
+from unittest import TestCase
+
+from world.wod20th.utils.dice_odds import pool_odds
+from world.wod20th.utils.dice_rolls import BOTCH_RULES, FACES, score
+
+
+def enumerate_odds(pool, difficulty, willpower, botch_rule):
+    """
+    The exact distribution of a roll without a specialty, by listing every
+    way the dice can fall.
+    """
+    distribution = {}
+    botch = 0.0
+    chance = 0.1 ** pool
+    for dice in product(FACES, repeat=pool):
+        successes, _, botched = score(dice, difficulty, willpower=willpower, botch_rule=botch_rule)
+        distribution[successes] = distribution.get(successes, 0.0) + chance
+        botch += chance if botched else 0.0
+    return distribution, botch
+
+
+class TestPoolOdds(TestCase):
+    def test_matches_enumeration(self):
+        for difficulty, willpower, botch_rule in product((2, 6, 10), (False, True), BOTCH_RULES):
+            with self.subTest(difficulty=difficulty, willpower=willpower, botch_rule=botch_rule):
+                odds = pool_odds(3, difficulty, willpower=willpower, botch_rule=botch_rule)
+                distribution, botch = enumerate_odds(3, difficulty, willpower, botch_rule)
+                self.assertEqual(set(odds.distribution), set(distribution))
+                for successes, chance in distribution.items():
+                    self.assertAlmostEqual(odds.distribution[successes], chance)
+                self.assertAlmostEqual(odds.botch, botch)
+
+    def test_specialty_distribution_is_complete(self):
+        for difficulty in (2, 6, 10):
+            for pool in (1, 5, 20):
+                with self.subTest(difficulty=difficulty, pool=pool):
+                    odds = pool_odds(pool, difficulty, specialty=True)
+                    self.assertAlmostEqual(sum(odds.distribution.values()), 1.0, places=9)
+                    self.assertGreaterEqual(odds.expected, pool_odds(pool, difficulty).expected)
+
+    def test_single_die_specialty(self):
+        # A 10 is two successes once its extra die comes up difficulty or better
+        odds = pool_odds(1, 6, specialty=True)
+        self.assertAlmostEqual(odds.botch, 0.1)
+        self.assertAlmostEqual(odds.at_least(1), 0.5)
+        self.assertAlmostEqual(odds.at_least(2), 0.1 * 0.5)
+
+    def test_caps(self):
+        self.assertEqual(pool_odds(3, 15).difficulty, 10)
+        self.assertEqual(pool_odds(-1).distribution, {0: 1.0})
+        with self.assertRaises(ValueError):
+            pool_odds(3, botch_rule='house')
@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+from world.wod20th.utils.dice_rolls import DiceEngine, score, score_counts
+
+
+class TestScore(TestCase):
+    def test_v20_ones_cancel_down_to_zero(self):
+        self.assertEqual(score([8, 9, 1, 1, 1], 6), (0, 3, False))
+        self.assertEqual(score([8, 9, 10, 1], 6), (2, 1, False))
+
+    def test_v20_botch_needs_no_successes(self):
+        self.assertEqual(score([1, 3, 4], 6), (0, 1, True))
+        self.assertEqual(score([3, 4, 5], 6), (0, 0, False))
+
+    def test_net_rule_goes_negative(self):
+        self.assertEqual(score([7, 1, 1], 6, botch_rule='net'), (-1, 2, True))
+        self.assertEqual(score([7, 1], 6, botch_rule='net'), (0, 1, False))
+
+    def test_no_cancel_rule(self):
+        self.assertEqual(score([7, 8, 1, 1], 6, botch_rule='no_cancel'), (2, 2, False))
+        self.assertEqual(score([2, 1], 6, botch_rule='no_cancel'), (0, 1, True))
+
+    def test_willpower_adds_a_success_and_clears_a_botch(self):
+        for rule in ('v20', 'net', 'no_cancel'):
+            with self.subTest(rule=rule):
+                self.assertEqual(score_counts(0, 2, willpower=True, botch_rule=rule), (1, False))
+                self.assertEqual(score_counts(3, 1, willpower=True, botch_rule=rule)[0],
+                                 4 if rule == 'no_cancel' else 3)
+
+    def test_ones_on_bonus_dice_do_not_count(self):
+        self.assertEqual(score([10, 4], 6, bonus=[1]), (1, 0, False))
+        self.assertEqual(score([10, 1], 6, bonus=[7]), (1, 1, False))
+
+
+class TestDiceEngine(TestCase):
+    def setUp(self):
+        self.dice = DiceEngine()
+
+    def test_seed_reproduces_the_roll(self):
+        first = self.dice.roll(8, 7, specialty=True, seed=1234)
+        self.assertEqual(self.dice.roll(8, 7, specialty=True, seed=1234), first)
+        self.assertEqual(self.dice.replay(first), first)
+
+    def test_replay_of_unseeded_roll(self):
+        result = self.dice.roll(12, 6, specialty=True, willpower=True)
+        self.assertIsNotNone(result.seed)
+        self.assertEqual(self.dice.replay(result), result)
+
+    def test_roll_many_replays_each_pool(self):
+        pools = [3, 5, 0, 7]
+        results = self.dice.roll_many(pools, 6, specialty=True)
+        self.assertEqual([result.pool for result in results], pools)
+        self.assertEqual([len(result.dice) for result in results], pools)
+        self.assertEqual(len({result.seed for result in results}), 1)
+        for result in results:
+            self.assertEqual(self.dice.replay(result, pools), result)
+
+    def test_specialty_adds_a_die_per_ten(self):
+        for seed in range(50):
+            result = self.dice.roll(10, 6, specialty=True, seed=seed)
+            tens = sum(1 for die in result.dice + result.bonus if die == 10)
+            self.assertEqual(len(result.bonus), tens)
+            self.assertEqual(self.dice.roll(10, 6, seed=seed).bonus, ())
+
+    def test_difficulty_is_capped(self):
+        self.assertEqual(self.dice.roll(3, 15, seed=1).difficulty, 10)
+        self.assertEqual(self.dice.roll(3, 0, seed=1).difficulty, 2)
+        self.assertEqual(self.dice.roll_many([2, 2], 12, seed=1)[0].difficulty, 10)
+
+    def test_negative_pool_rolls_nothing(self):
+        result = self.dice.roll(-2, 6, seed=1)
+        self.assertEqual((result.pool, result.dice, result.successes), (0, (), 0))
+
+    def test_unknown_botch_rule(self):
+        with self.assertRaises(ValueError):
+            self.dice.roll(3, 6, botch_rule='house')
+        with self.assertRaises(ValueError):
+            DiceEngine(botch_rule='house')
@@ -0,0 +1,32 @@
+from evennia.utils import create
+from evennia.utils.test_resources import EvenniaTest
+
+from world.wod20th.ledger import StatLedger
+from world.wod20th.models import StatLedgerEntry
+
+STRENGTH = ('attributes', 'physical', 'Strength')
+
+
+class TestLedgerFlush(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.ledger = StatLedger()
+
+    def test_flush_writes_buffered_entries(self):
+        self.ledger.record(self.char1, [(STRENGTH, 2, None, 3, None)], actor='Staff', reason='test')
+        self.assertFalse(StatLedgerEntry.objects.filter(character_id=self.char1.id).exists())
+        self.ledger.flush()
+        entry = StatLedgerEntry.objects.get(character_id=self.char1.id)
+        self.assertEqual(entry.key, STRENGTH)
+        self.assertEqual(entry.old_value, {'perm': 2})
+        self.assertEqual(entry.new_value, {'perm': 3})
+
+    def test_deleted_character_does_not_lose_other_entries(self):
+        doomed = create.create_object("typeclasses.characters.Character", key="Doomed", location=self.room1)
+        self.ledger.record(self.char1, [(STRENGTH, 2, None, 3, None)])
+        self.ledger.record(doomed, [(STRENGTH, 1, None, 2, None)])
+        self.ledger.record(self.char2, [(STRENGTH, 4, None, 5, None)])
+        doomed.delete()
+        self.ledger.flush()
+        self.assertEqual(StatLedgerEntry.objects.filter(character_id=self.char1.id).count(), 1)
+        self.assertEqual(StatLedgerEntry.objects.filter(character_id=self.char2.id).count(), 1)
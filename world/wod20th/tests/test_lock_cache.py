@@ -0,0 +1,47 @@
+from evennia.utils.test_resources import EvenniaTest
+
+from world.wod20th.utils.lock_cache import check_lock, compile_lock
+
+
+class TestCompiledLocks(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.viewer = self.char2
+        self.viewer.permissions.clear()
+
+    def check(self, lockstring, access_type=None, default=False):
+        return check_lock(self.viewer, lockstring, access_type, default=default, no_superuser_bypass=True)
+
+    def test_empty_lockstring_uses_default(self):
+        self.assertTrue(self.check("", 'view', default=True))
+        self.assertFalse(self.check("", 'view'))
+        self.assertFalse(self.check(""))
+
+    def test_access_types(self):
+        lockstring = "view:all();edit:perm(Builder)"
+        self.assertTrue(self.check(lockstring, 'view'))
+        self.assertFalse(self.check(lockstring, 'edit'))
+        self.assertTrue(self.check(lockstring, 'delete', default=True))
+        self.viewer.permissions.add("Builder")
+        self.assertTrue(self.check(lockstring, 'edit'))
+
+    def test_bare_permission_name(self):
+        # Older Stat lock strings are just a permission name
+        self.assertFalse(self.check("Builder", 'view', default=True))
+        self.assertFalse(self.check("Builder"))
+        self.viewer.permissions.add("Builder")
+        self.assertTrue(self.check("Builder", 'view', default=True))
+
+    def test_bare_lockfunc_applies_to_every_access_type(self):
+        self.assertFalse(self.check("perm(Builder)", 'view', default=True))
+        self.assertFalse(self.check("perm(Builder)", 'edit'))
+        self.viewer.permissions.add("Builder")
+        self.assertTrue(self.check("perm(Builder)", 'view'))
+
+    def test_bad_lockstring_uses_default(self):
+        lock = compile_lock("view:nosuchlockfunc()")
+        self.assertEqual(lock.access_types, {})
+        self.assertTrue(self.check("view:nosuchlockfunc()", 'view', default=True))
+
+    def test_compiled_once(self):
+        self.assertIs(compile_lock("view:all()"), compile_lock("view:all()"))
@@ -0,0 +1,35 @@
+from evennia.utils import create
+from evennia.utils.test_resources import EvenniaTest
+
+from world.wod20th.models import RollLog
+from world.wod20th.roll_log import RollLogWriter
+
+
+class TestRollLog(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.log = RollLogWriter()
+
+    def test_rolls_are_buffered_until_read(self):
+        self.log.record(self.room1, self.char1, "+ Strength (3) vs 6", "(2) Successes", seed=7)
+        self.assertFalse(RollLog.objects.exists())
+        rolls = list(self.log.for_room(self.room1))
+        self.assertEqual(len(rolls), 1)
+        self.assertEqual(rolls[0].roller_id, self.char1.id)
+        self.assertEqual(rolls[0].roller_name, self.char1.key)
+        self.assertEqual(rolls[0].seed, 7)
+        self.assertEqual(list(self.log.for_roller(self.char1)), rolls)
+
+    def test_deleted_room_and_roller_lose_only_their_own_rolls(self):
+        room = create.create_object("typeclasses.rooms.Room", key="Doomed Room")
+        roller = create.create_object("typeclasses.characters.Character", key="Doomed", location=self.room1)
+        self.log.record(self.room1, self.char1, "first", "ok")
+        self.log.record(room, self.char1, "lost", "ok")
+        self.log.record(self.room1, roller, "kept", "ok")
+        room.delete()
+        roller.delete()
+        self.log.flush()
+        rolls = {roll.description: roll for roll in RollLog.objects.all()}
+        self.assertEqual(set(rolls), {"first", "kept"})
+        self.assertIsNone(rolls["kept"].roller_id)
+        self.assertEqual(rolls["kept"].roller_name, "Doomed")
@@ -0,0 +1,71 @@
+import gzip
+import os
+import tempfile
+from unittest.mock import patch
+
+from evennia.objects.models import ObjectDB
+from evennia.utils.test_resources import EvenniaTest
+
+from world.wod20th.sheet_export import SheetExport, SheetImport, read_progress
+
+STRENGTH = ('attributes', 'physical', 'Strength')
+
+
+class TestSheetExportImport(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'sheets.jsonl.gz')
+        self.char1.stats.set(*STRENGTH, 2)
+        self.char2.stats.set(*STRENGTH, 4)
+        SheetExport(self.path, chunk_size=1).run()
+        with gzip.open(self.path, 'rt', encoding='utf-8') as handle:
+            self.lines = sum(1 for line in handle if line.strip())
+
+    def strength(self, character):
+        # The import works on freshly loaded characters
+        return ObjectDB.objects.get(id=character.id).stats.get(*STRENGTH)
+
+    def test_export_writes_a_record_per_character(self):
+        self.assertFalse(os.path.exists(self.path + '.part'))
+        self.assertGreaterEqual(self.lines, 2)
+
+    def test_import_restores_the_sheets(self):
+        self.char1.stats.set(*STRENGTH, 5)
+        self.char2.stats.set(*STRENGTH, 5)
+        importer = SheetImport(self.path, chunk_size=1)
+        self.assertEqual(importer.run(), self.lines)
+        self.assertEqual((self.strength(self.char1), self.strength(self.char2)), (2, 4))
+        self.assertEqual(read_progress(self.path), self.lines)
+
+    def test_interrupted_import_resumes_after_the_last_chunk(self):
+        self.char1.stats.set(*STRENGTH, 5)
+        self.char2.stats.set(*STRENGTH, 5)
+        apply_chunk = SheetImport.apply_chunk
+        calls = []
+
+        def crash_on_second_chunk(importer, records):
+            calls.append(records)
+            if len(calls) == 2:
+                raise RuntimeError("server went away")
+            return apply_chunk(importer, records)
+
+        with patch.object(SheetImport, 'apply_chunk', crash_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                SheetImport(self.path, chunk_size=1).run()
+        self.assertEqual(read_progress(self.path), 1)
+        self.assertEqual(self.strength(self.char1), 2)
+        self.assertEqual(self.strength(self.char2), 5)
+
+        importer = SheetImport(self.path, chunk_size=1)
+        self.assertEqual(importer.run(), self.lines - 1)
+        self.assertEqual(importer.skipped, 1)
+        self.assertEqual(read_progress(self.path), self.lines)
+        self.assertEqual(self.strength(self.char2), 4)
+
+    def test_import_without_resume_starts_over(self):
+        SheetImport(self.path, chunk_size=1).run()
+        importer = SheetImport(self.path, chunk_size=1, resume=False)
+        self.assertEqual(importer.run(), self.lines)
+        self.assertEqual(importer.skipped, 0)
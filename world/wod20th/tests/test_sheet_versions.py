@@ -0,0 +1,112 @@
+import copy
+from unittest import TestCase
+
+from evennia.utils.test_resources import EvenniaTest
+
+from world.wod20th.models import SheetVersion
+from world.wod20th.sheet_versions import (
+    apply_diff, current_sheet, diff_sheets, record_version, restore_version, sheet_at,
+)
+
+
+def leaf(perm, temp=None):
+    return {'perm': perm, 'temp': perm if temp is None else temp}
+
+
+SHEET = {
+    'attributes': {
+        'physical': {'Strength': leaf(2), 'Dexterity': leaf(3), 'Stamina': leaf(2)},
+        'social': {'Charisma': leaf(1), 'Manipulation': leaf(2), 'Appearance': leaf(2)},
+    },
+    'abilities': {'talent': {'Brawl': leaf(1)}},
+}
+
+
+class TestDiffSheets(TestCase):
+    def test_diff_holds_only_changed_stats(self):
+        new = copy.deepcopy(SHEET)
+        new['attributes']['physical']['Strength'] = leaf(3)
+        new['abilities']['talent']['Alertness'] = leaf(2)
+        del new['abilities']['talent']['Brawl']
+        self.assertEqual(diff_sheets(SHEET, new), {
+            'attributes': {'physical': {'Strength': leaf(3)}},
+            'abilities': {'talent': {'Alertness': leaf(2), 'Brawl': None}},
+        })
+
+    def test_apply_diff_round_trips(self):
+        new = copy.deepcopy(SHEET)
+        new['attributes']['social']['Charisma'] = leaf(4, 2)
+        del new['attributes']['physical']['Stamina']
+        new['backgrounds'] = {'background': {'Resources': leaf(3)}}
+        self.assertEqual(apply_diff(SHEET, diff_sheets(SHEET, new)), new)
+
+    def test_apply_diff_leaves_the_sheet_alone(self):
+        before = copy.deepcopy(SHEET)
+        apply_diff(SHEET, {'attributes': {'physical': {'Strength': None}}})
+        self.assertEqual(SHEET, before)
+
+    def test_identical_sheets_have_no_diff(self):
+        self.assertEqual(diff_sheets(SHEET, copy.deepcopy(SHEET)), {})
+
+
+class TestSheetVersions(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.set_sheet(SHEET)
+
+    def set_sheet(self, sheet):
+        with self.char1.stats.batch():
+            self.char1.stats.replace(copy.deepcopy(sheet))
+
+    def set_strength(self, value):
+        with self.char1.stats.batch():
+            self.char1.stats.set('attributes', 'physical', 'Strength', value)
+
+    def test_current_sheet_is_detached(self):
+        sheet = current_sheet(self.char1)
+        sheet['attributes']['physical']['Strength']['perm'] = 5
+        self.assertEqual(self.char1.stats.get('attributes', 'physical', 'Strength'), 2)
+
+    def test_no_versions_before_approval(self):
+        self.assertIsNone(record_version(self.char1, reason="+stats"))
+        self.assertFalse(SheetVersion.objects.filter(character_id=self.char1.id).exists())
+
+    def test_edits_after_approval_store_diffs(self):
+        base = record_version(self.char1, approval=True)
+        self.assertTrue(base.is_base)
+        self.set_strength(3)
+        version = record_version(self.char1, reason="+stats")
+        self.assertFalse(version.is_base)
+        self.assertEqual(version.base_version, base.version)
+        self.assertEqual(version.stats, {'attributes': {'physical': {'Strength': leaf(3, 2)}}})
+        self.assertEqual(sheet_at(self.char1, version.version), current_sheet(self.char1))
+        self.assertEqual(sheet_at(self.char1, base.version), SHEET)
+
+    def test_unchanged_sheet_is_not_recorded_again(self):
+        record_version(self.char1, approval=True)
+        self.assertIsNone(record_version(self.char1))
+        self.set_strength(3)
+        self.assertIsNotNone(record_version(self.char1))
+        self.assertIsNone(record_version(self.char1))
+
+    def test_large_diff_stores_a_new_base(self):
+        record_version(self.char1, approval=True)
+        sheet = copy.deepcopy(SHEET)
+        for names in sheet['attributes'].values():
+            for name in names:
+                names[name] = leaf(4)
+        self.set_sheet(sheet)
+        version = record_version(self.char1)
+        self.assertTrue(version.is_base)
+        self.assertEqual(version.stats, sheet)
+
+    def test_restore_version(self):
+        base = record_version(self.char1, approval=True)
+        self.set_strength(4)
+        record_version(self.char1)
+        self.assertTrue(restore_version(self.char1, base.version, actor="Staff"))
+        self.assertEqual(current_sheet(self.char1), SHEET)
+        latest = SheetVersion.objects.filter(character_id=self.char1.id).order_by('-version').first()
+        self.assertEqual(latest.reason, f"restored sheet version {base.version}")
+        self.assertEqual(sheet_at(self.char1, latest.version), SHEET)
+        self.assertFalse(restore_version(self.char1, 99))
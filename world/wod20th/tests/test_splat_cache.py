@@ -0,0 +1,40 @@
+from evennia.utils.test_resources import EvenniaTest
+
+SPLAT = ('other', 'splat', 'Splat')
+
+
+class TestSplatCache(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.char1.set_stat(*SPLAT, 'Vampire')
+        self.assertEqual(self.char1.get_splat(), 'Vampire')
+
+    def test_set_stat(self):
+        self.char1.set_stat(*SPLAT, 'Mage')
+        self.assertEqual(self.char1.get_splat(), 'Mage')
+
+    def test_direct_write(self):
+        self.char1.db.stats['other']['splat']['Splat']['perm'] = 'Shifter'
+        self.assertEqual(self.char1.get_splat(), 'Shifter')
+
+    def test_reset(self):
+        self.char1.db.stats = {}
+        self.assertEqual(self.char1.get_splat(), '')
+
+    def test_replace(self):
+        with self.char1.stats.batch():
+            self.char1.stats.replace({'other': {'splat': {'Splat': {'perm': 'Changeling', 'temp': ''}}}})
+        self.assertEqual(self.char1.get_splat(), 'Changeling')
+
+    def test_rollback(self):
+        with self.assertRaises(RuntimeError):
+            with self.char1.stats.batch():
+                self.char1.set_stat(*SPLAT, 'Mortal')
+                self.assertEqual(self.char1.get_splat(), 'Mortal')
+                raise RuntimeError("abort")
+        self.assertEqual(self.char1.get_splat(), 'Vampire')
+
+    def test_other_stats_keep_the_cache(self):
+        self.char1.ndb.splat = 'cached'
+        self.char1.set_stat('attributes', 'physical', 'Strength', 3)
+        self.assertEqual(self.char1.get_splat(), 'cached')
@@ -0,0 +1,179 @@
+from types import SimpleNamespace
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from evennia.utils import create
+from evennia.utils.test_resources import EvenniaTest
+
+from world.wod20th.models import CharacterStat
+from world.wod20th.stat_schema import StatValueError, normalize_character
+from world.wod20th.stat_store import StatHandler, TrackedDict, bulk_write, load_many
+
+STRENGTH = ('attributes', 'physical', 'Strength')
+DEXTERITY = ('attributes', 'physical', 'Dexterity')
+
+SHEET = {
+    'attributes': {'physical': {
+        'Strength': {'perm': 2, 'temp': 2},
+        'Dexterity': {'perm': 3, 'temp': 3},
+    }},
+    'abilities': {'talent': {'Brawl': {'perm': 1, 'temp': 1}}},
+}
+
+
+class StatHandlerTests:
+    """
+    Run against each backend by the subclasses below.
+    """
+    backend = None
+
+    def setUp(self):
+        super().setUp()
+        override = override_settings(WOD20TH_STAT_BACKEND=self.backend)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.character = self.make_character("Sheet")
+        self.handler = self.character.stats
+
+    def make_character(self, key):
+        character = create.create_object("typeclasses.characters.Character", key=key, location=self.room1)
+        character.stats.replace(SHEET)
+        return character
+
+    def saved(self, character=None, temp=False, stat=STRENGTH):
+        # A new handler reads only what was written
+        return StatHandler(character or self.character).get(*stat, temp=temp)
+
+    def test_backend(self):
+        self.assertEqual(self.handler.backend, self.backend)
+
+    def test_set_is_saved(self):
+        version = self.handler.version
+        self.handler.set(*STRENGTH, 4)
+        self.handler.set(*STRENGTH, 3, temp=True)
+        self.assertEqual((self.saved(), self.saved(temp=True)), (4, 3))
+        self.assertGreater(self.handler.version, version)
+
+    def test_nested_edits_through_db_stats_are_saved(self):
+        stats = self.character.db.stats
+        self.assertIsInstance(stats['attributes']['physical'], TrackedDict)
+        stats['attributes']['physical']['Strength']['temp'] = 5
+        stats['abilities']['talent']['Alertness'] = {'perm': 2, 'temp': 2}
+        del stats['attributes']['physical']['Dexterity']
+        self.assertEqual(self.saved(temp=True), 5)
+        self.assertEqual(self.saved(stat=('abilities', 'talent', 'Alertness')), 2)
+        self.assertIsNone(self.saved(stat=DEXTERITY))
+
+    def test_assigning_db_stats_replaces_the_sheet(self):
+        self.character.db.stats = {'attributes': {'physical': {'Strength': {'perm': 5, 'temp': 5}}}}
+        self.assertEqual(self.saved(), 5)
+        self.assertIsNone(self.saved(stat=DEXTERITY))
+        self.assertEqual(StatHandler(self.character).all().copy(), self.handler.all().copy())
+
+    def test_batch_saves_on_exit(self):
+        with self.handler.batch(reason="test"):
+            self.handler.set(*STRENGTH, 4)
+            self.handler.set(*DEXTERITY, 1)
+            self.assertEqual(self.saved(), 2)
+        self.assertEqual((self.saved(), self.saved(stat=DEXTERITY)), (4, 1))
+
+    def test_batch_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.handler.batch():
+                self.handler.set(*STRENGTH, 4)
+                with self.handler.batch():
+                    self.character.db.stats['attributes']['physical']['Dexterity']['perm'] = 5
+                raise RuntimeError("abort")
+        self.assertEqual(self.handler.get(*STRENGTH), 2)
+        self.assertEqual(self.handler.get(*DEXTERITY), 3)
+        self.assertEqual((self.saved(), self.saved(stat=DEXTERITY)), (2, 3))
+        # The handler still works after a rollback
+        self.handler.set(*STRENGTH, 3)
+        self.assertEqual(self.saved(), 3)
+
+    def test_bulk_write_defers_saves_until_exit(self):
+        other = self.make_character("Other")
+        with bulk_write():
+            for character in (self.character, other):
+                with character.stats.batch():
+                    character.stats.set(*STRENGTH, 5)
+            self.assertEqual(self.saved(), 2)
+        self.assertEqual((self.saved(), self.saved(other)), (5, 5))
+
+    def test_numeric_strings_are_stored_as_ints(self):
+        self.character.db.stats['attributes']['physical']['Strength']['perm'] = '4'
+        self.assertIs(self.saved(), 4)
+
+    def test_non_numeric_write_is_rejected(self):
+        stats = self.character.db.stats
+        with self.assertRaises(StatValueError):
+            stats['attributes']['physical']['Strength']['perm'] = 'lots'
+        with self.assertRaises(StatValueError):
+            stats['attributes']['physical']['Stamina'] = {'perm': 'lots'}
+        self.assertEqual((self.handler.get(*STRENGTH), self.saved()), (2, 2))
+        self.assertNotIn('Stamina', self.handler.all()['attributes']['physical'])
+        self.assertIsNone(self.saved(stat=('attributes', 'physical', 'Stamina')))
+
+    def test_non_numeric_write_rolls_back_the_batch(self):
+        with self.assertRaises(StatValueError):
+            with self.handler.batch():
+                self.handler.set(*DEXTERITY, 4)
+                self.character.db.stats['attributes']['physical']['Strength']['temp'] = 'lots'
+        self.assertEqual((self.saved(stat=DEXTERITY), self.saved(temp=True)), (3, 2))
+
+    def test_load_many(self):
+        other = self.make_character("Other")
+        other.stats.set(*STRENGTH, 4)
+        holders = [SimpleNamespace(stats=StatHandler(self.character)),
+                   SimpleNamespace(stats=StatHandler(other))]
+        load_many(holders)
+        self.assertEqual([holder.stats.get(*STRENGTH) for holder in holders], [2, 4])
+
+
+class TestAttributeBackend(StatHandlerTests, EvenniaTest):
+    backend = "attribute"
+
+    def test_stats_are_kept_in_the_attribute(self):
+        self.handler.set(*STRENGTH, 4)
+        self.assertEqual(self.character.attributes.get('stats')['attributes']['physical']['Strength']['perm'], 4)
+        self.assertFalse(CharacterStat.objects.filter(character_id=self.character.id).exists())
+
+
+class TestTableBackend(StatHandlerTests, EvenniaTest):
+    backend = "table"
+
+    def test_stats_are_kept_in_rows(self):
+        self.handler.set(*STRENGTH, 4)
+        row = CharacterStat.objects.get(character_id=self.character.id, name='Strength')
+        self.assertEqual((row.category, row.stat_type, row.perm, row.temp), ('attributes', 'physical', 4, 2))
+
+    def test_load_many_reads_every_character_in_one_query(self):
+        others = [self.make_character(f"Other{number}") for number in range(3)]
+        holders = [SimpleNamespace(stats=StatHandler(character)) for character in others]
+        with CaptureQueriesContext(connection) as queries:
+            load_many(holders)
+        reads = [query for query in queries.captured_queries
+                 if query['sql'].startswith('SELECT') and CharacterStat._meta.db_table in query['sql']]
+        self.assertEqual(len(reads), 1)
+        self.assertEqual([holder.stats.get(*STRENGTH) for holder in holders], [2, 2, 2])
+
+    def test_legacy_attribute_is_imported_once(self):
+        legacy = create.create_object("typeclasses.characters.Character", key="Legacy", location=self.room1)
+        legacy.attributes.add('stats', {'attributes': {'physical': {'Strength': {'perm': 4, 'temp': 4}}}})
+        self.assertEqual(self.saved(legacy), 4)
+        self.assertTrue(CharacterStat.objects.filter(character_id=legacy.id, name='Strength').exists())
+
+    def test_emptied_sheet_stays_empty(self):
+        self.character.attributes.add('stats', {'attributes': {'physical': {'Strength': {'perm': 4, 'temp': 4}}}})
+        self.character.db.stats = {}
+        self.assertFalse(CharacterStat.objects.filter(character_id=self.character.id).exists())
+        self.assertEqual(StatHandler(self.character).all().copy(), {})
+
+    def test_dry_run_normalize_writes_nothing(self):
+        legacy = create.create_object("typeclasses.characters.Character", key="Legacy", location=self.room1)
+        legacy.attributes.add('stats', {'attributes': {'physical': {'Strength': {'perm': '4', 'temp': 'x'}}}})
+        converted, anomalies = normalize_character(legacy, write=False)
+        self.assertEqual((converted, len(anomalies)), (1, 1))
+        self.assertFalse(CharacterStat.objects.filter(character_id=legacy.id).exists())
+        self.assertFalse(legacy.attributes.has('stats_in_table'))
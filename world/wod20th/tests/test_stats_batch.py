@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock, patch
+
+from evennia.utils.test_resources import EvenniaTest
+
+from commands.CmdSetStats import CmdStats
+
+
+class TestStatsBatchMessages(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.cmd = CmdStats()
+        self.cmd.caller = self.char1
+        self.char1.msg = MagicMock()
+        self.char2.msg = MagicMock()
+
+    def fake_change(self, results):
+        results = iter(results)
+
+        def apply_stat_change(character):
+            ok = next(results)
+            if ok:
+                self.cmd.report(self.cmd.caller, f"|gUpdated {self.cmd.stat_name}.|n")
+                self.cmd.report(character, f"{self.cmd.stat_name} changed.")
+            return ok
+        return apply_stat_change
+
+    def sent(self, obj):
+        return [call.args[0] for call in obj.msg.call_args_list]
+
+    def test_aborted_batch_reports_no_changes(self):
+        self.cmd.batch = [("Strength", "3"), ("Dexterity", "2")]
+        with patch.object(self.cmd, 'apply_stat_change', side_effect=self.fake_change([True, False])):
+            self.cmd.apply_batch(self.char2)
+        self.assertEqual(self.sent(self.char2), [])
+        self.assertFalse(any("Updated" in text for text in self.sent(self.char1)))
+        self.assertIn("No changes were made", self.sent(self.char1)[-1])
+
+    @patch('commands.CmdSetStats.record_version')
+    def test_saved_batch_reports_changes(self, _):
+        self.cmd.batch = [("Strength", "3"), ("Dexterity", "2")]
+        with patch.object(self.cmd, 'apply_stat_change', side_effect=self.fake_change([True, True])):
+            self.cmd.apply_batch(self.char2)
+        self.assertEqual(self.sent(self.char2), ["Strength changed.", "Dexterity changed."])
+        self.assertIn("Applied 2 stat changes", self.sent(self.char1)[-1])
+        self.assertIsNone(self.cmd.held_messages)
@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+from evennia import create_script
+from evennia.utils.test_resources import EvenniaTest
+
+from world.wod20th import timers
+from world.wod20th.timers import EXPIRY_HANDLERS, RETRY_DELAY, ModifierScheduler
+
+
+class TestModifierScheduler(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.now = 1000.0
+        patcher = patch.object(timers.time, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.expired = []
+        self.failures = 0
+        self.failing = set()
+        EXPIRY_HANDLERS['test'] = self._handler
+        self.addCleanup(EXPIRY_HANDLERS.pop, 'test', None)
+        self.scheduler = create_script(ModifierScheduler, key="TestScheduler", autostart=False)
+
+    def _handler(self, character, modifier):
+        if self.failures or modifier['name'] in self.failing:
+            self.failures = max(self.failures - 1, 0)
+            self.failing.discard(modifier['name'])
+            raise RuntimeError("expiry failed")
+        if modifier.get('stat'):
+            # Saved at once, outside the stat batch
+            character.overlays.adjust('pump', modifier['stat'], -1)
+        self.expired.append(modifier['name'])
+
+    def tick(self, seconds):
+        self.now += seconds
+        self.scheduler.at_repeat()
+
+    def test_expires_in_order_when_due(self):
+        self.scheduler.add(self.char1, 30, 'test', name='third')
+        self.scheduler.add(self.char1, 10, 'test', name='first')
+        self.scheduler.add(self.char2, 20, 'test', name='second')
+        self.tick(5)
+        self.assertEqual(self.expired, [])
+        self.tick(10)
+        self.assertEqual(self.expired, ['first'])
+        self.tick(20)
+        self.assertEqual(sorted(self.expired), ['first', 'second', 'third'])
+        self.assertEqual(self.scheduler.pending(self.char1), [])
+
+    def test_cancelled_modifiers_do_not_expire(self):
+        self.scheduler.add(self.char1, 10, 'test', name='boost', source='+pump')
+        self.assertEqual(self.scheduler.cancel(self.char1, source='+pump'), 1)
+        self.tick(20)
+        self.assertEqual(self.expired, [])
+
+    def test_failed_expiry_is_retried(self):
+        self.scheduler.add(self.char1, 10, 'test', name='boost')
+        self.failures = 1
+        self.tick(10)
+        self.assertEqual(self.expired, [])
+        # Still scheduled, and saved as such
+        self.assertEqual(len(self.scheduler.pending(self.char1)), 1)
+        self.assertEqual(len(self.scheduler.db.modifiers), 1)
+        self.assertTrue(any(entry[0] == self.now + RETRY_DELAY for entry in self.scheduler.db.heap))
+
+        self.tick(RETRY_DELAY - 1)
+        self.assertEqual(self.expired, [])
+        self.tick(1)
+        self.assertEqual(self.expired, ['boost'])
+        self.assertEqual(self.scheduler.pending(self.char1), [])
+
+    def test_gives_up_after_max_retries(self):
+        self.scheduler.add(self.char1, 10, 'test', name='boost')
+        self.failures = timers.MAX_RETRIES + 1
+        self.tick(10)
+        for _ in range(timers.MAX_RETRIES):
+            self.tick(RETRY_DELAY)
+        self.assertEqual(self.expired, [])
+        self.assertEqual(self.scheduler.pending(self.char1), [])
+
+    def test_failed_modifier_does_not_rerun_the_others(self):
+        strength = ('attributes', 'physical', 'Strength')
+        self.char1.overlays.set_layer('pump', {strength: 1})
+        self.scheduler.add(self.char1, 10, 'test', name='first', stat=strength)
+        self.scheduler.add(self.char1, 10, 'test', name='second')
+        self.failing = {'second'}
+        self.tick(10)
+        self.assertEqual(self.expired, ['first'])
+        self.assertEqual([modifier['name'] for modifier in self.scheduler.pending(self.char1)], ['second'])
+
+        self.tick(RETRY_DELAY)
+        self.assertEqual(self.expired, ['first', 'second'])
+        # The boost was taken off once
+        self.assertEqual(self.char1.overlays.modifier(*strength), 0)
+        self.assertEqual(self.scheduler.pending(self.char1), [])
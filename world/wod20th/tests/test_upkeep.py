@@ -0,0 +1,53 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from evennia import create_script
+from evennia.utils.test_resources import EvenniaTest
+
+from world.wod20th import upkeep
+from world.wod20th.upkeep import PoolUpkeepScript, UpkeepRun
+
+
+def _now(callback, *args, **kwargs):
+    callback(*args, **kwargs)
+
+
+@patch.object(upkeep, 'delay', _now)
+@patch.object(upkeep, 'search_channel', lambda name: [])
+class TestUpkeepResume(EvenniaTest):
+    def setUp(self):
+        super().setUp()
+        self.script = create_script(PoolUpkeepScript, key="TestUpkeep", autostart=False)
+        self.done = []
+        patcher = patch.object(UpkeepRun, 'run_chunk', lambda run, ids: self.done.extend(ids))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_finished_run_marks_the_day(self):
+        self.script.run()
+        self.assertIn(self.char1.id, self.done)
+        self.assertEqual(self.script.db.last_run, datetime.now().date())
+        self.assertIsNone(self.script.db.progress)
+        self.assertFalse(self.script.ndb.running)
+
+    def test_interrupted_run_resumes(self):
+        first, second = sorted([self.char1.id, self.char2.id])
+        # A run of today's was interrupted after the first character
+        self.script.db.progress = {'date': datetime.now().date(), 'after': first}
+        self.script.run()
+        self.assertNotIn(first, self.done)
+        self.assertIn(second, self.done)
+        self.assertEqual(self.script.db.last_run, datetime.now().date())
+
+    def test_progress_from_another_day_starts_over(self):
+        self.script.db.progress = {'date': datetime(2000, 1, 1).date(), 'after': max(self.char1.id, self.char2.id)}
+        self.script.run()
+        self.assertIn(self.char1.id, self.done)
+        self.assertIn(self.char2.id, self.done)
+
+    def test_chunk_size_follows_the_backend(self):
+        with self.settings(WOD20TH_STAT_BACKEND="attribute"):
+            self.assertEqual(UpkeepRun().chunk_size, upkeep.ATTRIBUTE_CHUNK_SIZE)
+        with self.settings(WOD20TH_STAT_BACKEND="table"):
+            self.assertEqual(UpkeepRun().chunk_size, upkeep.CHUNK_SIZE)
+        self.assertEqual(UpkeepRun(chunk_size=1).chunk_size, 1)
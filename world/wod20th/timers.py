@@ -0,0 +1,283 @@
+# world/wod20th/timers.py
+"""
+Timed modifiers: temporary boosts and effects that end on their own, such
+as a +pump or a shapeshifted form with a duration.
+
+Every pending expiry lives in one persistent ModifierScheduler script as a
+min-heap of (expires_at, character id, modifier id), so a thousand boosts
+cost one ticking script rather than a thousand reactor timers, and they
+survive reloads. Each tick pops everything that is due and expires each
+modifier in its own stat batch. A modifier stays scheduled until its
+expiry succeeds; one that fails is retried after RETRY_DELAY. Handlers
+also write things a stat batch can't roll back (overlays, messages), so
+one modifier failing never makes the others due with it run again.
+
+    schedule(character, 3600, 'overlay', layer='pump',
+             stat=('attributes', 'physical', 'Strength'), amount=2, source='+pump')
+
+What happens on expiry depends on the modifier's kind; new kinds are
+registered with the @expiry_handler(kind) decorator.
+"""
+import heapq
+import time
+
+from evennia import DefaultScript, create_script
+from evennia.scripts.models import ScriptDB
+from evennia.utils import logger
+
+from world.wod20th.overlays import FORM_LAYER
+
+SCRIPT_KEY = "ModifierScheduler"
+# Seconds between checks for expired modifiers
+TICK = 10
+# A modifier whose expiry fails is tried again after this many seconds,
+# up to MAX_RETRIES times
+RETRY_DELAY = 60
+MAX_RETRIES = 10
+
+# Attributes a shapeshifted form may change
+FORM_ATTRIBUTES = [
+    'strength', 'dexterity', 'stamina', 'charisma', 'manipulation', 'appearance',
+    'perception', 'intelligence', 'wits',
+]
+
+EXPIRY_HANDLERS = {}
+
+
+def expiry_handler(kind):
+    """
+    Register the decorated function to end modifiers of `kind`. It is
+    called with the character and the modifier's data dict, inside a stat
+    batch for that character.
+    """
+    def decorator(func):
+        EXPIRY_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+class ModifierScheduler(DefaultScript):
+    """
+    Holds every pending timed modifier and expires them as they come due.
+    """
+
+    def at_script_creation(self):
+        self.key = SCRIPT_KEY
+        self.desc = "Expires timed stat modifiers"
+        self.interval = TICK
+        self.persistent = True
+        self.db.heap = []
+        self.db.modifiers = {}
+        self.db.next_id = 1
+
+    def _state(self):
+        # Work on plain copies and save them back once per change, rather
+        # than re-saving the Attribute on every heap operation.
+        if self.ndb.heap is None:
+            heap = [tuple(entry) for entry in self.db.heap or []]
+            heapq.heapify(heap)
+            self.ndb.heap = heap
+            self.ndb.modifiers = dict(self.db.modifiers or {})
+        return self.ndb.heap, self.ndb.modifiers
+
+    def _save(self, pending=()):
+        """
+        Save the heap and modifiers. `pending` lists heap entries popped but
+        not yet expired, which are saved with the heap so a reload part way
+        through a tick doesn't lose them.
+        """
+        heap, modifiers = self._state()
+        # Drop cancelled entries so the saved heap doesn't grow without bound
+        if len(heap) > 2 * len(modifiers) + 16:
+            heap[:] = [entry for entry in heap if entry[2] in modifiers]
+            heapq.heapify(heap)
+        self.db.heap = list(heap) + list(pending)
+        self.db.modifiers = modifiers
+
+    def add(self, character, duration, kind, **data):
+        """
+        Schedule a modifier of `kind` on `character` to expire after
+        `duration` seconds. Returns the modifier id.
+        """
+        if kind not in EXPIRY_HANDLERS:
+            raise ValueError(f"Unknown modifier kind '{kind}'.")
+        heap, modifiers = self._state()
+        modifier_id = self.db.next_id or 1
+        self.db.next_id = modifier_id + 1
+        expires_at = time.time() + duration
+        modifiers[modifier_id] = dict(data, kind=kind, character=character, expires_at=expires_at)
+        heapq.heappush(heap, (expires_at, character.id, modifier_id))
+        self._save()
+        return modifier_id
+
+    def cancel(self, character, kind=None, source=None):
+        """
+        Drop a character's pending modifiers, optionally only those of one
+        kind or source, without running their expiry. Returns how many were
+        dropped.
+        """
+        heap, modifiers = self._state()
+        found = [
+            modifier_id for modifier_id, modifier in modifiers.items()
+            if modifier['character'] == character
+            and (kind is None or modifier['kind'] == kind)
+            and (source is None or modifier.get('source') == source)
+        ]
+        for modifier_id in found:
+            # Its heap entry is skipped when it comes due
+            del modifiers[modifier_id]
+        if found:
+            self._save()
+        return len(found)
+
+    def pending(self, character):
+        """
+        Return a character's pending modifiers, soonest first.
+        """
+        _, modifiers = self._state()
+        return sorted(
+            (modifier for modifier in modifiers.values() if modifier['character'] == character),
+            key=lambda modifier: modifier['expires_at'],
+        )
+
+    def at_repeat(self):
+        heap, modifiers = self._state()
+        now = time.time()
+        due = []
+        while heap and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            if entry[2] in modifiers:
+                due.append(entry)
+
+        # A modifier is only removed once its expiry has run; if it fails
+        # it alone is tried again after RETRY_DELAY.
+        for position, entry in enumerate(due):
+            modifier_id = entry[2]
+            modifier = modifiers.get(modifier_id)
+            if modifier is None:
+                # Cancelled by an expiry earlier in this tick
+                continue
+            character = modifier['character']
+            if character and not self._expire(character, modifier):
+                modifier['retries'] = modifier.get('retries', 0) + 1
+                if modifier['retries'] > MAX_RETRIES:
+                    logger.log_err(f"Giving up on expiring {modifier['kind']} modifier "
+                                   f"{modifier_id} on {character} after {MAX_RETRIES} retries.")
+                    del modifiers[modifier_id]
+                else:
+                    heapq.heappush(heap, (now + RETRY_DELAY, entry[1], modifier_id))
+            else:
+                # Expired, or the character was deleted since it was scheduled
+                modifiers.pop(modifier_id, None)
+            self._save(pending=due[position + 1:])
+
+    @staticmethod
+    def _expire(character, modifier):
+        """
+        Run one modifier's expiry in a stat batch. Returns False, after
+        logging the error, if it failed.
+        """
+        try:
+            with character.stats.batch(reason="modifier expired"):
+                EXPIRY_HANDLERS[modifier['kind']](character, modifier)
+        except Exception:
+            logger.log_trace(f"Error expiring {modifier['kind']} modifier on {character}.")
+            return False
+        return True
+
+
+@expiry_handler('overlay')
+def _expire_overlay(character, modifier):
+    """
+    Take `amount` back out of a stat's modifier in an overlay layer.
+    """
+    stat = modifier['stat']
+    character.overlays.adjust(modifier['layer'], stat, -modifier['amount'])
+    if modifier.get('message'):
+        value = character.overlays.effective(*stat)
+        character.msg(modifier['message'].format(name=stat[2], value=value))
+
+
+@expiry_handler('stat')
+def _expire_stat(character, modifier):
+    """
+    Take `amount` back off a stat's temp value, never past its perm value.
+    """
+    category, stat_type, name = modifier['stat']
+    amount = modifier['amount']
+    base = character.stats.get(category, stat_type, name) or 0
+    current = character.stats.get(category, stat_type, name, temp=True)
+    if current is None:
+        current = base
+    value = current - amount
+    value = max(value, base) if amount > 0 else min(value, base)
+    character.set_stat(category, stat_type, name, value, temp=True)
+    if modifier.get('message'):
+        character.msg(modifier['message'].format(name=name, value=value))
+
+
+def reset_form_stats(character):
+    """
+    Set the temp value of every attribute a form can change back to its
+    perm value. Forms are an overlay now; this clears temp values left
+    by forms assumed before that.
+    """
+    from world.wod20th.catalog import STAT_CATALOG
+
+    for stat in FORM_ATTRIBUTES:
+        stat_obj = next(iter(STAT_CATALOG.filter(name=stat, category='attributes')), None)
+        if stat_obj and stat_obj.category and stat_obj.stat_type:
+            perm = character.get_stat(stat_obj.category, stat_obj.stat_type, stat_obj.name)
+            character.set_stat(stat_obj.category, stat_obj.stat_type, stat_obj.name, perm, temp=True)
+
+
+@expiry_handler('form')
+def _expire_form(character, modifier):
+    """
+    Return a character to their natural form when a timed form runs out.
+    """
+    if character.db.current_form != modifier.get('form'):
+        return
+    character.overlays.remove_layer(FORM_LAYER)
+    character.db.current_form = None
+    character.msg(f"|yYour {modifier['form']} form fades and you return to your natural shape.|n")
+
+
+def init_modifier_scheduler():
+    try:
+        scheduler = ScriptDB.objects.get(db_key=SCRIPT_KEY)
+    except ScriptDB.DoesNotExist:
+        scheduler = create_script(ModifierScheduler, key=SCRIPT_KEY)
+    except ScriptDB.MultipleObjectsReturned:
+        schedulers = ScriptDB.objects.filter(db_key=SCRIPT_KEY)
+        scheduler = schedulers.first()
+        for extra in schedulers[1:]:
+            extra.delete()
+
+    if scheduler and not scheduler.is_active:
+        scheduler.start()
+    return scheduler
+
+
+def get_scheduler():
+    """
+    Return the ModifierScheduler script, creating it if needed.
+    """
+    try:
+        return ScriptDB.objects.get(db_key=SCRIPT_KEY)
+    except (ScriptDB.DoesNotExist, ScriptDB.MultipleObjectsReturned):
+        return init_modifier_scheduler()
+
+
+def schedule(character, duration, kind, **data):
+    """
+    Schedule a timed modifier; see ModifierScheduler.add.
+    """
+    return get_scheduler().add(character, duration, kind, **data)
+
+
+def cancel(character, kind=None, source=None):
+    """
+    Drop pending timed modifiers; see ModifierScheduler.cancel.
+    """
+    return get_scheduler().cancel(character, kind=kind, source=source)
@@ -0,0 +1,251 @@
+# world/wod20th/upkeep.py
+"""
+Nightly pool upkeep: regeneration and decay of Willpower, Blood, Gnosis,
+Glamour and Quintessence for every character, in one pass.
+
+Each rule is registered with @upkeep_rule and changes one character's
+pools, returning True if it changed anything. The PoolUpkeepScript runs
+them once a day after UPKEEP_HOUR (server time). Characters are handled a
+chunk at a time: each chunk's stats are loaded together, every change in
+it is saved in one bulk write, and the reactor gets control back between
+chunks. Only the table backend turns that into a few bulk statements; the
+attribute backend still reads and saves each character's Attribute on its
+own, so its chunks are much smaller to keep each reactor turn short. The run's position is saved after each chunk, and the day
+only counts as done when the run finishes, so a reload part way through
+resumes where it stopped. When the run finishes, one digest goes to the
+mudinfo channel.
+"""
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from evennia import DefaultScript, create_script
+from evennia.scripts.models import ScriptDB
+from evennia.utils import logger
+from evennia.utils.search import search_channel
+from evennia.utils.utils import delay
+
+from world.wod20th.ledger import LEDGER
+from world.wod20th.stat_store import TABLE_BACKEND, bulk_write, load_many, stat_backend
+
+SCRIPT_KEY = "PoolUpkeep"
+# Server-time hour after which the day's upkeep runs
+UPKEEP_HOUR = 4
+# Characters loaded and written at a time, under the table backend
+CHUNK_SIZE = 500
+# ... and under the attribute backend, which does a query per character
+ATTRIBUTE_CHUNK_SIZE = 25
+
+UpkeepRule = namedtuple('UpkeepRule', ['name', 'splat', 'label', 'apply'])
+
+UPKEEP_RULES = []
+
+
+def upkeep_rule(name, label, splat=None):
+    """
+    Register the decorated function as an upkeep rule. It takes a character
+    and returns True if it changed something; `label` describes that in
+    the digest. With `splat` it only runs for characters of that splat.
+    """
+    def decorator(func):
+        UPKEEP_RULES.append(UpkeepRule(name, splat, label, func))
+        return func
+    return decorator
+
+
+def _pool(character, name):
+    stats = character.stats
+    return stats.get('pools', 'dual', name), stats.get('pools', 'dual', name, temp=True)
+
+
+@upkeep_rule('willpower', "Willpower refreshed")
+def _refresh_willpower(character):
+    perm, temp = _pool(character, 'Willpower')
+    if perm is None or temp is None or temp >= perm:
+        return False
+    character.stats.set('pools', 'dual', 'Willpower', perm, temp=True)
+    return True
+
+
+@upkeep_rule('blood', "Blood spent rising", splat='Vampire')
+def _spend_blood(character):
+    _, temp = _pool(character, 'Blood')
+    if not temp or temp <= 0:
+        return False
+    character.stats.set('pools', 'dual', 'Blood', temp - 1, temp=True)
+    return True
+
+
+def _regain(character, name, amount=1):
+    perm, temp = _pool(character, name)
+    if perm is None or temp is None or temp >= perm or amount <= 0:
+        return False
+    character.stats.set('pools', 'dual', name, min(temp + amount, perm), temp=True)
+    return True
+
+
+@upkeep_rule('gnosis', "Gnosis regained", splat='Shifter')
+def _regain_gnosis(character):
+    return _regain(character, 'Gnosis')
+
+
+@upkeep_rule('glamour', "Glamour regained", splat='Changeling')
+def _regain_glamour(character):
+    return _regain(character, 'Glamour')
+
+
+@upkeep_rule('quintessence', "Quintessence drawn through the Avatar", splat='Mage')
+def _regain_quintessence(character):
+    avatar = character.stats.get('backgrounds', 'background', 'Avatar') or 0
+    return _regain(character, 'Quintessence', avatar)
+
+
+class UpkeepRun:
+    """
+    One pass of the upkeep rules over every character.
+    """
+
+    def __init__(self, chunk_size=None, on_finish=None, on_chunk=None, after=0):
+        if chunk_size is None:
+            chunk_size = CHUNK_SIZE if stat_backend() == TABLE_BACKEND else ATTRIBUTE_CHUNK_SIZE
+        self.chunk_size = chunk_size
+        self.on_finish = on_finish
+        self.on_chunk = on_chunk
+        # Characters up to this id were done by an earlier, interrupted run
+        self.after = after
+        self.resumed = after
+        self.ids = []
+        self.position = 0
+        self.characters = 0
+        self.changed = 0
+        self.counts = Counter()
+        self.errors = 0
+        self.started = None
+
+    def start(self):
+        from typeclasses.characters import Character
+
+        self.started = time.time()
+        self.ids = list(Character.objects.all_family().filter(id__gt=self.after)
+                        .order_by('id').values_list('id', flat=True))
+        self._next_chunk()
+
+    def _next_chunk(self):
+        chunk = self.ids[self.position:self.position + self.chunk_size]
+        if not chunk:
+            self._finish()
+            return
+        self.position += len(chunk)
+        try:
+            self.run_chunk(chunk)
+        except Exception:
+            self.errors += len(chunk)
+            logger.log_trace(f"Upkeep: error in chunk starting at #{chunk[0]}.")
+        self.after = chunk[-1]
+        if self.on_chunk:
+            self.on_chunk(self)
+        # Give the reactor a turn before the next chunk
+        delay(0, self._next_chunk)
+
+    def run_chunk(self, ids):
+        from typeclasses.characters import Character
+
+        characters = list(Character.objects.all_family().filter(id__in=ids))
+        load_many(characters)
+        with bulk_write():
+            for character in characters:
+                self.characters += 1
+                splat = character.stats.get('other', 'splat', 'Splat')
+                applied = []
+                try:
+                    with character.stats.batch(reason="nightly upkeep"):
+                        for rule in UPKEEP_RULES:
+                            if rule.splat and rule.splat != splat:
+                                continue
+                            if rule.apply(character):
+                                applied.append(rule.name)
+                except Exception:
+                    self.errors += 1
+                    logger.log_trace(f"Upkeep: error on {character} (#{character.id}).")
+                    continue
+                self.counts.update(applied)
+                if applied:
+                    self.changed += 1
+        LEDGER.flush()
+
+    def digest(self):
+        elapsed = time.time() - (self.started or time.time())
+        parts = [f"{rule.label}: {self.counts[rule.name]}" for rule in UPKEEP_RULES if self.counts[rule.name]]
+        text = (f"|wNightly upkeep:|n {self.changed} of {self.characters} characters updated "
+                f"in {elapsed:.1f}s.")
+        if self.resumed:
+            text += f" Resumed after #{self.resumed}, following an interrupted run."
+        if parts:
+            text += " " + ", ".join(parts) + "."
+        if self.errors:
+            text += f" |r{self.errors} errors, see the server log.|n"
+        return text
+
+    def _finish(self):
+        text = self.digest()
+        logger.log_info(text)
+        mudinfo = search_channel("mudinfo")
+        if mudinfo:
+            mudinfo[0].msg(text)
+        if self.on_finish:
+            self.on_finish(self)
+
+
+class PoolUpkeepScript(DefaultScript):
+    """
+    Starts the day's upkeep run once it is past UPKEEP_HOUR.
+    """
+
+    def at_script_creation(self):
+        self.key = SCRIPT_KEY
+        self.desc = "Nightly pool regeneration and upkeep"
+        self.interval = 600
+        self.persistent = True
+
+    def at_repeat(self):
+        now = datetime.now()
+        if now.hour < UPKEEP_HOUR or self.db.last_run == now.date() or self.ndb.running:
+            return
+        self.run()
+
+    def run(self):
+        """
+        Run the upkeep now, whatever the time. A run of today's that was
+        interrupted, by a reload say, carries on where it stopped.
+        """
+        today = datetime.now().date()
+        progress = self.db.progress or {}
+        after = progress.get('after', 0) if progress.get('date') == today else 0
+        self.ndb.running = True
+        self.db.progress = {'date': today, 'after': after}
+        UpkeepRun(on_finish=self._finished, on_chunk=self._chunk_done, after=after).start()
+
+    def _chunk_done(self, run):
+        # Saved after every chunk, so an interrupted run can resume
+        self.db.progress = {'date': self.db.progress['date'], 'after': run.after}
+
+    def _finished(self, run):
+        self.db.last_run = self.db.progress['date']
+        self.db.progress = None
+        self.ndb.running = False
+
+
+def init_upkeep_script():
+    try:
+        script = ScriptDB.objects.get(db_key=SCRIPT_KEY)
+    except ScriptDB.DoesNotExist:
+        script = create_script(PoolUpkeepScript, key=SCRIPT_KEY)
+    except ScriptDB.MultipleObjectsReturned:
+        scripts = ScriptDB.objects.filter(db_key=SCRIPT_KEY)
+        script = scripts.first()
+        for extra in scripts[1:]:
+            extra.delete()
+
+    if script and not script.is_active:
+        script.start()
+    return script
@@ -0,0 +1,56 @@
+# world/wod20th/utils/bulk_insert.py
+"""
+Bulk inserts that don't lose a whole batch to one bad row.
+
+Buffered writers (the stat ledger, the roll log) collect unsaved model
+instances and write them in one bulk_create. Rows pointing at an object
+deleted since they were buffered are dropped first; some databases only
+check foreign keys at commit, so this can't be left to the insert
+failing. If the insert still fails, the rows are written one at a time
+and only those that fail are dropped. Each attempt runs in its own
+savepoint, so a failure doesn't break an enclosing transaction.
+"""
+from django.db import transaction
+
+
+def _existing(model, rows, field):
+    """
+    Return the rows whose `field` foreign key is unset or points at an
+    object that still exists.
+    """
+    attname = model._meta.get_field(field).attname
+    ids = {getattr(row, attname) for row in rows} - {None}
+    if not ids:
+        return rows
+    related = model._meta.get_field(field).related_model
+    found = set(related.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    return [row for row in rows if getattr(row, attname) is None or getattr(row, attname) in found]
+
+
+def bulk_insert(model, rows, batch_size=500, foreign_keys=()):
+    """
+    Insert `rows`, unsaved instances of `model`, after dropping those whose
+    `foreign_keys` fields point at deleted objects. Returns the rows that
+    weren't written.
+    """
+    if not rows:
+        return []
+    writable = rows
+    for field in foreign_keys:
+        writable = _existing(model, writable, field)
+    kept = {id(row) for row in writable}
+    failed = [row for row in rows if id(row) not in kept]
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(writable, batch_size=batch_size)
+        return failed
+    except Exception:
+        pass
+
+    for row in writable:
+        try:
+            with transaction.atomic():
+                row.save(force_insert=True)
+        except Exception:
+            failed.append(row)
+    return failed
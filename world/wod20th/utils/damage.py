@@ -1,11 +1,12 @@
 from evennia.utils.ansi import ANSIString
+from world.wod20th.ledger import LEDGER
 
 
-def apply_damage_or_healing(character, change, damage_type):
+def apply_damage_or_healing(character, change, damage_type, actor=None):
     current_bashing = character.db.bashing or 0
     current_lethal = character.db.lethal or 0
     current_agg = character.db.agg or 0
-    health_levels = character.get_stat('other', 'other', 'Health') or 7
+    health_levels = character.derived['health_levels']
     char_type = character.db.char_type or "mortal"
     injury_level = character.db.injury_level or "Healthy"
 
@@ -78,6 +79,14 @@ def apply_damage_or_healing(character, change, damage_type):
     character.db.agg = new_agg
     character.db.injury_level = new_injury_level
 
+    LEDGER.record_damage(
+        character,
+        {'bashing': current_bashing, 'lethal': current_lethal, 'agg': current_agg},
+        {'bashing': new_bashing, 'lethal': new_lethal, 'agg': new_agg},
+        actor=actor,
+        reason=f"{'damage' if change > 0 else 'healing'}: {abs(change)} {damage_type}",
+    )
+
     return new_injury_level
 
 def calculate_injury_level(total_damage, health_levels, agg_damage, char_type):
@@ -126,9 +135,18 @@ def format_damage(character):
 
 def format_damage_stacked(character):
     # Fetch health levels from character stats or default to 7
-    health_levels_count = character.get_stat('other', 'other', 'Health') or 7
+    health_levels_count = character.derived['health_levels']
     splat = character.get_stat('other', 'other', 'Splat')
+    return format_health_levels(
+        health_levels_count, splat, character.db.agg or 0, character.db.lethal or 0, character.db.bashing or 0
+    )
+
 
+def format_health_levels(health_levels_count, splat, agg, lethal, bashing):
+    """
+    The health track as lines of level, marker and penalty, from values
+    already read off the character.
+    """
     base_health_levels = [
         (ANSIString("Bruised"), ANSIString("|g[ ]|n"), ""),
         (ANSIString("Hurt"), ANSIString("|g[ ]|n"), " (-1)"),
@@ -150,10 +168,6 @@ def format_damage_stacked(character):
     extra_bruised_levels = [(ANSIString("Bruised"), ANSIString("|g[ ]|n"), "")] * (health_levels_count - 7)
     health_levels =  extra_bruised_levels + base_health_levels[:7]  + base_health_levels[7:]
 
-    agg = character.db.agg or 0
-    lethal = character.db.lethal or 0
-    bashing = character.db.bashing or 0
-
     # Ensure agg does not exceed total health levels
     max_damage = len(health_levels)
     if agg > max_damage:
@@ -178,7 +192,7 @@ def format_damage_stacked(character):
 
 
 def format_status(character):
-    injury_level = character.db.injury_level or "Healthy"
+    injury_level = character.derived['injury_level']
 
     status_mapping = {
         "Bruised": ("|y", ""),
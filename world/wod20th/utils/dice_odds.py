@@ -0,0 +1,150 @@
+# world/wod20th/utils/dice_odds.py
+"""
+Exact odds for dice pools, under the same rules as the DiceEngine.
+
+Each die is one of: a 1, a failure, a success, or (with a specialty) a 10
+that adds a chain of extra dice. The distribution of (successes rolled,
+ones) for a pool is built one die at a time from the pool one smaller, and
+scored with the engine's own score_counts, so the odds always match what
+DICE.roll does:
+
+    odds = pool_odds(6, 7, specialty=True)
+    odds.at_least(2), odds.botch, odds.expected
+
+Results are memoized by (pool, difficulty, specialty, willpower,
+botch_rule). precompute_odds() fills the table for every pool up to
+PRECOMPUTE_POOL at server start; bigger pools, up to MAX_ODDS_POOL, are
+worked out when first asked for.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from world.wod20th.utils.dice_rolls import (
+    BOTCH_RULES, MAX_DIFFICULTY, MIN_DIFFICULTY, score_counts,
+)
+
+PRECOMPUTE_POOL = 30
+MAX_ODDS_POOL = 100
+# A 10-again chain is followed this many tens deep; the chance of going
+# further is 0.1 ** BONUS_DEPTH, below float precision.
+BONUS_DEPTH = 16
+# Outcomes less likely than this are dropped as the table is built
+NEGLIGIBLE = 1e-15
+
+
+class PoolOdds(namedtuple('PoolOdds', [
+    'pool',
+    'difficulty',
+    'specialty',
+    'willpower',
+    'botch_rule',
+    'distribution',     # {net successes: probability}, negative only under 'net'
+    'botch',            # probability of a botch
+])):
+    """
+    The exact outcome distribution of one kind of roll.
+    """
+    __slots__ = ()
+
+    def at_least(self, successes):
+        """
+        Return the probability of at least `successes` net successes.
+        """
+        return sum(chance for net, chance in self.distribution.items() if net >= successes)
+
+    @property
+    def expected(self):
+        return sum(net * chance for net, chance in self.distribution.items())
+
+
+@lru_cache(maxsize=None)
+def _bonus_chain(difficulty):
+    """
+    Return {successes: probability} for the extra die a 10 adds, counting
+    the dice its own tens add in turn.
+    """
+    # The last die of a chain isn't a 10: a success on difficulty..9
+    hit = (10 - difficulty) / 9
+    chain = {}
+    reach = 1.0
+    for tens in range(BONUS_DEPTH):
+        reach *= 0.1 if tens else 1.0
+        # `tens` tens, then a die that isn't one
+        stop = reach * 0.9
+        chain[tens + 1] = chain.get(tens + 1, 0.0) + stop * hit
+        chain[tens] = chain.get(tens, 0.0) + stop * (1 - hit)
+    return chain
+
+
+@lru_cache(maxsize=None)
+def _die(difficulty, specialty):
+    """
+    Return {(successes, ones): probability} for one die of a pool.
+    """
+    outcomes = {(0, 1): 0.1}
+    outcomes[(0, 0)] = (difficulty - 2) / 10
+    if difficulty < 10:
+        outcomes[(1, 0)] = (10 - difficulty) / 10
+    if not specialty:
+        outcomes[(1, 0)] = outcomes.get((1, 0), 0.0) + 0.1
+        return outcomes
+    for extra, chance in _bonus_chain(difficulty).items():
+        key = (1 + extra, 0)
+        outcomes[key] = outcomes.get(key, 0.0) + 0.1 * chance
+    return outcomes
+
+
+@lru_cache(maxsize=None)
+def _counts(pool, difficulty, specialty):
+    """
+    Return {(successes, ones): probability} for a whole pool, built from the
+    pool one die smaller. Outcomes below NEGLIGIBLE are left out.
+    """
+    if pool == 0:
+        return {(0, 0): 1.0}
+    smaller = _counts(pool - 1, difficulty, specialty)
+    counts = {}
+    for (rolled, ones), chance in smaller.items():
+        for (die_rolled, die_ones), die_chance in _die(difficulty, specialty).items():
+            key = (rolled + die_rolled, ones + die_ones)
+            counts[key] = counts.get(key, 0.0) + chance * die_chance
+    return {key: chance for key, chance in counts.items() if chance >= NEGLIGIBLE}
+
+
+@lru_cache(maxsize=None)
+def _odds(pool, difficulty, specialty, willpower, botch_rule):
+    distribution = {}
+    botch = 0.0
+    for (rolled, ones), chance in _counts(pool, difficulty, specialty).items():
+        successes, botched = score_counts(rolled, ones, willpower, botch_rule)
+        distribution[successes] = distribution.get(successes, 0.0) + chance
+        if botched:
+            botch += chance
+    return PoolOdds(pool, difficulty, specialty, willpower, botch_rule,
+                    dict(sorted(distribution.items())), botch)
+
+
+def pool_odds(pool, difficulty=6, specialty=False, willpower=False, botch_rule='v20'):
+    """
+    Return the PoolOdds of rolling `pool` dice against `difficulty`.
+    Difficulties are capped as the engine caps them; pools are capped to
+    MAX_ODDS_POOL.
+    """
+    if botch_rule not in BOTCH_RULES:
+        raise ValueError(f"Unknown botch rule '{botch_rule}'.")
+    pool = min(max(int(pool), 0), MAX_ODDS_POOL)
+    difficulty = min(max(int(difficulty), MIN_DIFFICULTY), MAX_DIFFICULTY)
+    return _odds(pool, difficulty, bool(specialty), bool(willpower), botch_rule)
+
+
+def precompute_odds(max_pool=PRECOMPUTE_POOL):
+    """
+    Fill the odds table for every pool up to `max_pool`, every difficulty
+    and every rule, so +roll/odds never computes at request time.
+    """
+    for difficulty in range(MIN_DIFFICULTY, MAX_DIFFICULTY + 1):
+        for specialty in (False, True):
+            for pool in range(max_pool + 1):
+                for willpower in (False, True):
+                    for botch_rule in BOTCH_RULES:
+                        _odds(pool, difficulty, specialty, willpower, botch_rule)
@@ -1,9 +1,217 @@
-from random import randint
+# world/wod20th/utils/dice_rolls.py
+"""
+Dice for World of Darkness 20th Anniversary Edition.
+
+Every roll in the game goes through DICE, the shared DiceEngine:
+
+    result = DICE.roll(5, 7, specialty=True, willpower=True)
+    result.successes, result.botch
+    DICE.replay(result)                     # the same dice again, from its seed
+
+A whole pool is drawn with one call to the RNG, and roll_many() draws the
+dice of many pools (an NPC horde, say) in one call as well. Each roll gets
+its own seeded stream; the seed is kept on the result so staff can replay
+a logged roll exactly.
+
+Options:
+    specialty   10-again: each 10 adds another die, and so on for tens on
+                those. Ones on the extra dice don't count.
+    willpower   one automatic success, which ones can't cancel and which
+                prevents a botch.
+    botch_rule  'v20' (ones cancel successes; a botch is no successes and
+                at least one 1), 'net' (ones cancel successes; a botch is
+                more ones than successes) or 'no_cancel' (ones cancel
+                nothing; a botch is no successes and at least one 1).
+Difficulties are capped to the engine's MIN_DIFFICULTY..MAX_DIFFICULTY.
+"""
+import random
+from collections import namedtuple
 from typing import List, Tuple
 
+FACES = range(1, 11)
+MIN_DIFFICULTY = 2
+MAX_DIFFICULTY = 10
+BOTCH_RULES = ('v20', 'net', 'no_cancel')
+
+RollResult = namedtuple('RollResult', [
+    'dice',         # the pool's dice, in the order rolled
+    'bonus',        # extra dice from 10-again
+    'successes',    # net successes, including a Willpower success
+    'ones',
+    'botch',
+    'pool',
+    'difficulty',   # after capping
+    'specialty',
+    'willpower',
+    'botch_rule',
+    'seed',
+    'index',        # position within a roll_many() batch, else None
+])
+
+
+def score(dice, difficulty, bonus=(), willpower=False, botch_rule='v20'):
+    """
+    Return (successes, ones, botch) for dice already rolled.
+    """
+    rolled = sum(1 for die in dice if die >= difficulty) + sum(1 for die in bonus if die >= difficulty)
+    ones = sum(1 for die in dice if die == 1)
+    successes, botch = score_counts(rolled, ones, willpower, botch_rule)
+    return successes, ones, botch
+
+
+def score_counts(rolled, ones, willpower=False, botch_rule='v20'):
+    """
+    Return (successes, botch) given the number of dice that succeeded and
+    the number of ones; see score.
+    """
+    if botch_rule == 'no_cancel':
+        successes = rolled
+        botch = rolled == 0 and ones > 0
+    elif botch_rule == 'net':
+        successes = rolled - ones
+        botch = successes < 0
+    else:
+        successes = max(rolled - ones, 0)
+        botch = rolled == 0 and ones > 0
+    if willpower:
+        successes = max(successes, 0) + 1
+        botch = False
+    return successes, botch
+
+
+class DiceEngine:
+    """
+    Rolls pools of d10s. Use the module's DICE instance.
+    """
+
+    def __init__(self, min_difficulty=MIN_DIFFICULTY, max_difficulty=MAX_DIFFICULTY, botch_rule='v20'):
+        if botch_rule not in BOTCH_RULES:
+            raise ValueError(f"Unknown botch rule '{botch_rule}'.")
+        self.min_difficulty = min_difficulty
+        self.max_difficulty = max_difficulty
+        self.botch_rule = botch_rule
+        self._seeds = random.SystemRandom()
+
+    def cap(self, difficulty):
+        """
+        Return `difficulty` within the engine's limits.
+        """
+        return min(max(int(difficulty), self.min_difficulty), self.max_difficulty)
+
+    def new_seed(self):
+        return self._seeds.getrandbits(63)
+
+    @staticmethod
+    def _draw(rng, count):
+        # The whole pool in one call
+        return rng.choices(FACES, k=count) if count > 0 else []
+
+    def _bonus(self, rng, dice):
+        bonus = []
+        tens = sum(1 for die in dice if die == 10)
+        while tens:
+            extra = self._draw(rng, tens)
+            bonus += extra
+            tens = sum(1 for die in extra if die == 10)
+        return bonus
+
+    def _result(self, rng, dice, pool, difficulty, specialty, willpower, botch_rule, seed, index):
+        bonus = self._bonus(rng, dice) if specialty else []
+        successes, ones, botch = score(dice, difficulty, bonus, willpower, botch_rule)
+        return RollResult(tuple(dice), tuple(bonus), successes, ones, botch, pool, difficulty,
+                          specialty, willpower, botch_rule, seed, index)
+
+    def roll(self, pool, difficulty=6, specialty=False, willpower=False, botch_rule=None, seed=None):
+        """
+        Roll `pool` dice against `difficulty`. Returns a RollResult.
+        """
+        botch_rule = botch_rule or self.botch_rule
+        if botch_rule not in BOTCH_RULES:
+            raise ValueError(f"Unknown botch rule '{botch_rule}'.")
+        seed = self.new_seed() if seed is None else seed
+        rng = random.Random(seed)
+        pool = max(int(pool), 0)
+        difficulty = self.cap(difficulty)
+        return self._result(rng, self._draw(rng, pool), pool, difficulty, specialty, willpower,
+                            botch_rule, seed, None)
+
+    def roll_many(self, pools, difficulty=6, specialty=False, willpower=False, botch_rule=None, seed=None):
+        """
+        Roll several pools against the same difficulty, drawing every die
+        in one call. Returns a list of RollResults sharing one seed, each
+        with its index in `pools`.
+        """
+        botch_rule = botch_rule or self.botch_rule
+        if botch_rule not in BOTCH_RULES:
+            raise ValueError(f"Unknown botch rule '{botch_rule}'.")
+        seed = self.new_seed() if seed is None else seed
+        rng = random.Random(seed)
+        pools = [max(int(pool), 0) for pool in pools]
+        difficulty = self.cap(difficulty)
+        drawn = self._draw(rng, sum(pools))
+        results = []
+        start = 0
+        for index, pool in enumerate(pools):
+            dice = drawn[start:start + pool]
+            start += pool
+            results.append(self._result(rng, dice, pool, difficulty, specialty, willpower,
+                                        botch_rule, seed, index))
+        return results
+
+    def replay(self, result, pools=None):
+        """
+        Roll `result` again from its seed, giving the same dice. A result
+        from roll_many() needs the batch's `pools` to be replayed.
+        """
+        options = dict(difficulty=result.difficulty, specialty=result.specialty,
+                       willpower=result.willpower, botch_rule=result.botch_rule, seed=result.seed)
+        if result.index is None:
+            return self.roll(result.pool, **options)
+        return self.roll_many(pools, **options)[result.index]
+
+
+DICE = DiceEngine()
+
+
+def format_roll(result):
+    """
+    Describe a RollResult: the successes, Success/Successes or Botch!, and
+    the dice, high to low, coloured by whether they succeeded.
+    """
+    successes = result.successes
+    if successes > 0:
+        success_string = f"|g{successes}|n"
+    elif successes == 0:
+        success_string = f"|y{successes}|n"
+    else:
+        success_string = f"|r{successes}|n"
+
+    msg = f"|w(|n{success_string}|w)|n"
+    if result.botch:
+        msg += "|r Botch!|n"
+    else:
+        msg += "|y Successes|n" if successes != 1 else "|y Success|n"
+
+    def colour(die):
+        if die == 1:
+            return f"|r{die}|n"
+        if die >= result.difficulty:
+            return f"|g{die}|n"
+        return f"|y{die}|n"
+
+    msg += " |w(|n" + " ".join(colour(die) for die in sorted(result.dice, reverse=True))
+    if result.bonus:
+        msg += " |w+|n " + " ".join(colour(die) for die in result.bonus)
+    msg += "|w)|n"
+    if result.willpower:
+        msg += " |w+WP|n"
+    return msg
+
+
 def roll_dice(dice_pool: int, difficulty: int) -> Tuple[List[int], int, int]:
     """
-    Roll dice for World of Darkness 20th Anniversary Edition.
+    Roll dice for World of Darkness 20th Anniversary Edition. Kept for
+    older callers; new code should use DICE.roll.
 
     Args:
     dice_pool (int): The number of dice to roll.
@@ -15,16 +223,14 @@ def roll_dice(dice_pool: int, difficulty: int) -> Tuple[List[int], int, int]:
         - Number of successes
         - Number of ones (potential botches)
     """
-    rolls = [randint(1, 10) for _ in range(max(0, dice_pool))]
-    successes = sum(1 for roll in rolls if roll >= difficulty)
-    ones = sum(1 for roll in rolls if roll == 1)
-    successes = successes - ones
-    
-    return rolls, successes, ones
+    result = DICE.roll(dice_pool, difficulty, botch_rule='net')
+    return list(result.dice), result.successes, result.ones
+
 
 def interpret_roll_results(successes, ones, diff=6, rolls=None):
     """
-    Interpret the results of a dice roll.
+    Interpret the results of a dice roll from roll_dice. Kept for older
+    callers; new code should use format_roll.
 
     Args:
     successes (int): The number of successes rolled.
@@ -33,37 +239,7 @@ def interpret_roll_results(successes, ones, diff=6, rolls=None):
     Returns:
     str: A string describing the result of the roll.
     """
-    success_string = ""
-    if successes == 0:
-        success_string = f"|y{successes}|n"
-    elif successes > 0:
-        success_string = f"|g{successes}|n"
-    else:
-        success_string = f"|r{successes}|n"
-        
-
-    msg =  f"|w(|n{success_string}|w)|n"
-    if successes == -1 and ones > 0:
-        msg += f"|r Botch!|n"
-    else:
-        msg += "|y Successes|n" if successes != 1 else "|y Success|n"
-    
-
-   # colorize the succesess to green, botches to red and everything else to yellow
-    msg += " |w(|n"
-    if rolls:
-        rolls.sort( reverse=True )
-        for roll in rolls:
-            if roll == 1:
-                msg += f"|r{roll}|n"
-            elif roll >= diff:
-                msg += f"|g{roll}|n"
-            else:
-                msg += f"|y{roll}|n"
-            
-            if roll != rolls[-1]:
-                msg += " "
-
-
-    msg += "|w)|n"
-    return msg
\ No newline at end of file
+    rolls = tuple(rolls or ())
+    result = RollResult(rolls, (), successes, ones, successes < 0 and ones > 0, len(rolls), diff,
+                        False, False, 'net', None, None)
+    return format_roll(result)
@@ -0,0 +1,163 @@
+# world/wod20th/utils/lock_cache.py
+"""
+Compiled, cached lockstrings.
+
+Evennia parses a lockstring every time a LockHandler is built or
+check_lockstring is called, and then evaluates the result with eval(). Stat
+locks are checked far more often than they change (every sheet render walks
+every ability), so each distinct lockstring is parsed here once into a
+CompiledLock whose access types are plain Python callables.
+"""
+from functools import lru_cache
+
+from evennia.locks.lockhandler import LockException, LockHandler
+from evennia.utils import logger
+
+
+class _Unlocked:
+    # LockHandler reads this on creation; we only use it for parsing.
+    lock_storage = ""
+
+
+_PARSER = None
+
+
+def _parse(lockstring):
+    global _PARSER
+    if _PARSER is None:
+        _PARSER = LockHandler(_Unlocked())
+    return _PARSER._parse_lockstring(lockstring)
+
+
+def _compile_access_type(evalstring, func_tup):
+    """
+    Turn Evennia's evalstring ('%s and not %s') into a function that calls
+    each lockfunc lazily, so 'and'/'or' short-circuit.
+    """
+    parts = []
+    position = 0
+    for token in evalstring.split():
+        if token == "%s":
+            parts.append(
+                f"bool(_f[{position}][0](a, o, *_f[{position}][1], access_type=t, **_f[{position}][2]))"
+            )
+            position += 1
+        elif token in ("and", "or", "not"):
+            parts.append(token)
+        else:
+            raise LockException(f"Lock: unexpected token '{token}' in '{evalstring}'.")
+    source = f"lambda a, o, t: {' '.join(parts)}"
+    return eval(source, {"_f": func_tup, "bool": bool})
+
+
+class CompiledLock:
+    """
+    A parsed lockstring, ready to be checked against any accessing object.
+    Build them with compile_lock.
+    """
+
+    __slots__ = ("lockstring", "access_types", "bare")
+
+    def __init__(self, lockstring, access_types=None, bare=None):
+        self.lockstring = lockstring
+        self.access_types = access_types or {}
+        # A lockstring without access types ('Builder' or 'perm(Builder)')
+        # applies to every access type.
+        self.bare = bare
+
+    def check(self, accessing_obj, access_type=None, accessed_obj=None, default=False,
+              no_superuser_bypass=False):
+        """
+        Check access the way LockHandler.check_lockstring does.
+
+        Args:
+            accessing_obj (object): The object seeking access.
+            access_type (str, optional): Only check this access type. If
+                unset, every access type in the lockstring must pass.
+            accessed_obj (object, optional): Passed on to the lockfuncs.
+            default (bool): Result when the access type isn't defined.
+            no_superuser_bypass (bool): Make superusers heed the lock.
+        """
+        if not no_superuser_bypass and _bypasses(accessing_obj):
+            return True
+        if access_type:
+            func = self.access_types.get(access_type, self.bare)
+            if func is None:
+                return default
+            return func(accessing_obj, accessed_obj, access_type)
+        if self.bare is not None:
+            return self.bare(accessing_obj, accessed_obj, None)
+        if not self.access_types:
+            return default
+        return all(
+            func(accessing_obj, accessed_obj, name) for name, func in self.access_types.items()
+        )
+
+
+def _bypasses(accessing_obj):
+    try:
+        return bool(accessing_obj.locks.lock_bypass)
+    except AttributeError:
+        return bool(getattr(accessing_obj, "is_superuser", False))
+
+
+def _permission_check(name):
+    """
+    The check for a lockstring that is a bare permission name, as Stat
+    lock strings used to be: the accessing object needs that permission.
+    """
+    def check(accessing_obj, accessed_obj, access_type):
+        try:
+            return bool(accessing_obj.check_permstring(name))
+        except AttributeError:
+            return False
+    return check
+
+
+def _compile(lockstring):
+    lockstring = lockstring.strip()
+    if not lockstring:
+        return CompiledLock(lockstring)
+    if ":" not in lockstring:
+        if "(" not in lockstring:
+            return CompiledLock(lockstring, bare=_permission_check(lockstring))
+        # A bare lockfunc expression; parse it under a placeholder access type
+        (evalstring, func_tup, _), = _parse(f"_bare:{lockstring}").values()
+        return CompiledLock(lockstring, bare=_compile_access_type(evalstring, func_tup))
+    return CompiledLock(lockstring, {
+        access_type: _compile_access_type(evalstring, func_tup)
+        for access_type, (evalstring, func_tup, _) in _parse(lockstring).items()
+    })
+
+
+@lru_cache(maxsize=1024)
+def compile_lock(lockstring):
+    """
+    Return the CompiledLock for a lockstring, parsing it only the first time.
+
+    An empty lockstring has no access types, so checks against it return
+    their default. A lockstring without access types applies to every
+    access type: 'perm(Builder)' is checked as a lock, and a plain name
+    like 'Builder' as a permission the accessing object must have. A
+    lockstring that fails to parse compiles to a lock with no access
+    types.
+    """
+    try:
+        return _compile(lockstring)
+    except (LockException, ValueError):
+        logger.log_trace(f"Could not compile lockstring '{lockstring}'.")
+        return CompiledLock(lockstring)
+
+
+def check_lock(accessing_obj, lockstring, access_type=None, accessed_obj=None, default=False,
+               no_superuser_bypass=False):
+    """
+    Check `accessing_obj` against a lockstring using the compiled cache.
+    """
+    return compile_lock(lockstring or "").check(
+        accessing_obj,
+        access_type=access_type,
+        accessed_obj=accessed_obj,
+        default=default,
+        no_superuser_bypass=no_superuser_bypass,
+    )
@@ -0,0 +1,303 @@
+# world/wod20th/utils/name_index.py
+"""
+Abbreviation- and typo-tolerant stat name resolution.
+
+A NameIndex is built once from a set of (name, category, stat_type) entries
+and answers lookups in tiers:
+
+    0 - exact match on the normalized name ("self control" == "Self-Control")
+    1 - prefix of the full name ("stre" -> Strength)
+    2 - prefix of any word in the name ("ken" -> Animal Ken)
+    3 - substring of the name
+    4 - within a small edit distance ("strenght" -> Strength)
+
+Indexes are cached: one for the stat catalog per catalog version, and one per
+character for the set of stats on their sheet.
+"""
+from collections import namedtuple
+
+StatMatch = namedtuple('StatMatch', ['name', 'category', 'stat_type', 'score', 'stat'])
+
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = range(5)
+
+
+def normalize_name(name):
+    """
+    Lowercase a stat name and drop everything but letters and digits.
+    """
+    return ''.join(char for char in str(name).casefold() if char.isalnum())
+
+
+def _words(name):
+    word = []
+    for char in str(name).casefold():
+        if char.isalnum():
+            word.append(char)
+        elif word:
+            yield ''.join(word)
+            word = []
+    if word:
+        yield ''.join(word)
+
+
+def max_typos(query):
+    """
+    How many edits we tolerate for a query of this length.
+    """
+    if len(query) <= 3:
+        return 0
+    if len(query) <= 6:
+        return 1
+    return MAX_TYPOS
+
+
+MAX_TYPOS = 2
+
+
+def _deletions(word, depth):
+    """
+    Return `word` plus every string made by deleting up to `depth` characters.
+    """
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {
+            variant[:position] + variant[position + 1:]
+            for variant in frontier
+            for position in range(len(variant))
+        }
+        variants |= frontier
+    return variants
+
+
+def edit_distance(first, second, limit):
+    """
+    Damerau-Levenshtein (optimal string alignment) distance, giving up and
+    returning limit + 1 as soon as the distance is known to exceed `limit`.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = None
+    current = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = first[i - 1] != second[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (before is not None and i > 1 and j > 1
+                    and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]):
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+class _TrieNode:
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children = {}
+        # Every entry whose key passes through this node, for prefix lookups.
+        self.entries = []
+
+
+class NameIndex:
+    """
+    Immutable lookup structure over a fixed set of stat names.
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries (iterable): (name, category, stat_type, stat) tuples. The
+                stat element may be None when there is no Stat row to return.
+        """
+        self.entries = []
+        self._exact = {}
+        self._names = _TrieNode()
+        self._words = _TrieNode()
+        self._deletions = None
+
+        seen = set()
+        for name, category, stat_type, stat in entries:
+            key = (name, category, stat_type)
+            if key in seen and stat is None:
+                continue
+            seen.add(key)
+            index = len(self.entries)
+            normalized = normalize_name(name)
+            self.entries.append((name, category, stat_type, stat, normalized))
+            self._exact.setdefault(normalized, []).append(index)
+            self._insert(self._names, normalized, index)
+            for word in set(_words(name)):
+                self._insert(self._words, word, index)
+
+    @staticmethod
+    def _insert(root, key, index):
+        node = root
+        node.entries.append(index)
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            node.entries.append(index)
+
+    @staticmethod
+    def _walk(root, key):
+        node = root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return ()
+        return node.entries
+
+    def _fuzzy(self, query, limit):
+        """
+        Bounded edit-distance search. Any two strings within `limit` edits of
+        each other share a string reachable by deleting at most `limit`
+        characters from each, so candidates come from a deletion index built
+        on first use and are then verified exactly.
+        """
+        if self._deletions is None:
+            self._deletions = {}
+            for index, entry in enumerate(self.entries):
+                for variant in _deletions(entry[4], MAX_TYPOS):
+                    self._deletions.setdefault(variant, set()).add(index)
+
+        candidates = set()
+        for variant in _deletions(query, limit):
+            candidates.update(self._deletions.get(variant, ()))
+
+        found = {}
+        for index in candidates:
+            distance = edit_distance(query, self.entries[index][4], limit)
+            if distance <= limit:
+                found[index] = distance
+        return found
+
+    def _match(self, index, score):
+        name, category, stat_type, stat, _ = self.entries[index]
+        return StatMatch(name, category, stat_type, score, stat)
+
+    def _ranked(self, indices, score):
+        # Closest completions first: shortest names, then alphabetical.
+        ordered = sorted(set(indices), key=lambda i: (len(self.entries[i][4]), self.entries[i][0]))
+        return [self._match(index, score) for index in ordered]
+
+    def _tiers(self, query):
+        """
+        Yield candidate lists from the best tier to the worst, lazily, so
+        callers that only need the best tier never pay for the scans.
+        """
+        yield self._ranked(self._exact.get(query, ()), EXACT)
+        yield self._ranked(self._walk(self._names, query), PREFIX)
+        yield self._ranked(self._walk(self._words, query), WORD_PREFIX)
+        yield self._ranked([i for i, entry in enumerate(self.entries) if query in entry[4]], SUBSTRING)
+
+    def _typos(self, query):
+        typos = max_typos(query)
+        if not typos:
+            return []
+        distances = self._fuzzy(query, typos)
+        ordered = sorted(distances, key=lambda i: (distances[i], len(self.entries[i][4]), self.entries[i][0]))
+        return [self._match(index, FUZZY + distances[index]) for index in ordered]
+
+    def search(self, query, limit=10):
+        """
+        Return up to `limit` ranked candidates for `query`.
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
+
+        results = []
+        seen = set()
+        for tier in self._tiers(query):
+            for match in tier:
+                key = (match.name, match.category, match.stat_type, id(match.stat))
+                if key not in seen:
+                    seen.add(key)
+                    results.append(match)
+            if len(results) >= limit:
+                return results[:limit]
+        if not results:
+            results = self._typos(query)
+        return results[:limit]
+
+    def best(self, query):
+        """
+        Return every candidate sharing the best score, e.g. all exact matches.
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
+        for tier in self._tiers(query):
+            if tier:
+                return tier
+        typos = self._typos(query)
+        return [match for match in typos if match.score == typos[0].score]
+
+    def first(self, query):
+        """
+        Return the single best candidate, or None.
+        """
+        results = self.search(query, limit=1)
+        return results[0] if results else None
+
+
+_catalog_index = None
+_catalog_index_version = None
+
+
+def catalog_name_index():
+    """
+    Return the NameIndex over every Stat in the catalog, rebuilt only when
+    the catalog version changes.
+    """
+    global _catalog_index, _catalog_index_version
+    from world.wod20th.catalog import STAT_CATALOG
+
+    STAT_CATALOG.ensure_loaded()
+    if _catalog_index is None or _catalog_index_version != STAT_CATALOG.version:
+        _catalog_index = NameIndex(
+            (stat.name, stat.category, stat.stat_type, stat) for stat in STAT_CATALOG.all()
+        )
+        _catalog_index_version = STAT_CATALOG.version
+    return _catalog_index
+
+
+def find_stats(name):
+    """
+    Resolve a user-typed stat name against the catalog.
+
+    Returns:
+        list: The Stat rows sharing the best match score. Exact matches win
+            over abbreviations, which win over typo corrections.
+    """
+    return [match.stat for match in catalog_name_index().best(name)]
+
+
+def _stat_signature(stats):
+    return tuple(
+        (category, stat_type, tuple(names))
+        for category, types in stats.items() if isinstance(types, dict)
+        for stat_type, names in types.items() if isinstance(names, dict)
+    )
+
+
+def character_name_index(character):
+    """
+    Return the NameIndex over the stats present on a character's sheet. It is
+    cached on the character and rebuilt only when the set of stats changes.
+    """
+    stats = character.db.stats or {}
+    signature = _stat_signature(stats)
+    cached = character.ndb.stat_name_index
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    index = NameIndex(
+        (name, category, stat_type, None)
+        for category, stat_type, names in signature
+        for name in names
+    )
+    character.ndb.stat_name_index = (signature, index)
+    return index
@@ -0,0 +1,131 @@
+# world/wod20th/utils/roll_expressions.py
+"""
+Compiled roll expressions.
+
+An expression such as 'str+brawl-1' is parsed once into a sum of signed
+terms, each a number or a stat resolved against the roller's sheet:
+
+    expression = compile_expression(character, 'str+brawl-1')
+    pool, description, detailed, warnings = expression.evaluate(character)
+
+Compiling does the tokenizing and the fuzzy stat matching; evaluating only
+reads the stats' current effective values and builds the descriptions.
+Compiled expressions are cached on the character, keyed by the character's
+stat version and the expression text, so a repeated roll skips straight to
+evaluate(). Any stat write bumps the version and empties the cache, since
+it may change which stat an abbreviation resolves to.
+"""
+import re
+from collections import namedtuple
+
+from world.wod20th.utils.name_index import character_name_index
+
+TOKEN = re.compile(r'([+-])?\s*(\w+|\d+)')
+# Expressions kept per character
+MAX_CACHED_EXPRESSIONS = 32
+
+# A term is a number (stat is None) or a stat reference; label is what the
+# roller sees: the number, the stat's full name or their capitalized word.
+RollTerm = namedtuple('RollTerm', ['sign', 'label', 'number', 'stat'])
+
+EvaluatedRoll = namedtuple('EvaluatedRoll', ['pool', 'description', 'detailed_description', 'warnings'])
+
+
+class RollExpression:
+    """
+    A parsed roll expression, with its stat references bound.
+    """
+
+    def __init__(self, text, terms):
+        self.text = text
+        self.terms = tuple(terms)
+
+    def __repr__(self):
+        return f"<RollExpression {self.text!r}>"
+
+    @staticmethod
+    def _value(character, stat):
+        if character is None or stat is None:
+            return 0
+        try:
+            value = character.overlays.effective(*stat)
+        except AttributeError:
+            return 0
+        # Numeric stats are stored as ints; anything else (a Clan, say) adds no dice
+        return value if type(value) is int else 0
+
+    def evaluate(self, character):
+        """
+        Return the EvaluatedRoll of this expression for `character` now.
+        """
+        dice_pool = 0
+        description = []
+        detailed_description = []
+        warnings = []
+
+        for sign, label, number, stat in self.terms:
+            if stat is None and number is not None:
+                dice_pool += number if sign == '+' else -number
+                description.append(f"{sign} |w{label}|n")
+                detailed_description.append(f"{sign} |w{label}|n")
+                continue
+
+            stat_value = self._value(character, stat)
+            if stat_value > 0:
+                dice_pool += stat_value if sign == '+' else -stat_value
+                description.append(f"{sign}|n |w{label}|n")
+                detailed_description.append(f"{sign} |w{label} ({stat_value})|n")
+            elif stat_value == 0:
+                description.append(f"{sign} |w{label}|n")
+                detailed_description.append(f"{sign} |w{label} (0)|n")
+                warnings.append(f"|rWarning: Stat '{label}' not found or has no value. Treating as 0.|n")
+            else:
+                description.append(f"{sign} |h|x{label}|n")
+                detailed_description.append(f"{sign} |h|x{label} (0)|n")
+                warnings.append(f"|rWarning: Stat '{label}' not found or has no value. Treating as 0.|n")
+
+        return EvaluatedRoll(dice_pool, description, detailed_description, warnings)
+
+
+def parse_expression(expression, index=None):
+    """
+    Parse `expression` into a RollExpression, resolving stat names with
+    `index` (a NameIndex). Without an index every name is left unresolved
+    and counts as 0.
+    """
+    terms = []
+    for sign, value in TOKEN.findall(expression):
+        sign = sign or '+'
+        if value.isdigit():
+            terms.append(RollTerm(sign, value, int(value), None))
+            continue
+        match = index.first(value) if index is not None else None
+        if match:
+            terms.append(RollTerm(sign, match.name, None, (match.category, match.stat_type, match.name)))
+        else:
+            terms.append(RollTerm(sign, value.capitalize(), None, None))
+    return RollExpression(expression, terms)
+
+
+def compile_expression(character, expression):
+    """
+    Return the RollExpression for `expression` bound to `character`'s
+    sheet, from the cache when the sheet hasn't changed since it was
+    compiled.
+    """
+    expression = expression.strip()
+    version = character.stats.version
+    cached = character.ndb.roll_expressions
+    if cached is None or cached[0] != version:
+        cached = character.ndb.roll_expressions = (version, {})
+    compiled = cached[1]
+    try:
+        return compiled[expression]
+    except KeyError:
+        pass
+    result = parse_expression(expression, character_name_index(character))
+    if len(compiled) >= MAX_CACHED_EXPRESSIONS:
+        # Drop the oldest
+        del compiled[next(iter(compiled))]
+    compiled[expression] = result
+    return result
@@ -0,0 +1,49 @@
+# world/wod20th/utils/sheet_cache.py
+"""
+Rendered character sheets, cached until something on them changes.
+
+A sheet is rendered once per (viewer class, width) and kept on the
+character's ndb along with a stamp: the character's stat version (bumped
+by the stat handler on every stat or db Attribute write), the stat
+catalog's version and the character's name. A repeat +sheet with the same
+stamp returns the stored text without touching a stat.
+"""
+from world.wod20th.catalog import STAT_CATALOG
+
+
+def viewer_class(viewer):
+    """
+    Return the part of the viewer that changes how a sheet renders: staff
+    see dbrefs, everyone else doesn't.
+    """
+    return 'staff' if viewer.check_permstring("builders") else 'player'
+
+
+def sheet_stamp(character):
+    return (character.stats.version, STAT_CATALOG.version, character.key)
+
+
+def cached_sheet(character, viewer, width, render):
+    """
+    Return the character's sheet as seen by `viewer` at `width`, calling
+    render() only if there is no current cached copy.
+    """
+    cache = character.ndb.sheet_cache
+    if cache is None:
+        cache = character.ndb.sheet_cache = {}
+    key = (viewer_class(viewer), width)
+    stamp = sheet_stamp(character)
+    entry = cache.get(key)
+    if entry and entry[0] == stamp:
+        return entry[1]
+    text = render()
+    cache[key] = (stamp, text)
+    return text
+
+
+def clear_sheet_cache(character):
+    """
+    Drop a character's cached sheets, e.g. after changing something the
+    stamp doesn't cover.
+    """
+    character.ndb.sheet_cache = None